@@ -7,4 +7,13 @@ try:
 except ImportError:
     __version__ = "unknown"
 
-from .backdoor_memory_interface import BackdoorMemoryInterface
\ No newline at end of file
+from .backdoor_memory_interface import BackdoorMemoryInterface
+from .cache import CachedMemoryInterface
+
+def __getattr__(name):
+    # asyncio is slow to import so the asyncio interface is only loaded on request
+    if name == "AsyncBackdoorMemoryInterface":
+        from .async_backdoor_memory_interface import AsyncBackdoorMemoryInterface
+        return AsyncBackdoorMemoryInterface
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
@@ -0,0 +1,122 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""The memory access methods shared by the interfaces, caches and memory maps.
+
+Everything that can stand in for a BackdoorMemoryInterface offers the same word and
+block methods, which only differ in how a block of bytes is moved.  The mixins here
+implement them on top of two primitives provided by the class they are mixed into.
+"""
+
+from typing import (Callable, Iterator, Sequence, Tuple, Union)
+from .conversion import *
+
+def split_pages(addr: int, size: int, page_size: int) -> Iterator[Tuple[int, int, int, int]]:
+    """@brief Yields (offset, page, page_offset, size) tuples splitting an access into pages. """
+    offset = 0
+    while offset < size:
+        page, page_offset = divmod(addr + offset, page_size)
+        n = min(page_size - page_offset, size - offset)
+        yield offset, page, page_offset, n
+        offset += n
+
+
+def _word(data: int, transfer_size: int) -> bytes:
+    """Returns |data| as the little-endian bytes of a |transfer_size| bit access. """
+    assert transfer_size in (8, 16, 32)
+    return (data & ((1 << transfer_size) - 1)).to_bytes(transfer_size // 8, 'little')
+
+
+class MemoryAccessMixin:
+    """@brief The block access methods of BackdoorMemoryInterface.
+
+    Classes provide _write_mem8(addr, data), writing a byte sequence or buffer, and
+    _read_mem8_into(addr, view), filling a byte memoryview.
+
+    """
+
+    def write_memory(self, addr: int, data: int, transfer_size: int = 32, **kwargs) -> None:
+        """@brief Write a single memory location. """
+        self._write_mem8(addr & 0xffffffff, _word(data, transfer_size))
+
+    def read_memory(self, addr: int, transfer_size: int = 32, now: bool = True, **kwargs) -> Union[int, Callable[[], int]]:
+        """@brief Read a single memory location. """
+        assert transfer_size in (8, 16, 32)
+        result = int.from_bytes(self._read_mem8(addr & 0xffffffff, transfer_size // 8), 'little')
+
+        def read_callback():
+            return result
+        return result if now else read_callback
+
+    def write_memory_block32(self, addr: int, data: Sequence[int]) -> None:
+        """@brief Write an aligned block of 32-bit words."""
+        self._write_mem8(addr, u32le_to_bytes(data))
+
+    def read_memory_block32(self, addr: int, size: int) -> Sequence[int]:
+        """@brief Read an aligned block of 32-bit words."""
+        return bytes_to_u32le(self._read_mem8(addr, size*4)).tolist()
+
+    def write_memory_block8(self, addr: int, data: Sequence[int]) -> None:
+        """@brief Write a block of bytes. """
+        self._write_mem8(addr, data)
+
+    def read_memory_block8(self, addr: int, size: int) -> Sequence[int]:
+        """@brief Read a block of bytes. """
+        return list(self._read_mem8(addr, size))
+
+    def read_memory_bytes(self, addr: int, size: int) -> bytearray:
+        """@brief Read a block of bytes into a new bytearray. """
+        return self._read_mem8(addr, size)
+
+    def read_memory_block8_into(self, addr: int, buf) -> memoryview:
+        """@brief Read len(buf) bytes directly into the writable buffer |buf|.
+
+        Returns a byte memoryview of |buf|, no intermediate copies are made.
+        """
+        view = memoryview(buf).cast('B')
+        self._read_mem8_into(addr, view)
+        return view
+
+    def _read_mem8(self, addr: int, size: int) -> bytearray:
+        data = bytearray(size)
+        self._read_mem8_into(addr, memoryview(data))
+        return data
+
+
+class AsyncMemoryAccessMixin:
+    """@brief The block access methods of BackdoorMemoryInterface as coroutines.
+
+    Classes provide the coroutines _write_mem8(addr, data) and _read_mem8(addr, size),
+    the latter returning a bytearray.
+
+    """
+
+    async def write_memory(self, addr: int, data: int, transfer_size: int = 32, **kwargs) -> None:
+        """@brief Write a single memory location. """
+        await self._write_mem8(addr & 0xffffffff, _word(data, transfer_size))
+
+    async def read_memory(self, addr: int, transfer_size: int = 32, **kwargs) -> int:
+        """@brief Read a single memory location. """
+        assert transfer_size in (8, 16, 32)
+        return int.from_bytes(await self._read_mem8(addr & 0xffffffff, transfer_size // 8), 'little')
+
+    async def write_memory_block32(self, addr: int, data: Sequence[int]) -> None:
+        """@brief Write an aligned block of 32-bit words."""
+        await self._write_mem8(addr, u32le_to_bytes(data))
+
+    async def read_memory_block32(self, addr: int, size: int) -> Sequence[int]:
+        """@brief Read an aligned block of 32-bit words."""
+        return bytes_to_u32le(await self._read_mem8(addr, size*4)).tolist()
+
+    async def write_memory_block8(self, addr: int, data: Sequence[int]) -> None:
+        """@brief Write a block of bytes. """
+        await self._write_mem8(addr, data)
+
+    async def read_memory_block8(self, addr: int, size: int) -> Sequence[int]:
+        """@brief Read a block of bytes. """
+        return list(await self._read_mem8(addr, size))
+
+    async def read_memory_bytes(self, addr: int, size: int) -> bytearray:
+        """@brief Read a block of bytes into a new bytearray. """
+        return await self._read_mem8(addr, size)
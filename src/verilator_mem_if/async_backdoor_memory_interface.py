@@ -0,0 +1,174 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import collections
+import logging
+import socket
+from typing import (Sequence)
+from .access import AsyncMemoryAccessMixin
+from .backdoor_memory_interface import BackdoorMemoryInterface
+
+LOG = logging.getLogger(__name__)
+
+class AsyncBackdoorMemoryInterface(AsyncMemoryAccessMixin):
+    """@brief An asyncio variant of the BackdoorMemoryInterface.
+
+    The wire protocol is identical to BackdoorMemoryInterface, see its docstring for the
+    header, payload and ACK definitions.  All accessors are coroutines and requests issued
+    by concurrent coroutines are pipelined over the one connection.  As the simulator
+    answers requests strictly in order, each request queues a future that a single
+    receive task resolves with the matching ACK or read payload.
+
+    At most |max_pending| transactions are in flight at any time, which bounds the amount
+    of unread response data and stops large transfers from deadlocking the connection.
+
+    """
+
+    WRITE = BackdoorMemoryInterface.WRITE
+    READ  = BackdoorMemoryInterface.READ
+    ACK   = BackdoorMemoryInterface.ACK
+
+    HEADER = BackdoorMemoryInterface.HEADER
+
+    MAX_TRANSFER_SIZE  = BackdoorMemoryInterface.MAX_TRANSFER_SIZE
+    DEFAULT_CHUNK_SIZE = BackdoorMemoryInterface.DEFAULT_CHUNK_SIZE
+
+    def __init__(self,
+                 hostname: str = "localhost",
+                 port: int = 5557,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_pending: int = 64
+                 ) -> None:
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be >= 1, got {max_pending}")
+        if not 0 < chunk_size <= self.MAX_TRANSFER_SIZE:
+            raise ValueError(f"chunk_size must be in the range 1-{self.MAX_TRANSFER_SIZE}, got {chunk_size}")
+        self._hostname = hostname
+        self._port = int(port)
+        self._chunk_size = int(chunk_size)
+        self._max_pending = int(max_pending)
+        self._reader = None
+        self._writer = None
+        self._receiver = None
+        self._responses = collections.deque()
+        self._error = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, *exc):
+        try:
+            if exc_type is None:
+                await self.flush()
+        finally:
+            await self.close()
+
+    async def connect(self):
+        try:
+            self._reader, self._writer = await asyncio.open_connection(self._hostname, self._port)
+            LOG.debug(f"connected to {self._hostname}:{self._port}")
+        except Exception as e:
+            LOG.error(f"socket connect() failed when using {self._hostname}:{self._port}")
+            raise e
+        self._writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # asyncio primitives are bound to the running loop on Python < 3.10
+        self._window = asyncio.Semaphore(self._max_pending)
+        self._drain_lock = asyncio.Lock()
+        self._available = asyncio.Event()
+        self._error = None
+        self._receiver = asyncio.ensure_future(self._receive_loop())
+
+    async def close(self):
+        if self._receiver is not None:
+            self._receiver.cancel()
+            try:
+                await self._receiver
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._receiver = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(ConnectionError(f"connection to {self._hostname}:{self._port} closed"))
+
+    async def flush(self) -> None:
+        """@brief Wait until every transaction issued so far has completed. """
+        pending = [future for future, _ in self._responses]
+        if pending:
+            await asyncio.gather(*pending)
+
+    # Private methods
+
+    async def _write_mem8(self, addr: int, data: Sequence[int]) -> None:
+        payload = BackdoorMemoryInterface._as_payload(data)
+        futures = []
+        for offset, size in self._chunks(len(payload)):
+            futures.append(await self._submit(addr + offset, size, self.WRITE, payload[offset:offset + size]))
+        for future in futures:
+            ack = await future
+            assert ack[0] == self.ACK, "invalid ACK received, got %s" % ack[0]
+
+    async def _read_mem8(self, addr: int, size: int) -> bytearray:
+        data = bytearray(size)
+        futures = []
+        for offset, chunk in self._chunks(size):
+            futures.append((offset, chunk, await self._submit(addr + offset, chunk, self.READ)))
+        for offset, chunk, future in futures:
+            data[offset:offset + chunk] = await future
+        return data
+
+    def _chunks(self, size: int):
+        """Yields (offset, size) tuples splitting |size| bytes into transactions. """
+        for offset in range(0, size, self._chunk_size):
+            yield offset, min(self._chunk_size, size - offset)
+
+    async def _submit(self, addr: int, size: int, rnw: int, payload: memoryview = None) -> asyncio.Future:
+        """Sends a single transaction and returns a future for its response. """
+        if self._writer is None:
+            raise ConnectionError(f"not connected to {self._hostname}:{self._port}")
+        await self._window.acquire()
+        if self._error is not None:
+            self._window.release()
+            raise self._error
+        future = asyncio.get_event_loop().create_future()
+        # Queueing the response and writing the request must not be separated by an
+        # await so that the response order always matches the request order.
+        self._responses.append((future, 1 if rnw == self.WRITE else size))
+        self._available.set()
+        self._writer.write(self.HEADER.pack(addr, size, rnw))
+        if payload is not None:
+            self._writer.write(payload)
+        async with self._drain_lock:
+            await self._writer.drain()
+        return future
+
+    async def _receive_loop(self) -> None:
+        try:
+            while True:
+                if not self._responses:
+                    self._available.clear()
+                    await self._available.wait()
+                    continue
+                future, size = self._responses[0]
+                data = await self._reader.readexactly(size)
+                self._responses.popleft()
+                self._window.release()
+                if not future.done():
+                    future.set_result(data)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.IncompleteReadError:
+            self._fail_pending(ConnectionError(f"connection to {self._hostname}:{self._port} closed"))
+        except Exception as e:
+            self._fail_pending(e)
+
+    def _fail_pending(self, error: Exception) -> None:
+        self._error = error
+        while self._responses:
+            future, _ = self._responses.popleft()
+            self._window.release()
+            if not future.done():
+                future.set_exception(error)
@@ -2,17 +2,22 @@
 # Licensed under the MIT License, see LICENSE
 # SPDX-License-Identifier: MIT
 
+import os
 import sys
+import json
+import signal
 import argparse
 import logging
 from pathlib import Path
 from contextlib import contextmanager
-from intelhex import IntelHex
-from veriloghex import VerilogHex
-from bincopy import BinFile
 
+# The file format libraries, and the modules only used by a single subcommand, are
+# imported by the functions that need them.  This keeps the start-up time of the CLI
+# and of gdb, which imports this module, down to the cost of the interface itself.
 from .backdoor_memory_interface import BackdoorMemoryInterface
 from . import __version__
+from . import metrics
+from . import trace
 
 LOG = logging.getLogger()
 logging.basicConfig(format="%(levelname)s:%(name)s: %(message)s")
@@ -21,11 +26,11 @@ class IllegalFormatError(Exception):
     pass
 
 @contextmanager
-def file_or_stdout(file):
+def file_or_stdout(file, mode='w'):
     if file is None:
-        yield sys.stdout
+        yield sys.stdout.buffer if 'b' in mode else sys.stdout
     else:
-        with Path(file).open('w') as f:
+        with Path(file).open(mode) as f:
             yield f
             
 
@@ -37,69 +42,388 @@ def int_from_dec_or_hex_string(astring):
         raise argparse.ArgumentError("expecting a hex string or integer for the address")
 
 
+def timeout_from_string(astring):
+    """Converts a timeout in seconds to float, or to None for 0 which means no timeout. """
+    return float(astring) or None
+
+
 def get_format(hexfile):
     try:
         return {
             '.vmem': 'verilog',
             '.hex' : 'intel',
-            '.ihex': 'intel'
+            '.ihex': 'intel',
+            '.elf' : 'elf',
+            '.bin' : 'binary'
         }[hexfile.suffix]
     except KeyError:
         raise IllegalFormatError(
-            f"suffix '{hexfile.suffix}' of file '{hexfile.name}' does not match a supported file format: [.vmem, .hex, .ihex]"
+            f"suffix '{hexfile.suffix}' of file '{hexfile.name}' does not match a supported file format: [.vmem, .hex, .ihex, .elf, .bin]"
         )
 
 
+def parse_target(astring):
+    """Converts a hostname:port argument to a (hostname, port) tuple. """
+    from .fanout import parse_target
+    try:
+        return parse_target(astring)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_port_range(astring):
+    """Converts a first-last port range argument to a range. """
+    from .fanout import parse_port_range
+    try:
+        return parse_port_range(astring)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def open_interface(args):
+    """Returns a BackdoorMemoryInterface configured from the command line arguments.
+
+    With --memory-map this is a MemoryMap routing accesses to the endpoints it names.
+    """
+    if getattr(args, "memory_map", None):
+        from .memory_map import MemoryMap
+        return MemoryMap.load(args.memory_map)
+    bd = BackdoorMemoryInterface(
+        args.hostname,
+        args.port,
+        write_window=getattr(args, "write_window", 0),
+        chunk_size=getattr(args, "chunk_size", None) or BackdoorMemoryInterface.DEFAULT_CHUNK_SIZE,
+        path=getattr(args, "socket", None),
+        probe_timeout=getattr(args, "probe_timeout", BackdoorMemoryInterface.PROBE_TIMEOUT)
+    )
+    trace.attach(bd)
+    if getattr(args, "record", None):
+        from . import record
+        record.attach(bd)
+    return bd
+
+
+def read_image(filename, format=None, address=0):
+    """Parse an image file into a list of (address, data) segments held in memory.
+
+    This is used when the same image is written to several targets.  The .bss part of
+    ELF segments is expanded into explicit zeros.
+    """
+
+    hexfile = Path(filename)
+    format = format or get_format(hexfile)
+
+    if format == 'binary':
+        return [(address, hexfile.read_bytes())]
+    elif format == 'elf':
+        from .elf import ElfFile
+        with ElfFile(hexfile) as elf:
+            return [(s.address, bytes(s.data) + bytes(s.memsz - len(s.data))) for s in elf.segments()]
+    elif format == 'intel':
+        from bincopy import BinFile
+        return [(address, bytes(data)) for address,data in BinFile(str(hexfile)).segments]
+    else:
+        from veriloghex import VerilogHex
+        return [(address, bytes(data)) for address,data in VerilogHex(str(hexfile))]
+
+
+def load_file(bd, filename, format=None, manifest=None, address=0):
+    """Write the contents of a hex file to memory using an open interface.
+
+    Binary files carry no addresses and are loaded at |address|.  When a manifest path
+    is given only the pages that changed since the last load recorded in it are
+    written, and the manifest is updated afterwards.  Returns the number of bytes
+    written.
+    """
+
+    hexfile = Path(filename)
+    format = format or get_format(hexfile)
+
+    if format == 'binary':
+        import mmap
+        if hexfile.stat().st_size == 0:
+            return 0
+        with hexfile.open('rb') as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(m)
+        try:
+            written = write_segments(bd, [(address, view)], manifest)
+        finally:
+            view.release()
+        # On an error the traceback may still hold slices of the view, and closing the
+        # mapping would replace the error with a BufferError, so it's left to be
+        # unmapped when the mapping is freed.
+        m.close()
+        return written
+    elif format == 'elf' and manifest is None:
+        from .elf import load_elf
+        return load_elf(bd, hexfile)
+    with trace.span("parse", file=hexfile.name, format=format):
+        segments = read_image(hexfile, format)
+    return write_segments(bd, segments, manifest)
+
+
+def write_segments(bd, segments, manifest=None):
+    """Write (address, data) segments, only the changed pages of them if |manifest| is given.
+
+    The pages skipped are those whose data matches the manifest and a sample of which
+    was read back from the target, so a page the running program has changed since the
+    last load is only rewritten if it happens to be sampled.  Returns the number of
+    bytes written.
+    """
+    if manifest is None:
+        written = 0
+        for address,data in segments:
+            with trace.span("write", addr=f"{address:#x}", size=len(data)):
+                bd.write_memory_block8(address,data)
+            written += len(data)
+        return written
+
+    from .manifest import LoadManifest
+    manifest = LoadManifest(manifest).read()
+    with trace.span("verify"):
+        manifest.verify(bd)
+    runs = []
+    total = 0
+    for address,data in segments:
+        total += len(data)
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+        runs.extend(manifest.diff(address, data))
+    # Forget the pages about to be written until they have all been flushed
+    manifest.checkpoint()
+    written = 0
+    for run_address,run in runs:
+        with trace.span("write", addr=f"{run_address:#x}", size=len(run)):
+            bd.write_memory_block8(run_address, run)
+        written += len(run)
+    bd.flush()
+    manifest.write()
+    LOG.info(f"differential load wrote {written} of {total} bytes")
+    return written
+
+
+def get_targets(args):
+    """Returns the (hostname, port) targets selected with --target and --ports. """
+    targets = list(getattr(args, "target", None) or [])
+    targets.extend((args.hostname, port) for port in getattr(args, "ports", None) or [])
+    if targets and getattr(args, "memory_map", None):
+        raise ValueError("--target and --ports cannot be combined with --memory-map")
+    return targets
+
+
+def select_region(args, bd):
+    """Sets args.address and args.size to those of the memory map region chosen with --region. """
+    if getattr(args, "region", None):
+        if not hasattr(bd, "region"):
+            raise ValueError("--region needs a --memory-map")
+        region = bd.region(args.region)
+        args.address, args.size = region.start, region.size
+
+
+def run_on_targets(args, targets, func):
+    """Runs func(bd, hostname, port) on all targets concurrently and prints a summary. """
+    from .fanout import fan_out
+
+    results = fan_out(targets, func, write_window=args.write_window, chunk_size=args.chunk_size,
+                      probe_timeout=args.probe_timeout)
+    for result in results:
+        size = f"{result.value} bytes" if isinstance(result.value, int) else ""
+        status = "ok" if result.ok else f"FAILED: {result.error}"
+        print(f"{result.target:<24} {result.elapsed:8.3f}s {size:>16}  {status}", file=sys.stderr)
+    failed = sum(not result.ok for result in results)
+    if failed:
+        raise SystemExit(f"{failed} of {len(results)} targets failed")
+
+
+def _manifest_path(args, bd, hostname, port):
+    if args.manifest:
+        return args.manifest.format(host=hostname, port=port)
+    if args.diff:
+        from .manifest import LoadManifest
+        return LoadManifest.default_path(bd.target)
+    return None
+
+
 def load(args):
     """Load memory from file. """
 
-    hexfile = Path(args.filename)
-    format = args.format or get_format(hexfile)
+    address = getattr(args, "address", 0x800000)
+    targets = get_targets(args)
+    if targets:
+        # Parse the image once and share it between the targets
+        with trace.span("parse", file=Path(args.filename).name):
+            segments = read_image(args.filename, args.format, address)
+        run_on_targets(args, targets, lambda bd, hostname, port: write_segments(
+            bd, segments, _manifest_path(args, bd, hostname, port)
+        ))
+        return
+
+    with open_interface(args) as bd:
+        select_region(args, bd)
+        manifest = _manifest_path(args, bd, args.hostname, args.port)
+        load_file(bd, args.filename, args.format, manifest, getattr(args, "address", address))
+
 
-    with BackdoorMemoryInterface(args.hostname, args.port) as bd:
-        hex = BinFile(hexfile.name) if format == 'intel' else VerilogHex(hexfile.name)
-        for address,data in hex:
-            bd.write_memory_block8(address,data)
+def dump_file(bd, f, address, size, format="hex", chunk_size=0x100000):
+    """Stream |size| bytes from |address| to the open file |f| in the given format.
+
+    The region is read in chunks of |chunk_size| bytes into a single buffer and each
+    chunk is formatted and written before the next is read.
+    """
+    from .formatters import FORMATTERS
+
+    try:
+        formatter = FORMATTERS[format]
+    except KeyError:
+        raise ValueError(f"invalid format '{format}'")
+    # The hexdump and Intel hex outputs have always been relative to the dump address
+    offset = address if format in ("verilog", "binary") else 0
+    buf = bytearray(max(1, min(size, chunk_size)))
+    with formatter(f, offset, size) as out:
+        for n in range(0, size, len(buf)):
+            with trace.span("read", addr=f"{address + n:#x}"):
+                data = bd.read_memory_block8_into(address + n, memoryview(buf)[:min(len(buf), size - n)])
+            with trace.span("format", format=format):
+                out.write(data)
 
 
 def dump(args):
     """Dump memory contents to STDOUT or file. """
 
-    with BackdoorMemoryInterface(args.hostname, args.port) as bd:
-        data = bd.read_memory_block8(args.address, args.size)
-    
-    with file_or_stdout(args.output) as f:
-        if args.format == "verilog":
-            vmem = VerilogHex(data, offset=args.address)
-            a = vmem.tovmem()
-            f.write(a)
-        elif args.format in ['intel', 'hex']:
-            ihex = IntelHex()
-            ihex.frombytes(data)
-            if args.format == 'hex':
-                ihex.dump(f)
-            else:
-                ihex.tofile(f, 'hex')
-        else:
-            raise ValueError(f"invalid format '{args.format}'")
+    mode = 'wb' if args.format == "binary" else 'w'
+    targets = get_targets(args)
+    if targets:
+        if args.output is None:
+            raise ValueError("dumping several targets needs an --output template, e.g. 'dump-{host}-{port}.hex'")
+        def dump_target(bd, hostname, port):
+            with Path(args.output.format(host=hostname, port=port)).open(mode) as f:
+                dump_file(bd, f, args.address, args.size, args.format)
+            return args.size
+        run_on_targets(args, targets, dump_target)
+        return
+
+    with open_interface(args) as bd, file_or_stdout(args.output, mode) as f:
+        dump_file(bd, f, args.address, args.size, args.format)
+
 
 def init(args):
     """Initialize a RAM with a specific byte value. """
 
-    with BackdoorMemoryInterface(args.hostname, args.port) as bd:
-        # The BackdoorMemoryInterface has a maximum payload size of 32KB so
-        # we split anything larger into chunks.
-        chunk_size = 2**15
-        chunks = args.size // chunk_size
-        if args.size % chunk_size:
-            raise ValueError("sizes that are not multiples of 32KB unsupported")
-        address = args.address
-        for _ in range(chunks):
-            bd.write_memory_block8(
-                address,
-                bytearray([args.init_value] * chunk_size)
+    targets = get_targets(args)
+    if targets:
+        def init_target(bd, hostname, port):
+            bd.fill_memory(args.address, args.size, args.init_value)
+            return args.size
+        run_on_targets(args, targets, init_target)
+        return
+
+    with open_interface(args) as bd:
+        select_region(args, bd)
+        with trace.span("fill", addr=f"{args.address:#x}", size=args.size):
+            bd.fill_memory(args.address, args.size, args.init_value)
+
+
+def serve(args):
+    """Run the reference backdoor server until interrupted. """
+    from .server import BackdoorServer
+
+    memory = None
+    if args.replay:
+        from .record import ReplayMemory
+        memory = ReplayMemory(args.replay)
+    server = BackdoorServer(
+        args.hostname,
+        args.port,
+        memory=memory,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        capabilities=0 if args.legacy else BackdoorMemoryInterface.CAP_FILL
+    )
+    LOG.info(f"serving backdoor memory on {server.hostname}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+def replay(args):
+    """Re-issue a recorded session against the simulator and report the timing as JSON. """
+    from .record import replay as replay_session
+
+    with open_interface(args) as bd:
+        results = replay_session(args.filename, bd, realtime=args.realtime, verify=args.verify)
+    results["target"] = bd.target
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    if results["mismatches"]:
+        raise SystemExit(f"{results['mismatches']} reads differed from the recording")
+
+
+def daemon(args):
+    """Run a broker that holds the simulator connection for clients on a Unix socket. """
+    from .daemon import (BackdoorDaemon, detach)
+
+    if not args.socket:
+        raise ValueError("the daemon needs a socket path, use --socket or set BD_SOCKET")
+
+    broker = BackdoorDaemon(
+        args.socket,
+        args.hostname,
+        args.port,
+        write_window=args.write_window,
+        chunk_size=args.chunk_size,
+        probe_timeout=args.probe_timeout
+    )
+    LOG.info(f"forwarding {broker.target} to {args.hostname}:{args.port}")
+    try:
+        if args.detach:
+            detach(args.log_file or f"{args.socket}.log")
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.stop()
+
+
+def bench(args):
+    """Benchmark the backdoor interface and report the results as JSON. """
+    from .bench import run as run_benchmarks, DEFAULT_CHUNK_SIZES
+    from .server import BackdoorServer
+
+    if getattr(args, "memory_map", None):
+        # The benchmarks tune the chunk size and probe the server of a single endpoint
+        raise ValueError("bench measures a single endpoint and cannot be used with --memory-map, "
+                         "select the endpoint with --hostname/--port or --socket instead")
+
+    def run(hostname, port):
+        args.hostname, args.port = hostname, port
+        with open_interface(args) as bd:
+            results = run_benchmarks(
+                bd,
+                args.address,
+                args.size,
+                chunk_sizes=args.chunk_sizes or DEFAULT_CHUNK_SIZES,
+                iterations=args.iterations,
+                latency_iterations=args.latency_iterations,
+                benchmarks=args.benchmarks
             )
-            address += chunk_size
+        results["target"] = "local" if args.local else f"{hostname}:{port}"
+        return results
+
+    if args.local:
+        args.socket = None
+        with BackdoorServer("localhost", 0) as server:
+            results = run(*server.address)
+    else:
+        results = run(args.hostname, args.port)
+
+    with file_or_stdout(args.output) as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
 
 
 formatter = lambda prog: argparse.RawTextHelpFormatter(prog, max_help_position=80, width=200)
@@ -130,6 +454,77 @@ def parse_args():
         type=int,
         help="specify the port (default: %(default)s)"
     )
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get("BD_SOCKET"),
+        type=str,
+        help="connect through the `bd daemon` listening on this Unix socket (default: $BD_SOCKET)"
+    )
+    parser.add_argument(
+        "--memory-map",
+        default=os.environ.get("BD_MEMORY_MAP"),
+        type=str,
+        metavar="FILE",
+        help="route accesses to the endpoints of the regions in this TOML or YAML memory map (default: $BD_MEMORY_MAP)"
+    )
+    parser.add_argument(
+        "--target",
+        action="append",
+        type=parse_target,
+        metavar="HOST:PORT",
+        help="run init, load or dump on this simulator, may be repeated to address several concurrently"
+    )
+    parser.add_argument(
+        "--ports",
+        type=parse_port_range,
+        metavar="FIRST-LAST",
+        help="run init, load or dump concurrently on the simulators at --hostname listening on these ports"
+    )
+    parser.add_argument(
+        "--write-window",
+        default=0,
+        type=int,
+        help="number of write ACKs that may be outstanding, 0 waits for every ACK (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        default=BackdoorMemoryInterface.DEFAULT_CHUNK_SIZE,
+        type=int_from_dec_or_hex_string,
+        help="maximum number of bytes per backdoor transaction (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--probe-timeout",
+        default=BackdoorMemoryInterface.PROBE_TIMEOUT,
+        type=timeout_from_string,
+        metavar="SECONDS",
+        help="treat the simulator as not supporting the extended opcodes if it does not answer the capability probe in time, 0 to wait for the answer (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="record the transactions and phases of the command as Chrome trace JSON, viewable in Perfetto"
+    )
+    parser.add_argument(
+        "--record",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="record every access made by the command to FILE for `bd replay`, compressed if FILE ends in .gz"
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="report transaction counts, bytes transferred and latencies on stderr when the command completes"
+    )
+    parser.add_argument(
+        "--prometheus",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="write the --stats metrics to FILE in the Prometheus text format"
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -160,31 +555,62 @@ def parse_args():
         type=int_from_dec_or_hex_string,
         help="specify the size of the memory in bytes (default: %(default)s)"
     )
+    parser_init.add_argument(
+        "--region",
+        type=str,
+        default=None,
+        help="initialize this region of the --memory-map instead of --address and --size"
+    )
     parser_init.set_defaults(func=init)
 
 
     # load subparser
     parser_load = subparsers.add_parser(
         "load",
-        help="load memory from a file (supported formats are Verilog hex and Intel hex)"
+        help="load memory from a file (supported formats are Verilog hex, Intel hex, ELF and raw binary)"
     )
     parser_load.add_argument(
         "filename",
-        help="specify the input file name (format auto-detected with .vmem and .[i]hex file extensions)"
+        help="specify the input file name (format auto-detected with .vmem, .[i]hex, .elf and .bin file extensions)"
     )
     parser_load.add_argument(
         "-f",
         "--format",
-        choices=["intel", "verilog"],
+        choices=["intel", "verilog", "elf", "binary"],
         help="override the file type detection"
     )
+    parser_load.add_argument(
+        "--address",
+        default=0x800000,
+        type=int_from_dec_or_hex_string,
+        help="load address for binary files (default: %(default)s)"
+    )
+    parser_load.add_argument(
+        "--diff",
+        action="store_true",
+        help="only write the pages that changed since the last differential load of this target.  A sample of the "
+             "recorded pages is read back to check that the target still holds them, but pages the program has "
+             "modified since, such as its .data and .bss, are skipped unless sampled, so do a full load after running it"
+    )
+    parser_load.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="manifest file recording the last load, implies --diff, {host} and {port} are replaced (default: one per target under ~/.cache/verilator_mem_if)"
+    )
+    parser_load.add_argument(
+        "--region",
+        type=str,
+        default=None,
+        help="load binary files at the start of this region of the --memory-map"
+    )
     parser_load.set_defaults(func=load)
 
 
     # dump parser
     parser_dump = subparsers.add_parser(
         "dump",
-        help="dump memory to a file or stdout (supported formats are hexdump, Intel hex and Verilog hex)"
+        help="dump memory to a file or stdout (supported formats are hexdump, Intel hex, Verilog hex and raw binary)"
     )
     parser_dump.add_argument(
         "address",
@@ -193,14 +619,14 @@ def parse_args():
     )
     parser_dump.add_argument(
         "size",
-        type=int,
+        type=int_from_dec_or_hex_string,
         help="number of bytes to dump"
     )
     parser_dump.add_argument(
         "-f",
         "--format",
         default="hex",
-        choices=["hex", "intel", "verilog"],
+        choices=["hex", "intel", "verilog", "binary"],
         help="the dump format to use (default: %(default)s)"
     )
     parser_dump.add_argument(
@@ -215,10 +641,140 @@ def parse_args():
         "--output",
         type=str,
         default=None,
-        help="dump to a file instead of STDOUT"
+        help="dump to a file instead of STDOUT, {host} and {port} are replaced when dumping several targets"
     )
     parser_dump.set_defaults(func=dump)
 
+
+    # serve parser
+    parser_serve = subparsers.add_parser(
+        "serve",
+        help="run a reference backdoor server on --hostname/--port, backed by a sparse memory"
+    )
+    parser_serve.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="artificial latency added to every transaction in seconds (default: %(default)s)"
+    )
+    parser_serve.add_argument(
+        "--bandwidth",
+        type=float,
+        default=None,
+        help="limit payload transfers to this many bytes per second (default: unlimited)"
+    )
+    parser_serve.add_argument(
+        "--legacy",
+        action="store_true",
+        help="emulate a server without the FILL and PROBE protocol extensions"
+    )
+    parser_serve.add_argument(
+        "--replay",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="answer reads with the data recorded in a `--record` session log"
+    )
+    parser_serve.set_defaults(func=serve)
+
+
+    # replay parser
+    parser_replay = subparsers.add_parser(
+        "replay",
+        help="re-issue the accesses of a session recorded with --record and report the timing as JSON"
+    )
+    parser_replay.add_argument(
+        "filename",
+        help="the session log to replay"
+    )
+    parser_replay.add_argument(
+        "--realtime",
+        action="store_true",
+        help="issue each access at its recorded time instead of as fast as possible"
+    )
+    parser_replay.add_argument(
+        "--verify",
+        action="store_true",
+        help="compare the data read with the recording and fail on any difference"
+    )
+    parser_replay.set_defaults(func=replay)
+
+
+    # daemon parser
+    parser_daemon = subparsers.add_parser(
+        "daemon",
+        help="hold a persistent connection to --hostname/--port and serve it to clients on the --socket Unix socket"
+    )
+    parser_daemon.add_argument(
+        "--detach",
+        action="store_true",
+        help="fork into the background once the socket is listening"
+    )
+    parser_daemon.add_argument(
+        "--log-file",
+        default=None,
+        help="where a detached daemon writes its log (default: the socket path with a .log suffix)"
+    )
+    parser_daemon.set_defaults(func=daemon)
+
+
+    # bench parser
+    from .bench import DEFAULT_CHUNK_SIZES
+    parser_bench = subparsers.add_parser(
+        "bench",
+        help="measure backdoor latency and throughput and report the results as JSON (overwrites the memory region used)"
+    )
+    parser_bench.add_argument(
+        "--address",
+        default=0x800000,
+        type=int_from_dec_or_hex_string,
+        help="start address of a scratch memory region to benchmark (default: %(default)s)"
+    )
+    parser_bench.add_argument(
+        "--size",
+        default=0x100000,
+        type=int_from_dec_or_hex_string,
+        help="number of bytes to transfer for the block and load benchmarks (default: %(default)s)"
+    )
+    parser_bench.add_argument(
+        "--chunk-sizes",
+        default=None,
+        type=lambda s: [int_from_dec_or_hex_string(x) for x in s.split(',')],
+        help=f"comma separated list of chunk sizes for the bandwidth benchmark (default: {','.join(map(hex, DEFAULT_CHUNK_SIZES))})"
+    )
+    parser_bench.add_argument(
+        "--iterations",
+        default=3,
+        type=int,
+        help="repetitions of each block, load and conversion benchmark (default: %(default)s)"
+    )
+    parser_bench.add_argument(
+        "--latency-iterations",
+        default=1000,
+        type=int,
+        help="repetitions of each single word access (default: %(default)s)"
+    )
+    parser_bench.add_argument(
+        "--benchmarks",
+        nargs="+",
+        default=["latency", "bandwidth", "load", "conversion"],
+        choices=["latency", "bandwidth", "load", "conversion"],
+        help="the benchmarks to run (default: all)"
+    )
+    parser_bench.add_argument(
+        "--local",
+        action="store_true",
+        help="benchmark against an in-process reference server instead of --hostname/--port"
+    )
+    parser_bench.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="write the JSON report to a file instead of STDOUT"
+    )
+    parser_bench.set_defaults(func=bench)
+
     args = parser.parse_args()
 
     if hasattr(args, "func"):
@@ -237,7 +793,32 @@ def main():
     level = logging.DEBUG if args.debug else logging.INFO
     LOG.setLevel(level)
     
-    args.func(args)
+    if args.trace:
+        trace.enable()
+    if args.record:
+        from . import record
+        record.start(args.record)
+    if args.stats or args.prometheus:
+        stats = metrics.enable_aggregate()
+        targets = get_targets(args)
+        if targets:
+            stats.target = f"{len(targets)} targets"
+        elif args.memory_map:
+            stats.target = f"map:{args.memory_map}"
+        else:
+            stats.target = f"unix:{args.socket}" if args.socket else f"{args.hostname}:{args.port}"
+    try:
+        with trace.span(args.func.__name__, category="command"):
+            args.func(args)
+    finally:
+        if args.trace:
+            trace.disable().export(args.trace)
+        if args.record:
+            record.stop()
+        if args.stats:
+            sys.stderr.write(stats.report())
+        if args.prometheus:
+            Path(args.prometheus).write_text(stats.prometheus(labels={"command": args.func.__name__}))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
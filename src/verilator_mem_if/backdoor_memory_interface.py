@@ -6,14 +6,16 @@ import logging
 import socket
 import struct
 import threading
-from time import sleep
-from typing import (Callable, Sequence, Union)
+from time import (perf_counter, sleep)
+from typing import (Callable, Optional, Sequence, Union)
 from ._version import version as plugin_version
+from .access import MemoryAccessMixin
 from .conversion import *
+from . import metrics
 
 LOG = logging.getLogger(__name__)
 
-class BackdoorMemoryInterface:
+class BackdoorMemoryInterface(MemoryAccessMixin):
     """@brief A backdoor memory interface for use with a simulation model.
 
     Each read/write request has two phases, a header and a payload.  The header defines
@@ -29,38 +31,100 @@ class BackdoorMemoryInterface:
 
       address : the byte address of the access
       size    : the number of bytes to write or read
-      rnw     : read-not-write bit (read = 1)
+      rnw     : read-not-write bit (read = 1), or one of the extended opcodes below
 
     A write access comprises the header, the data payload and an acknowledge byte.
 
     A read access comprises the header and a data payload only.
 
+    Servers may optionally implement the following extended opcodes:
+
+      PROBE (rnw = 3) : a header with address and size of 0.  The server replies with
+                        PROBE_REPLY followed by a byte of CAP_* capability flags.
+      FILL  (rnw = 2) : |size| is the length of a repeating pattern.  The payload is
+                        an unsigned int byte count followed by the pattern, which the
+                        server repeats from |address| before sending an acknowledge.
+
+    Servers that predate the extensions treat a PROBE as an empty write and reply with
+    an ACK, which capabilities() detects, and fill_memory() then falls back to chunked
+    writes.  Some servers never reply to a PROBE at all, so the reply is awaited for at
+    most |probe_timeout| seconds, or indefinitely if it is None.  When it expires the
+    server is treated as a legacy one and the connection is re-opened, so that a late
+    reply can never be mistaken for the response to a later transaction.
+
+    As |size| is 16 bits wide, larger reads and writes are transparently split into
+    transactions of at most |chunk_size| bytes.  The chunk size can be tuned per
+    interface up to MAX_TRANSFER_SIZE.
+
+    Writes can optionally be pipelined by setting |write_window| to the number of write
+    acknowledges that may be left outstanding.  Headers and payloads are then sent back
+    to back and the ACKs are collected later, either once the window is full, before the
+    next read, or when flush() is called.  The default of 0 waits for the ACK of every
+    write before returning.
+
     """
 
     WRITE = 0x0
     READ  = 0x1
+    FILL  = 0x2
+    PROBE = 0x3
     ACK   = 0x15
 
-    def __init__(self, hostname: str = "localhost", port: int = 5557) -> None:
+    PROBE_REPLY = 0x06
+    CAP_FILL    = 0x1
+
+    HEADER = struct.Struct('I H B')
+    FILL_LENGTH = struct.Struct('I')
+
+    # Bound on the reply bytes a batch leaves unread while it is still sending, so that
+    # a server blocked on a full socket buffer can never stall the batch
+    BATCH_REPLY_WINDOW = 0x10000
+    IOV_MAX = 1024
+
+    MAX_TRANSFER_SIZE  = 0xffff
+    DEFAULT_CHUNK_SIZE = 0x8000
+
+    PROBE_TIMEOUT = 1.0
+
+    def __init__(self,
+                 hostname: str = "localhost",
+                 port: int = 5557,
+                 write_window: int = 0,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 path: Optional[str] = None,
+                 probe_timeout: Optional[float] = PROBE_TIMEOUT
+                 ) -> None:
+        if write_window < 0:
+            raise ValueError(f"write_window must be >= 0, got {write_window}")
         self._hostname = hostname
-        self._port = int(port)
-        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._port = None if path else int(port)
+        self._path = str(path) if path else None
+        self._write_window = int(write_window)
+        self.chunk_size = chunk_size
+        self.probe_timeout = probe_timeout
+        self._pending_acks = 0
+        self._capabilities = None
+        self._sock = self._new_socket()
         self._lock = threading.Lock()
+        self._metrics = metrics.Metrics(self.target, parent=metrics.aggregate())
 
     def __enter__(self):
         self.connect()
         return self
 
-    def __exit__(self, *exc):
-        self.close()
+    def __exit__(self, exc_type, *exc):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
 
     def connect(self):
         try:
-            self._sock.connect((self._hostname, self._port))
-            LOG.debug(f"connected to {self._hostname}:{self._port}")
+            self._sock.connect(self._path or (self._hostname, self._port))
+            LOG.debug(f"connected to {self.target}")
         except Exception as e:
-            LOG.error(f"socket connect() failed when using {self._hostname}:{self._port}")
+            LOG.error(f"socket connect() failed when using {self.target}")
             raise e
 
     def close(self):
@@ -68,47 +132,79 @@ class BackdoorMemoryInterface:
         if self._lock.locked():
             self._lock.release()
 
-    def write_memory(self, addr: int, data: int, transfer_size: int = 32, **kwargs) -> None:
-        """@brief Write a single memory location. """
-        assert transfer_size in (8, 16, 32)
-        addr &= 0xffffffff
-        if transfer_size == 32:
-            self._write_mem8(addr, u32le_list_to_byte_list([data]))
-        elif transfer_size == 16:
-            self._write_mem8(addr, u16le_list_to_byte_list([data]))
-        elif transfer_size == 8:
-            self._write_mem8(addr, [data])
-
-    def read_memory(self, addr: int, transfer_size: int = 32, now: bool = True, **kwargs) -> Union[int, Callable[[], int]]:
-        """@brief Read a single memory location. """
-        assert transfer_size in (8, 16, 32)
-        addr &= 0xffffffff
-        if transfer_size == 32:
-            result = byte_list_to_u32le_list(self._read_mem8(addr, 4))[0]
-        elif transfer_size == 16:
-            result = byte_list_to_u16le_list(self._read_mem8(addr, 2))[0]
-        elif transfer_size == 8:
-            result = self._read_mem8(addr, 1)[0]
-
-        def read_callback():
-            return result
-        return result if now else read_callback
-
-    def write_memory_block32(self, addr: int, data: Sequence[int]) -> None:
-        """@brief Write an aligned block of 32-bit words."""
-        self._write_mem8(addr, u32le_list_to_byte_list(data))
-
-    def read_memory_block32(self, addr: int, size: int) -> Sequence[int]:
-        """@brief Read an aligned block of 32-bit words."""
-        return byte_list_to_u32le_list(self._read_mem8(addr, size*4))
-
-    def write_memory_block8(self, addr: int, data: Sequence[int]) -> None:
-        """@brief Write a block of bytes. """
-        self._write_mem8(addr, data)
-
-    def read_memory_block8(self, addr: int, size: int) -> Sequence[int]:
-        """@brief Read a block of bytes. """
-        return self._read_mem8(addr, size)
+    @property
+    def target(self) -> str:
+        """@brief The endpoint as a `hostname:port` or `unix:path` string. """
+        return f"unix:{self._path}" if self._path else f"{self._hostname}:{self._port}"
+
+    @property
+    def chunk_size(self) -> int:
+        """@brief The maximum number of bytes sent in a single transaction. """
+        return self._chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, size: int) -> None:
+        size = int(size)
+        if not 0 < size <= self.MAX_TRANSFER_SIZE:
+            raise ValueError(f"chunk_size must be in the range 1-{self.MAX_TRANSFER_SIZE}, got {size}")
+        self._chunk_size = size
+
+    @property
+    def pending_writes(self) -> int:
+        """@brief The number of writes still waiting to be acknowledged. """
+        return self._pending_acks
+
+    def fill_memory(self, addr: int, size: int, pattern: Union[bytes, int] = b'\xff') -> None:
+        """@brief Fill |size| bytes from |addr| by repeating |pattern|.
+
+        Uses the FILL opcode when the server supports it, which makes the cost of the
+        fill independent of its size, and otherwise writes the pattern in chunks.
+        """
+        if isinstance(pattern, int):
+            pattern = bytes([pattern])
+        pattern = bytes(pattern)
+        if not 0 < len(pattern) <= self.MAX_TRANSFER_SIZE:
+            raise ValueError(f"pattern length must be in the range 1-{self.MAX_TRANSFER_SIZE}, got {len(pattern)}")
+        if size <= 0:
+            return
+        if self.capabilities() & self.CAP_FILL:
+            # The byte count is 32 bits wide so only giant fills need splitting
+            step = 0xffffffff - 0xffffffff % len(pattern)
+            for offset in range(0, size, step):
+                self._fill_mem8(addr + offset, min(size - offset, step), pattern)
+            return
+        # Keep each block a whole number of patterns so that the phase is preserved
+        block_size = max(len(pattern), self._chunk_size - self._chunk_size % len(pattern))
+        block = memoryview(pattern * (block_size // len(pattern)))
+        for offset in range(0, size, block_size):
+            self._write_mem8(addr + offset, block[:min(block_size, size - offset)])
+
+    def batch(self) -> "Batch":
+        """@brief Returns a Batch for queueing reads and writes to run back to back.
+
+        Used as a context manager the batch is executed on exit.
+        """
+        from .batch import Batch
+        return Batch(self)
+
+    def capabilities(self) -> int:
+        """@brief Returns the CAP_* flags supported by the server, probing on first use. """
+        if self._capabilities is None:
+            self._capabilities = self._probe()
+            LOG.debug(f"server capabilities: {self._capabilities:#x}")
+        return self._capabilities
+
+    def stats(self) -> metrics.Metrics:
+        """@brief Returns the transaction, byte and latency metrics of this interface. """
+        return self._metrics
+
+    def flush(self) -> None:
+        """@brief Wait for the ACK of every outstanding write.
+
+        This acts as a barrier when writes are pipelined, raising if any of the
+        outstanding writes was not acknowledged correctly.
+        """
+        self._flush()
 
     # Private methods
 
@@ -120,42 +216,206 @@ class BackdoorMemoryInterface:
         """
         def _locked(self, *args, **kwargs):
             self._lock.acquire()
-            ret = func(self, *args, **kwargs)
-            self._lock.release()
-            return ret
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                # close() may have released it already
+                if self._lock.locked():
+                    self._lock.release()
         return _locked
 
+    @staticmethod
+    def _as_payload(data) -> memoryview:
+        """Returns |data| as a byte memoryview, only copying if it isn't a buffer. """
+        try:
+            return memoryview(data).cast('B')
+        except TypeError:
+            assert isinstance(data, Sequence), "`data` must be byte Sequence"
+            return memoryview(bytearray(data))
+
     @_threadlocked
     def _write_mem8(self, addr: int, data: Sequence[int]):
-        assert isinstance(data, Sequence), "`data` must be byte Sequence"
-        self._send_header(addr, len(data), self.WRITE)
-        self._send_payload(bytearray(data))
+        start = perf_counter()
+        payload = self._as_payload(data)
+        length = len(payload)
+        transactions = 0
+        try:
+            for offset, size in self._chunks(length):
+                chunk = payload[offset:offset + size]
+                try:
+                    self._send_header(addr + offset, size, self.WRITE)
+                    self._send_payload(chunk)
+                finally:
+                    # Views of a caller's mmap left in a traceback would stop it closing
+                    chunk.release()
+                transactions += 1
+        finally:
+            payload.release()
+        self._metrics.observe("write", perf_counter() - start, transactions, written=length)
 
     @_threadlocked
-    def _read_mem8(self, addr: int, size: int) -> Sequence[int]:
-        self._send_header(addr, size, self.READ)
-        return self._recv_payload(size)
+    def _read_mem8_into(self, addr: int, view: memoryview) -> None:
+        start = perf_counter()
+        chunks = list(self._chunks(len(view)))
+        if not chunks:
+            return
+        self._send_header(addr, chunks[0][1], self.READ)
+        # Any outstanding ACKs precede the read data on the stream
+        self._recv_acks(self._pending_acks)
+        for i, (offset, chunk) in enumerate(chunks):
+            # Keep the next request queued at the server while this payload drains
+            if i + 1 < len(chunks):
+                next_offset, next_size = chunks[i + 1]
+                self._send_header(addr + next_offset, next_size, self.READ)
+            self._recv_payload(view[offset:offset + chunk])
+        self._metrics.observe("read", perf_counter() - start, len(chunks), read=len(view))
+
+    @_threadlocked
+    def _fill_mem8(self, addr: int, size: int, pattern: bytes) -> None:
+        start = perf_counter()
+        self._send_header(addr, len(pattern), self.FILL)
+        self._send_payload(self.FILL_LENGTH.pack(size) + pattern)
+        self._metrics.observe("fill", perf_counter() - start, written=size)
+
+    def _new_socket(self) -> socket.socket:
+        if self._path:
+            return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    @_threadlocked
+    def _probe(self) -> int:
+        self._recv_acks(self._pending_acks)
+        self._send_header(0, 0, self.PROBE)
+        self._sock.settimeout(self.probe_timeout)
+        try:
+            reply = self._recv_bytes(1)[0]
+        except socket.timeout:
+            # The server either ignored the probe or is slower than probe_timeout, in
+            # which case its reply is still to come.  A new connection discards it.
+            LOG.warning(f"no reply to the capability probe of {self.target} within {self.probe_timeout}s, reconnecting")
+            self._sock.close()
+            self._sock = self._new_socket()
+            self.connect()
+            return 0
+        finally:
+            self._sock.settimeout(None)
+        if reply == self.ACK:
+            # An old server treated the probe as an empty write
+            return 0
+        assert reply == self.PROBE_REPLY, "invalid PROBE reply received, got %s" % reply
+        return self._recv_bytes(1)[0]
+
+    @_threadlocked
+    def _flush(self) -> None:
+        if self._pending_acks:
+            start = perf_counter()
+            self._recv_acks(self._pending_acks)
+            self._metrics.observe("flush", perf_counter() - start, transactions=0)
+
+    @_threadlocked
+    def _transact(self, transactions: Sequence) -> None:
+        """Runs (addr, rnw, view) transactions back to back.
+
+        |view| is the payload of a write or the buffer a read fills, and must not exceed
+        chunk_size.  The requests are gathered into as few sends as possible, in windows
+        bounded by BATCH_REPLY_WINDOW, and the replies are collected after each window.
+        """
+        started = perf_counter()
+        self._recv_acks(self._pending_acks)
+        start = 0
+        while start < len(transactions):
+            buffers = []
+            reply_bytes = 0
+            end = start
+            for addr, rnw, view in transactions[start:]:
+                size = len(view) if rnw == self.READ else 1
+                if end > start and reply_bytes + size > self.BATCH_REPLY_WINDOW:
+                    break
+                buffers.append(self.HEADER.pack(addr, len(view), rnw))
+                if rnw != self.READ:
+                    buffers.append(view)
+                reply_bytes += size
+                end += 1
+            self._send_buffers(buffers)
+            acks = 0
+            for addr, rnw, view in transactions[start:end]:
+                if rnw == self.READ:
+                    self._pending_acks += acks
+                    self._recv_acks(acks)
+                    acks = 0
+                    self._recv_payload(view)
+                else:
+                    acks += 1
+            self._pending_acks += acks
+            self._recv_acks(acks)
+            start = end
+        self._metrics.observe(
+            "batch",
+            perf_counter() - started,
+            len(transactions),
+            read=sum(len(view) for _, rnw, view in transactions if rnw == self.READ),
+            written=sum(len(view) for _, rnw, view in transactions if rnw != self.READ)
+        )
+
+    def _chunks(self, size: int):
+        """Yields (offset, size) tuples splitting |size| bytes into transactions. """
+        for offset in range(0, size, self._chunk_size):
+            yield offset, min(self._chunk_size, size - offset)
 
     def _send_header(self, addr: int, size: int, rnw: int) -> None:
         header = (addr, size, rnw)
-        self._sock.sendall(struct.pack('I H B', *header))
+        self._sock.sendall(self.HEADER.pack(*header))
 
-    def _send_payload(self, bytes: bytearray):
+    def _send_payload(self, bytes: Union[bytearray, memoryview]):
         LOG.debug(f"sending {len(bytes)} bytes")
         self._sock.sendall(bytes)
-        LOG.debug("waiting for ack")
-        self._recv_ack()
-
-    def _recv_payload(self, size: int) -> Sequence[int]:
-        return self._recv_bytes(size)
+        self._pending_acks += 1
+        if self._pending_acks > self._write_window:
+            LOG.debug("waiting for ack")
+            self._recv_acks(self._pending_acks - self._write_window)
+
+    def _send_buffers(self, buffers: list) -> None:
+        """Sends a list of buffers, gathered into a single sendmsg() where supported. """
+        if not hasattr(self._sock, "sendmsg"):
+            self._sock.sendall(b''.join(buffers))
+            return
+        LOG.debug(f"sending {len(buffers)} buffers")
+        index = 0
+        while index < len(buffers):
+            sent = self._sock.sendmsg(buffers[index:index + self.IOV_MAX])
+            # Skip the buffers that were sent completely and trim a partially sent one
+            while index < len(buffers) and sent >= len(buffers[index]):
+                sent -= len(buffers[index])
+                index += 1
+            if sent:
+                buffers[index] = memoryview(buffers[index])[sent:]
+
+    def _recv_payload(self, view: memoryview) -> None:
+        self._recv_into(view)
 
     def _recv_ack(self) -> None:
-        ack = self._recv_bytes(1)[0]
-        assert ack == self.ACK, "invalid ACK received, got %s" % ack
-
-    def _recv_bytes(self, size: int) -> Sequence[int]:
-        data = bytearray()
-        while (len(data) < size):
-            n = self._sock.recv(1024)
-            data += n
-        return list(data)
+        self._recv_acks(1)
+
+    def _recv_acks(self, count: int) -> None:
+        if not count:
+            return
+        acks = self._recv_bytes(count)
+        self._pending_acks -= count
+        for ack in acks:
+            assert ack == self.ACK, "invalid ACK received, got %s" % ack
+
+    def _recv_bytes(self, size: int) -> bytearray:
+        data = bytearray(size)
+        self._recv_into(memoryview(data))
+        return data
+
+    def _recv_into(self, view: memoryview) -> None:
+        received = 0
+        while received < len(view):
+            # Never read past the view, pipelined ACKs may be followed by read data
+            n = self._sock.recv_into(view[received:])
+            if not n:
+                raise ConnectionError(f"connection to {self.target} closed")
+            received += n
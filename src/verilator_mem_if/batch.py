@@ -0,0 +1,140 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import logging
+from typing import (List, Sequence)
+
+LOG = logging.getLogger(__name__)
+
+class BatchRead:
+    """@brief The result of a read queued on a Batch, available once it has executed. """
+
+    def __init__(self, addr: int, size: int) -> None:
+        self.address = addr
+        self.size = size
+        self._data = None
+
+    @property
+    def done(self) -> bool:
+        return self._data is not None
+
+    @property
+    def data(self) -> bytearray:
+        """@brief The bytes read. """
+        if self._data is None:
+            raise RuntimeError("the batch has not been executed yet")
+        return self._data
+
+    @property
+    def value(self) -> int:
+        """@brief The bytes read as a little endian integer. """
+        return int.from_bytes(self.data, 'little')
+
+
+class Batch:
+    """@brief A queue of reads and writes executed back to back on one interface.
+
+    Each queued access would otherwise lock the interface, send its request and wait for
+    the reply on its own.  A batch instead sends all the requests with as few sendmsg()
+    calls as possible and then collects the replies, so the round trip to the simulator
+    is paid once rather than per access.
+
+    Accesses are executed in the order they were queued.  With |coalesce| consecutive
+    writes, or consecutive reads, to adjacent addresses are merged into single
+    transactions first.  Write data is referenced rather than copied, so it must not be
+    modified before the batch executes.
+
+        with bd.batch() as batch:
+            batch.write(0x1000, descriptor)
+            batch.write_memory(0x2000, 1)
+            status = batch.read_memory(0x2004)
+        print(status.value)
+
+    """
+
+    def __init__(self, bd) -> None:
+        self._bd = bd
+        self._ops = []
+        self._reads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.execute()
+
+    def __len__(self) -> int:
+        """Returns the number of queued accesses. """
+        return len(self._ops)
+
+    def write(self, addr: int, data: Sequence[int]) -> None:
+        """@brief Queue a write of a block of bytes. """
+        payload = self._bd._as_payload(data)
+        if len(payload):
+            self._ops.append((addr, self._bd.WRITE, payload))
+
+    def write_memory(self, addr: int, data: int, transfer_size: int = 32) -> None:
+        """@brief Queue a write of a single 8, 16 or 32-bit memory location. """
+        assert transfer_size in (8, 16, 32)
+        self.write(addr & 0xffffffff, (data & ((1 << transfer_size) - 1)).to_bytes(transfer_size // 8, 'little'))
+
+    def read(self, addr: int, size: int) -> BatchRead:
+        """@brief Queue a read of |size| bytes, returning a handle to its result. """
+        result = BatchRead(addr, size)
+        self._reads.append(result)
+        if size:
+            self._ops.append((addr, self._bd.READ, result))
+        else:
+            result._data = bytearray()
+        return result
+
+    def read_memory(self, addr: int, transfer_size: int = 32) -> BatchRead:
+        """@brief Queue a read of a single 8, 16 or 32-bit memory location. """
+        assert transfer_size in (8, 16, 32)
+        return self.read(addr & 0xffffffff, transfer_size // 8)
+
+    def execute(self, coalesce: bool = True) -> List[bytearray]:
+        """@brief Run the queued accesses and return the data of every read in order.
+
+        The queue is emptied, so the batch can be reused.
+        """
+        ops, self._ops = self._ops, []
+        results, self._reads = self._reads, []
+        runs = self._coalesce(ops) if coalesce else [(addr, rnw, [op]) for addr, rnw, op in ops]
+        transactions = []
+        reads = []
+        for addr, rnw, parts in runs:
+            if rnw == self._bd.WRITE:
+                data = parts[0] if len(parts) == 1 else memoryview(b''.join(parts))
+            else:
+                data = memoryview(bytearray(sum(part.size for part in parts)))
+                reads.append((data, parts))
+            for offset, size in self._bd._chunks(len(data)):
+                transactions.append((addr + offset, rnw, data[offset:offset + size]))
+        LOG.debug(f"executing {len(ops)} accesses as {len(transactions)} transactions")
+        self._bd._transact(transactions)
+        # Hand the data of merged reads back to the individual results
+        for data, parts in reads:
+            if len(parts) == 1:
+                parts[0]._data = data.obj
+                continue
+            offset = 0
+            for part in parts:
+                part._data = bytearray(data[offset:offset + part.size])
+                offset += part.size
+        return [result.data for result in results]
+
+    def _coalesce(self, ops: Sequence) -> list:
+        """Returns (addr, rnw, parts) runs merging consecutive adjacent accesses. """
+        runs = []
+        end = None
+        for addr, rnw, op in ops:
+            size = len(op) if rnw == self._bd.WRITE else op.size
+            if runs and runs[-1][1] == rnw and addr == end:
+                runs[-1][2].append(op)
+            else:
+                runs.append((addr, rnw, [op]))
+            end = addr + size
+        return runs
@@ -0,0 +1,158 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Throughput and latency benchmarks for the backdoor interface.
+
+Each benchmark returns a JSON serializable dict so that results can be archived and
+compared between releases.  The benchmarks write to the memory under test, so they
+should only be pointed at a scratch region.
+"""
+
+import os
+# statistics, tempfile and platform are imported on use, which keeps importing this
+# module for DEFAULT_CHUNK_SIZES cheap when the command line parser is built
+from pathlib import Path
+from time import perf_counter
+from typing import (Callable, Sequence)
+from . import __version__
+from . import conversion
+from .backdoor_memory_interface import BackdoorMemoryInterface
+
+DEFAULT_CHUNK_SIZES = (0x400, 0x1000, 0x4000, 0x8000, 0xffff)
+
+def _timings(func: Callable[[], None], iterations: int) -> Sequence[float]:
+    """Returns the duration of each of |iterations| calls to |func| in seconds. """
+    timings = []
+    for _ in range(iterations):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return timings
+
+def _latency_summary(timings: Sequence[float]) -> dict:
+    import statistics
+    timings = sorted(timings)
+    return {
+        "iterations": len(timings),
+        "mean_us"   : statistics.mean(timings) * 1e6,
+        "median_us" : statistics.median(timings) * 1e6,
+        "p99_us"    : timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6,
+        "min_us"    : timings[0] * 1e6,
+        "max_us"    : timings[-1] * 1e6,
+    }
+
+def _bandwidth_summary(size: int, timings: Sequence[float]) -> dict:
+    import statistics
+    best = min(timings)
+    return {
+        "bytes"     : size,
+        "iterations": len(timings),
+        "best_s"    : best,
+        "mean_s"    : statistics.mean(timings),
+        "best_MBps" : size / best / 1e6,
+    }
+
+def bench_word_latency(bd: BackdoorMemoryInterface, address: int, iterations: int = 1000) -> dict:
+    """Measures single word read_memory()/write_memory() round trip latency. """
+    def write():
+        bd.write_memory(address, 0xa5a5a5a5)
+        bd.flush()
+    return {
+        "write_memory": _latency_summary(_timings(write, iterations)),
+        "read_memory" : _latency_summary(_timings(lambda: bd.read_memory(address), iterations)),
+    }
+
+def bench_block_bandwidth(bd: BackdoorMemoryInterface,
+                          address: int,
+                          size: int,
+                          chunk_sizes: Sequence[int] = DEFAULT_CHUNK_SIZES,
+                          iterations: int = 3
+                          ) -> dict:
+    """Measures block write and read bandwidth for each of |chunk_sizes|. """
+    data = os.urandom(size)
+    buf = bytearray(size)
+    original_chunk_size = bd.chunk_size
+    results = {}
+    try:
+        for chunk_size in chunk_sizes:
+            bd.chunk_size = chunk_size
+            def write():
+                bd.write_memory_block8(address, data)
+                bd.flush()
+            results[hex(chunk_size)] = {
+                "write": _bandwidth_summary(size, _timings(write, iterations)),
+                "read" : _bandwidth_summary(size, _timings(lambda: bd.read_memory_block8_into(address, buf), iterations)),
+            }
+    finally:
+        bd.chunk_size = original_chunk_size
+    return results
+
+def bench_load(bd: BackdoorMemoryInterface, address: int, size: int, iterations: int = 3) -> dict:
+    """Measures `bd load` of the same random image in Intel hex and VMEM formats. """
+    # Imported here as the file format libraries are only needed for this benchmark
+    import tempfile
+    from intelhex import IntelHex
+    from veriloghex import VerilogHex
+    from .backdoor import load_file
+
+    data = os.urandom(size)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ihex = IntelHex()
+        ihex.frombytes(data, offset=address)
+        ihex.tofile(str(Path(tmpdir, "image.hex")), "hex")
+        # The VMEM parser drops a last line that has no line ending
+        Path(tmpdir, "image.vmem").write_text(VerilogHex(list(data), offset=address).tovmem() + "\n")
+        for format, filename in (("intel", "image.hex"), ("verilog", "image.vmem")):
+            path = Path(tmpdir, filename)
+            def load():
+                load_file(bd, path, format)
+                bd.flush()
+            summary = _bandwidth_summary(size, _timings(load, iterations))
+            summary["file_bytes"] = path.stat().st_size
+            results[format] = summary
+    return results
+
+def bench_conversion(size: int, iterations: int = 5) -> dict:
+    """Measures the cost of the conversion.py helpers on |size| bytes. """
+    data = os.urandom(size - size % 4)
+    byte_list = list(data)
+    word_list = conversion.byte_list_to_u32le_list(data)
+    words = conversion.bytes_to_u32le(data)
+    cases = {
+        "byte_list_to_u32le_list": lambda: conversion.byte_list_to_u32le_list(byte_list),
+        "u32le_list_to_byte_list": lambda: conversion.u32le_list_to_byte_list(word_list),
+        "bytes_to_u32le"         : lambda: conversion.bytes_to_u32le(data),
+        "u32le_to_bytes"         : lambda: conversion.u32le_to_bytes(words),
+    }
+    results = {name: _bandwidth_summary(len(data), _timings(func, iterations)) for name,func in cases.items()}
+    results["numpy"] = conversion.get_numpy() is not None
+    return results
+
+def run(bd: BackdoorMemoryInterface,
+        address: int,
+        size: int,
+        chunk_sizes: Sequence[int] = DEFAULT_CHUNK_SIZES,
+        iterations: int = 3,
+        latency_iterations: int = 1000,
+        benchmarks: Sequence[str] = ("latency", "bandwidth", "load", "conversion")
+        ) -> dict:
+    """Runs the selected benchmarks and returns the combined results. """
+    import platform
+    results = {
+        "version" : __version__,
+        "python"  : platform.python_version(),
+        "platform": platform.platform(),
+        "address" : address,
+        "size"    : size,
+    }
+    if "latency" in benchmarks:
+        results["latency"] = bench_word_latency(bd, address, latency_iterations)
+    if "bandwidth" in benchmarks:
+        results["bandwidth"] = bench_block_bandwidth(bd, address, size, chunk_sizes, iterations)
+    if "load" in benchmarks:
+        results["load"] = bench_load(bd, address, size, iterations)
+    if "conversion" in benchmarks:
+        results["conversion"] = bench_conversion(size, iterations)
+    return results
@@ -0,0 +1,196 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import logging
+from typing import (Optional, Sequence, Union)
+from .access import (MemoryAccessMixin, split_pages)
+from .backdoor_memory_interface import BackdoorMemoryInterface
+
+LOG = logging.getLogger(__name__)
+
+class CachedMemoryInterface(MemoryAccessMixin):
+    """@brief A page granular shadow cache layered over a BackdoorMemoryInterface.
+
+    Reads are served from cached pages, fetching missing pages with as few block reads
+    as possible, and writes are coalesced into dirty pages that are written back as
+    large blocks by flush().  This turns the many small accesses made by debuggers into
+    a handful of full speed transfers.
+
+    Caching is only safe for memories that nothing but this interface modifies, so the
+    cacheability of address ranges can be set with add_region().  A page is cached only
+    if no non-cacheable region overlaps it and, when |cacheable| is False, it lies fully
+    within a cacheable region.  Accesses to other pages go straight to the interface,
+    after the dirty pages have been written back, so that the target sees the writes
+    to its memories before any later access to its registers, as the program made them.
+
+    The cache must be invalidated whenever the target may have changed the memory, for
+    example after the simulation has been allowed to run.
+
+    """
+
+    def __init__(self, bd: BackdoorMemoryInterface, page_size: int = 0x1000, cacheable: bool = True) -> None:
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError(f"page_size must be a power of two, got {page_size}")
+        self._bd = bd
+        self._page_size = int(page_size)
+        self._default_cacheable = cacheable
+        self._regions = []
+        self._cacheable = {}
+        self._pages = {}
+        self._dirty = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.flush()
+
+    @property
+    def interface(self) -> BackdoorMemoryInterface:
+        return self._bd
+
+    @property
+    def page_size(self) -> int:
+        return self._page_size
+
+    @property
+    def dirty_pages(self) -> int:
+        return len(self._dirty)
+
+    def add_region(self, start: int, size: int, cacheable: bool) -> None:
+        """@brief Set the cacheability of |size| bytes from |start|.
+
+        Making a region non-cacheable writes back and drops any pages it overlaps.
+        """
+        if not cacheable:
+            self.invalidate(start, size)
+        self._regions.append((start, start + size, cacheable))
+        self._cacheable.clear()
+
+    def is_cacheable(self, addr: int) -> bool:
+        """@brief Returns True if the page containing |addr| may be cached. """
+        return self._page_cacheable(addr // self._page_size)
+
+    def fill_memory(self, addr: int, size: int, pattern: Union[bytes, int] = b'\xff') -> None:
+        """@brief Fill memory using the interface, dropping any cached copies first. """
+        self.invalidate(addr, size, writeback=False)
+        self._write_back(sorted(self._dirty))
+        self._bd.fill_memory(addr, size, pattern)
+
+    def flush(self) -> None:
+        """@brief Write back all dirty pages, coalescing contiguous pages into single writes. """
+        self._write_back(sorted(self._dirty))
+        self._bd.flush()
+
+    def invalidate(self, addr: Optional[int] = None, size: Optional[int] = None, writeback: bool = True) -> None:
+        """@brief Drop cached pages, either all of them or those overlapping |size| bytes from |addr|.
+
+        Dirty pages are written back first unless |writeback| is False.
+        """
+        if addr is None:
+            pages = list(self._pages)
+        else:
+            pages = [page for page in self._page_range(addr, size or 1) if page in self._pages]
+        if writeback:
+            self._write_back(sorted(page for page in pages if page in self._dirty))
+        for page in pages:
+            del self._pages[page]
+            self._dirty.discard(page)
+
+    # Private methods
+
+    def _page_range(self, addr: int, size: int) -> range:
+        return range(addr // self._page_size, (addr + size - 1) // self._page_size + 1)
+
+    def _page_cacheable(self, page: int) -> bool:
+        try:
+            return self._cacheable[page]
+        except KeyError:
+            pass
+        start = page * self._page_size
+        end = start + self._page_size
+        cacheable = self._default_cacheable
+        for region_start, region_end, region_cacheable in self._regions:
+            if region_start >= end or region_end <= start:
+                continue
+            if not region_cacheable:
+                cacheable = False
+                break
+            if region_start <= start and region_end >= end:
+                cacheable = True
+        self._cacheable[page] = cacheable
+        return cacheable
+
+    @staticmethod
+    def _runs(pages: Sequence[int]):
+        """Yields (first_page, pages) for each run of consecutive page numbers. """
+        run = []
+        for page in pages:
+            if run and page != run[-1] + 1:
+                yield run[0], run
+                run = []
+            run.append(page)
+        if run:
+            yield run[0], run
+
+    def _write_back(self, pages: Sequence[int]) -> None:
+        """Writes the given dirty pages using one block write per contiguous run. """
+        for start, run in self._runs(pages):
+            LOG.debug(f"writing back {len(run)} page(s) from {start * self._page_size:#x}")
+            self._bd.write_memory_block8(start * self._page_size, b''.join(self._pages[page] for page in run))
+        self._dirty.difference_update(pages)
+
+    def _fetch(self, pages: Sequence[int]) -> None:
+        """Reads the given pages into the cache using one block read per contiguous run. """
+        for start, run in self._runs(pages):
+            data = self._bd.read_memory_bytes(start * self._page_size, len(run) * self._page_size)
+            for i, page in enumerate(run):
+                self._pages[page] = data[i * self._page_size:(i + 1) * self._page_size]
+            self.misses += len(run)
+
+    def _read_mem8_into(self, addr: int, view: memoryview) -> None:
+        pieces = list(split_pages(addr, len(view), self._page_size))
+        missing = [page for _, page, _, _ in pieces if self._page_cacheable(page) and page not in self._pages]
+        self._fetch(missing)
+        missing = set(missing)
+        direct = None
+        for offset, page, page_offset, n in pieces + [(len(view), None, 0, 0)]:
+            if page is not None and not self._page_cacheable(page):
+                # Merge consecutive uncached pieces into a single direct read
+                direct = (direct[0], offset + n) if direct else (offset, offset + n)
+                continue
+            if direct:
+                self._write_back(sorted(self._dirty))
+                self._bd.read_memory_block8_into(addr + direct[0], view[direct[0]:direct[1]])
+                direct = None
+            if page is not None:
+                view[offset:offset + n] = self._pages[page][page_offset:page_offset + n]
+                if page not in missing:
+                    self.hits += 1
+
+    def _write_mem8(self, addr: int, data) -> None:
+        payload = BackdoorMemoryInterface._as_payload(data)
+        pieces = list(split_pages(addr, len(payload), self._page_size))
+        # Partially written pages must be fetched before they can be modified
+        self._fetch([page for _, page, _, n in pieces
+                     if n < self._page_size and self._page_cacheable(page) and page not in self._pages])
+        direct = None
+        for offset, page, page_offset, n in pieces + [(len(payload), None, 0, 0)]:
+            if page is not None and not self._page_cacheable(page):
+                direct = (direct[0], offset + n) if direct else (offset, offset + n)
+                continue
+            if direct:
+                # Earlier writes must reach the target first, e.g. a buffer before the
+                # doorbell register telling the target to use it
+                self._write_back(sorted(self._dirty))
+                self._bd.write_memory_block8(addr + direct[0], payload[direct[0]:direct[1]])
+                direct = None
+            if page is not None:
+                if page not in self._pages:
+                    self._pages[page] = bytearray(self._page_size)
+                self._pages[page][page_offset:page_offset + n] = payload[offset:offset + n]
+                self._dirty.add(page)
@@ -17,9 +17,87 @@
 
 import struct
 import binascii
-from typing import (Any, Iterator, Sequence, Tuple, cast)
+import functools
+import sys
+from array import array
+from typing import (Any, Iterator, Sequence, Tuple, Union, cast)
 
 ByteList = Sequence[int]
+Buffer = Union[bytes, bytearray, memoryview]
+
+# array.array typecodes with the item sizes required by the wire format
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+_U16 = 'H'
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+@functools.lru_cache(maxsize=None)
+def get_numpy():
+    """@brief Returns the numpy module, or None if it isn't installed.
+
+    NumPy is imported on first use rather than with this module, as it would otherwise
+    dominate the start-up time of the `bd` CLI and the GDB extensions.
+    """
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+def _as_padded_buffer(data: Union[ByteList, Buffer], width: int, pad: int) -> Buffer:
+    """Returns |data| as a byte buffer whose length is a multiple of |width|. """
+    try:
+        buf = memoryview(data).cast('B')
+    except TypeError:
+        buf = bytes(data)
+    remainder = len(buf) % width
+    if remainder:
+        buf = bytes(buf) + bytes([pad]) * (width - remainder)
+    return buf
+
+def _from_le_buffer(buf: Buffer, typecode: str, dtype: str) -> Sequence[int]:
+    np = get_numpy()
+    if np is not None:
+        return np.frombuffer(buf, dtype=dtype)
+    if _LITTLE_ENDIAN:
+        return memoryview(buf).cast(typecode)
+    words = array(typecode)
+    words.frombytes(buf)
+    words.byteswap()
+    return words
+
+def _to_le_buffer(data: Sequence[int], typecode: str, dtype: str, mask: int) -> memoryview:
+    np = get_numpy()
+    if np is not None and isinstance(data, np.ndarray):
+        words = np.ascontiguousarray(data, dtype=dtype)
+        return memoryview(words.view(np.uint8))
+    try:
+        words = array(typecode, data)
+    except OverflowError:
+        words = array(typecode, [x & mask for x in data])
+    if not _LITTLE_ENDIAN:
+        words.byteswap()
+    return memoryview(words).cast('B')
+
+def bytes_to_u32le(data: Union[ByteList, Buffer], pad: int = 0x00) -> Sequence[int]:
+    """@brief Convert bytes to a sequence of 32-bit integers (little endian) without copying
+
+    The result is a NumPy array when NumPy is installed, or otherwise a memoryview or
+    array.array, all of which support indexing, len() and tolist().  If the length of the
+    data is not a multiple of 4, then the pad value is used for the additional required bytes.
+    """
+    return _from_le_buffer(_as_padded_buffer(data, 4, pad), _U32, '<u4')
+
+def u32le_to_bytes(data: Sequence[int]) -> memoryview:
+    """@brief Convert a sequence of 32-bit integers to a little endian byte memoryview"""
+    return _to_le_buffer(data, _U32, '<u4', 0xffffffff)
+
+def bytes_to_u16le(data: Union[ByteList, Buffer], pad: int = 0x00) -> Sequence[int]:
+    """@brief Convert bytes to a sequence of 16-bit integers (little endian) without copying"""
+    return _from_le_buffer(_as_padded_buffer(data, 2, pad), _U16, '<u2')
+
+def u16le_to_bytes(data: Sequence[int]) -> memoryview:
+    """@brief Convert a sequence of 16-bit integers to a little endian byte memoryview"""
+    return _to_le_buffer(data, _U16, '<u2', 0xffff)
 
 def byte_list_to_u32le_list(data: ByteList, pad: int = 0x00) -> Sequence[int]:
     """@brief Convert a list of bytes to a list of 32-bit integers (little endian)
@@ -27,38 +105,16 @@ def byte_list_to_u32le_list(data: ByteList, pad: int = 0x00) -> Sequence[int]:
     If the length of the data list is not a multiple of 4, then the pad value is used
     for the additional required bytes.
     """
-    res = []
-    for i in range(len(data) // 4):
-        res.append(data[i * 4 + 0] |
-                   data[i * 4 + 1] << 8 |
-                   data[i * 4 + 2] << 16 |
-                   data[i * 4 + 3] << 24)
-    remainder = (len(data) % 4)
-    if remainder != 0:
-        padCount = 4 - remainder
-        res += byte_list_to_u32le_list(list(data[-remainder:]) + [pad] * padCount)
-    return res
+    return bytes_to_u32le(data, pad).tolist()
 
 def u32le_list_to_byte_list(data: Sequence[int]) -> ByteList:
     """@brief Convert a word array into a byte array"""
-    res = []
-    for x in data:
-        res.append((x >> 0) & 0xff)
-        res.append((x >> 8) & 0xff)
-        res.append((x >> 16) & 0xff)
-        res.append((x >> 24) & 0xff)
-    return res
+    return u32le_to_bytes(data).tolist()
 
 def u16le_list_to_byte_list(data: Sequence[int]) -> ByteList:
     """@brief Convert a halfword array into a byte array"""
-    byteData = []
-    for h in data:
-        byteData.extend([h & 0xff, (h >> 8) & 0xff])
-    return byteData
+    return u16le_to_bytes(data).tolist()
 
 def byte_list_to_u16le_list(byteData: ByteList) -> Sequence[int]:
     """@brief Convert a byte array into a halfword array"""
-    data = []
-    for i in range(0, len(byteData), 2):
-        data.append(byteData[i] | (byteData[i + 1] << 8))
-    return data
\ No newline at end of file
+    return bytes_to_u16le(byteData).tolist()
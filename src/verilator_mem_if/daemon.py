@@ -0,0 +1,133 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import logging
+import os
+import socket
+from typing import (Callable)
+from .backdoor_memory_interface import BackdoorMemoryInterface
+from .server import BackdoorServer
+
+LOG = logging.getLogger(__name__)
+
+class ProxyMemory:
+    """@brief Forwards memory accesses to a simulator over one persistent connection.
+
+    The connection is opened on first use and re-opened once if it fails, so that the
+    broker survives the simulator being restarted between tests.  Any other error, such
+    as an invalid reply, drops the connection and is raised to the caller.  Any keyword
+    arguments are passed on to BackdoorMemoryInterface.
+
+    """
+    def __init__(self, hostname: str = "localhost", port: int = 5557, **kwargs) -> None:
+        self._hostname = hostname
+        self._port = port
+        self._kwargs = kwargs
+        self._bd = None
+
+    def read(self, addr: int, size: int) -> bytearray:
+        return self._call(lambda bd: bd.read_memory_bytes(addr, size))
+
+    def write(self, addr: int, data: bytes) -> None:
+        self._call(lambda bd: bd.write_memory_block8(addr, data))
+
+    def fill(self, addr: int, size: int, pattern: bytes) -> None:
+        self._call(lambda bd: bd.fill_memory(addr, size, pattern))
+
+    def flush(self) -> None:
+        if self._bd is not None:
+            self._call(lambda bd: bd.flush())
+
+    def close(self) -> None:
+        if self._bd is not None:
+            self._bd.close()
+            self._bd = None
+
+    def _call(self, func: Callable[[BackdoorMemoryInterface], object]):
+        for retry in (False, True):
+            if self._bd is None:
+                self._bd = BackdoorMemoryInterface(self._hostname, self._port, **self._kwargs)
+                self._bd.connect()
+            try:
+                return func(self._bd)
+            except OSError as e:
+                self.close()
+                if retry:
+                    raise
+                LOG.warning(f"connection to {self._hostname}:{self._port} failed ({e}), reconnecting")
+            except Exception:
+                # The connection is out of step with the simulator, don't reuse it
+                self.close()
+                raise
+
+
+class BackdoorDaemon(BackdoorServer):
+    """@brief A local broker that holds the connection to a simulator.
+
+    The daemon serves the backdoor protocol on the Unix domain socket |path| and forwards
+    every transaction to |hostname|:|port| over a single persistent connection.  Clients
+    connect with `BackdoorMemoryInterface(path=...)`, or `bd --socket PATH ...`, and so
+    avoid a TCP connect to a possibly heavily loaded simulator per command.
+
+    Writes are acknowledged to the client as soon as they are forwarded.  When the
+    upstream interface pipelines writes, their ACKs are collected when the client
+    disconnects and any failure is logged by the daemon.
+
+    """
+    def __init__(self, path: str, hostname: str = "localhost", port: int = 5557, **kwargs) -> None:
+        self._remove_stale_socket(path)
+        self.upstream = ProxyMemory(hostname, port, **kwargs)
+        super().__init__(memory=self.upstream, path=path)
+
+    def stop(self) -> None:
+        super().stop()
+        self.upstream.close()
+
+    @staticmethod
+    def _remove_stale_socket(path: str) -> None:
+        if not os.path.exists(path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            LOG.debug(f"removing stale socket {path}")
+            os.unlink(path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"a daemon is already listening on {path}")
+
+
+def detach(log_file: str) -> None:
+    """@brief Continue in a background process, detached from the caller's terminal.
+
+    The calling process exits once the child has started a new session and moved its
+    standard streams to /dev/null, so that a caller capturing the output of `bd daemon
+    --detach` sees it return, and anything listening before the call is still
+    listening when it does.  Logging goes to |log_file| from then on.  The log file is
+    opened before forking so that a bad path is reported to the caller.
+    """
+    handler = logging.FileHandler(log_file)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s:%(name)s: %(message)s"))
+    ready, notify = os.pipe()
+    if os.fork():
+        os.close(notify)
+        # The child closes the pipe without writing if it fails before it's ready
+        detached = os.read(ready, 1)
+        # The child owns the listening socket, so skip any cleanup here
+        os._exit(0 if detached else 1)
+    os.close(ready)
+    os.setsid()
+    null = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(null, fd)
+    os.close(null)
+    root = logging.getLogger()
+    for previous in root.handlers[:]:
+        root.removeHandler(previous)
+    root.addHandler(handler)
+    LOG.info(f"detached as pid {os.getpid()}")
+    os.write(notify, b'\n')
+    os.close(notify)
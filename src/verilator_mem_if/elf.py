@@ -0,0 +1,161 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import logging
+import mmap
+import struct
+from pathlib import Path
+from typing import (Iterator, NamedTuple, Union)
+from . import trace
+
+LOG = logging.getLogger(__name__)
+
+PT_LOAD = 1
+
+class ElfFormatError(Exception):
+    pass
+
+
+class Segment(NamedTuple):
+    """@brief A PT_LOAD segment, |data| holds the p_filesz bytes present in the file. """
+    address: int
+    data: memoryview
+    memsz: int
+
+
+class ElfFile:
+    """@brief A minimal reader for the loadable segments of an ELF executable.
+
+    Only the ELF and program headers are parsed, which is all a loader needs, and the
+    file is memory mapped so that segment contents are returned as views into the
+    mapping rather than copies.  The views are only valid until close() is called.
+
+    Segments are placed at their physical address, as a debugger does when loading an
+    image whose data is copied from flash to RAM at start-up.
+
+    """
+
+    # ELF and program header layouts indexed by (EI_CLASS, EI_DATA)
+    HEADERS = {
+        (1, 1): (struct.Struct('<16xHHIIIIIHHHHHH'), struct.Struct('<IIIIIIII')),
+        (1, 2): (struct.Struct('>16xHHIIIIIHHHHHH'), struct.Struct('>IIIIIIII')),
+        (2, 1): (struct.Struct('<16xHHIQQQIHHHHHH'), struct.Struct('<IIQQQQQQ')),
+        (2, 2): (struct.Struct('>16xHHIQQQIHHHHHH'), struct.Struct('>IIQQQQQQ')),
+    }
+
+    def __init__(self, filename: Union[str, Path]) -> None:
+        self.filename = Path(filename)
+        with self.filename.open('rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ElfFormatError(f"'{self.filename}' is empty")
+        self._view = memoryview(self._map)
+        try:
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            self.close()
+        except BufferError:
+            # Views of the segments are still referenced by the traceback of the error
+            # being raised, which must not be replaced by this one.  The mapping is
+            # closed once they are freed.
+            if exc_type is None:
+                raise
+
+    def close(self) -> None:
+        """@brief Unmap the file, raising BufferError if a segment view is still in use. """
+        if self._map is not None:
+            self._view.release()
+            self._map, m = None, self._map
+            m.close()
+
+    def segments(self) -> Iterator[Segment]:
+        """@brief Yields the PT_LOAD segments with a non-zero memory size. """
+        for index in range(self._phnum):
+            offset = self._phoff + index * self._phentsize
+            if self._is64:
+                p_type, _, p_offset, _, p_paddr, p_filesz, p_memsz, _ = self._phdr.unpack_from(self._map, offset)
+            else:
+                p_type, p_offset, _, p_paddr, p_filesz, p_memsz, _, _ = self._phdr.unpack_from(self._map, offset)
+            if p_type != PT_LOAD or p_memsz == 0:
+                continue
+            if p_offset + p_filesz > len(self._map) or p_filesz > p_memsz:
+                raise ElfFormatError(f"program header {index} of '{self.filename}' is corrupt")
+            yield Segment(p_paddr, self._view[p_offset:p_offset + p_filesz], p_memsz)
+
+    def _parse_header(self) -> None:
+        ident = bytes(self._view[:16])
+        if len(ident) < 16 or ident[:4] != b'\x7fELF':
+            raise ElfFormatError(f"'{self.filename}' is not an ELF file")
+        try:
+            header, self._phdr = self.HEADERS[(ident[4], ident[5])]
+        except KeyError:
+            raise ElfFormatError(f"'{self.filename}' has an unsupported ELF class or data encoding")
+        self._is64 = ident[4] == 2
+        if len(self._map) < header.size:
+            raise ElfFormatError(f"the ELF header of '{self.filename}' is truncated")
+        fields = header.unpack_from(self._map)
+        self.entry = fields[3]
+        self._phoff, self._phentsize, self._phnum = fields[4], fields[8], fields[9]
+        if self._phnum and self._phentsize < self._phdr.size:
+            raise ElfFormatError(f"'{self.filename}' has an invalid program header size")
+        if self._phoff + self._phnum * self._phentsize > len(self._map):
+            raise ElfFormatError(f"the program headers of '{self.filename}' are truncated")
+
+
+def load_elf(bd, filename: Union[str, Path]) -> int:
+    """@brief Write the loadable segments of an ELF file and zero their .bss part.
+
+    The file contents are streamed from the mapping to the interface in chunks and
+    any memory beyond p_filesz is cleared with fill_memory().  Returns the number of
+    bytes loaded.
+    """
+    total = 0
+    with ElfFile(filename) as elf:
+        for segment in elf.segments():
+            LOG.debug(f"loading {len(segment.data)} bytes at {segment.address:#x} (memsz {segment.memsz:#x})")
+            try:
+                if len(segment.data):
+                    with trace.span("write", addr=f"{segment.address:#x}", size=len(segment.data)):
+                        bd.write_memory_block8(segment.address, segment.data)
+                if segment.memsz > len(segment.data):
+                    with trace.span("fill", addr=f"{segment.address + len(segment.data):#x}", size=segment.memsz - len(segment.data)):
+                        bd.fill_memory(segment.address + len(segment.data), segment.memsz - len(segment.data), 0)
+            finally:
+                segment.data.release()
+            total += segment.memsz
+    return total
+
+
+def verify_elf(bd, filename: Union[str, Path], chunk_size: int = 0x100000) -> list:
+    """@brief Read back the loadable segments of an ELF file and compare them.
+
+    Returns a list of the (address, size) of every chunk that differs, with the .bss
+    part of each segment expected to be zero.
+    """
+    mismatches = []
+    buf = bytearray(chunk_size)
+    with ElfFile(filename) as elf:
+        for segment in elf.segments():
+            try:
+                for offset in range(0, segment.memsz, chunk_size):
+                    n = min(chunk_size, segment.memsz - offset)
+                    with trace.span("verify", addr=f"{segment.address + offset:#x}", size=n):
+                        data = bd.read_memory_block8_into(segment.address + offset, memoryview(buf)[:n])
+                        expected = bytes(segment.data[offset:offset + n])
+                        expected += bytes(n - len(expected))
+                        if data != expected:
+                            mismatches.append((segment.address + offset, n))
+                    data.release()
+            finally:
+                segment.data.release()
+    return mismatches
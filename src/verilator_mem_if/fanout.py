@@ -0,0 +1,79 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import (Any, Callable, NamedTuple, Optional, Sequence, Tuple)
+from .backdoor_memory_interface import BackdoorMemoryInterface
+from . import record
+from . import trace
+
+LOG = logging.getLogger(__name__)
+
+Target = Tuple[str, int]
+
+class TargetResult(NamedTuple):
+    """@brief The outcome of running an operation on one target. """
+    target: str
+    elapsed: float
+    value: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def parse_target(spec: str) -> Target:
+    """@brief Converts a `hostname:port` string to a (hostname, port) tuple. """
+    hostname, sep, port = spec.rpartition(':')
+    if not sep or not hostname:
+        raise ValueError(f"expecting a target of the form hostname:port, got '{spec}'")
+    return hostname, int(port)
+
+
+def parse_port_range(spec: str) -> range:
+    """@brief Converts a `first-last` string to an inclusive range of ports. """
+    first, _, last = spec.partition('-')
+    first = int(first)
+    last = int(last) if last else first
+    if last < first:
+        raise ValueError(f"port range '{spec}' is empty")
+    return range(first, last + 1)
+
+
+def fan_out(targets: Sequence[Target],
+            func: Callable[[BackdoorMemoryInterface, str, int], Any],
+            max_workers: Optional[int] = None,
+            **kwargs
+            ) -> Sequence[TargetResult]:
+    """@brief Run func(bd, hostname, port) on every target concurrently.
+
+    Each target gets its own BackdoorMemoryInterface, created with |kwargs|, and the
+    calls run on a thread pool with one thread per target unless |max_workers| is
+    given.  The socket I/O releases the GIL, so loading the same image into many
+    simulators takes about as long as loading the slowest one.
+
+    Failures do not stop the other targets.  The results are returned in the order of
+    |targets|, with the exception raised for a target stored in its result.
+    """
+    def run(target: Target) -> TargetResult:
+        hostname, port = target
+        start = perf_counter()
+        try:
+            bd = BackdoorMemoryInterface(hostname, port, **kwargs)
+            trace.attach(bd)
+            record.attach(bd)
+            with bd:
+                value = func(bd, hostname, port)
+        except Exception as e:
+            LOG.debug(f"{hostname}:{port} failed: {e}")
+            return TargetResult(f"{hostname}:{port}", perf_counter() - start, error=e)
+        return TargetResult(f"{hostname}:{port}", perf_counter() - start, value)
+
+    if not targets:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets)) as pool:
+        return list(pool.map(run, targets))
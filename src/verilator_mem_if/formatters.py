@@ -0,0 +1,187 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Incremental writers for the `bd dump` output formats.
+
+A formatter is given the address and size of the region up front and is then fed
+the data in chunks of any size, writing complete lines to its file as they become
+available.  Memory use is bounded by the chunk size rather than the region size.
+
+The output is identical to that of IntelHex.dump(), IntelHex.write_hex_file() and
+VerilogHex.tovmem() for a single contiguous region.
+"""
+
+import binascii
+import struct
+from typing import (IO, Union)
+
+class Formatter:
+    """@brief Base class for the dump formatters.
+
+    Subclasses define where lines end with _line_start() and format runs of whole lines
+    with _format().  Data that does not yet complete a line is held back until the next
+    write() or close().
+
+    """
+    def __init__(self, file: IO, address: int, size: int) -> None:
+        self._file = file
+        self._start = address
+        self._end = address + size
+        self._address = address
+        self._pending = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+
+    def write(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        """@brief Consume the next len(data) bytes of the region. """
+        self._pending += data
+        n = self._line_start(self._address + len(self._pending)) - self._address
+        if n > 0:
+            self._file.write(self._format(self._address, self._pending[:n]))
+            del self._pending[:n]
+            self._address += n
+
+    def close(self) -> None:
+        """@brief Write any partial last line and the format trailer. """
+        if self._pending:
+            self._file.write(self._format(self._address, self._pending))
+            self._address += len(self._pending)
+            self._pending = bytearray()
+        self._file.write(self._trailer())
+
+    def _line_start(self, addr: int) -> int:
+        """Returns the start of the line containing |addr|. """
+        raise NotImplementedError
+
+    def _format(self, addr: int, data: bytearray) -> str:
+        """Formats the lines holding |data|, which starts at |addr|. """
+        raise NotImplementedError
+
+    def _trailer(self) -> str:
+        return ""
+
+
+class BinaryFormatter(Formatter):
+    """@brief Writes the raw bytes to a binary file. """
+
+    def write(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        self._file.write(data)
+
+    def close(self) -> None:
+        pass
+
+
+class HexdumpFormatter(Formatter):
+    """@brief A hexdump with 16 bytes per line, in the layout of IntelHex.dump(). """
+
+    WIDTH = 16
+    HEX = [f" {b:02X}" for b in range(256)]
+    ASCII = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
+    def __init__(self, file: IO, address: int, size: int) -> None:
+        super().__init__(file, address, size)
+        end = ((self._end - 1) // self.WIDTH + 1) * self.WIDTH
+        self._template = f"%0{max(len(hex(end)) - 2, 4)}X "
+
+    def _line_start(self, addr: int) -> int:
+        return addr - addr % self.WIDTH
+
+    def _format(self, addr: int, data: bytearray) -> str:
+        lines = []
+        offset = 0
+        while offset < len(data):
+            line = addr + offset
+            lead = line % self.WIDTH
+            n = min(self.WIDTH - lead, len(data) - offset)
+            trail = self.WIDTH - lead - n
+            chunk = data[offset:offset + n]
+            lines.append(
+                self._template % (line - lead)
+                + " --" * lead
+                + "".join(map(self.HEX.__getitem__, chunk))
+                + " --" * trail
+                + "  |" + " " * lead + chunk.translate(self.ASCII).decode('ascii') + " " * trail + "|\n"
+            )
+            offset += n
+        return "".join(lines)
+
+
+class IntelHexFormatter(Formatter):
+    """@brief Intel hex records of up to 16 bytes, as written by IntelHex.write_hex_file().
+
+    Extended linear address records are only emitted when the region extends beyond
+    64 KiB, and then at the start of the data and of every 64 KiB segment.
+
+    """
+
+    RECORD = 16
+
+    def __init__(self, file: IO, address: int, size: int) -> None:
+        super().__init__(file, address, size)
+        self._offset_records = self._end - 1 > 0xffff
+
+    def _line_start(self, addr: int) -> int:
+        # Records run from the start of the data, restarting at every 64 KiB boundary
+        base = max(self._start, addr & ~0xffff)
+        return base + (addr - base) // self.RECORD * self.RECORD
+
+    def _format(self, addr: int, data: bytearray) -> str:
+        records = []
+        offset = 0
+        while offset < len(data):
+            record = addr + offset
+            if self._offset_records and (record == self._start or record & 0xffff == 0):
+                records.append(self._record(0, 4, struct.pack('>H', record >> 16)))
+            n = min(self.RECORD, 0x10000 - (record & 0xffff), len(data) - offset)
+            records.append(self._record(record & 0xffff, 0, data[offset:offset + n]))
+            offset += n
+        return "".join(records)
+
+    def _trailer(self) -> str:
+        return ":00000001FF\n"
+
+    @staticmethod
+    def _record(addr: int, type: int, data: bytes) -> str:
+        record = bytearray(struct.pack('>BHB', len(data), addr, type)) + data
+        record.append(-sum(record) & 0xff)
+        return ":" + binascii.hexlify(record).decode('ascii').upper() + "\n"
+
+
+class VmemFormatter(Formatter):
+    """@brief One 32-bit word per line in the layout of VerilogHex.tovmem().
+
+    Each line holds the word address, and partial words at either end of the region
+    are padded with 0xff.  Lines are separated, not terminated, by newlines.
+
+    """
+
+    WIDTH = 4
+    PADDING = 0xff
+
+    def _line_start(self, addr: int) -> int:
+        return addr - addr % self.WIDTH
+
+    def _format(self, addr: int, data: bytearray) -> str:
+        lead = addr % self.WIDTH
+        data = bytes([self.PADDING]) * lead + data
+        if len(data) % self.WIDTH:
+            data += bytes([self.PADDING]) * (self.WIDTH - len(data) % self.WIDTH)
+        word = (addr - lead) // self.WIDTH
+        text = "\n".join(f"@{word + i:08x} {value:08x}" for i, (value,) in enumerate(struct.iter_unpack('<I', data)))
+        if addr - lead > self._start - self._start % self.WIDTH:
+            text = "\n" + text
+        return text
+
+
+FORMATTERS = {
+    'hex'    : HexdumpFormatter,
+    'intel'  : IntelHexFormatter,
+    'verilog': VmemFormatter,
+    'binary' : BinaryFormatter,
+}
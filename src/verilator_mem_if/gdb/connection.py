@@ -0,0 +1,177 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import gdb
+import threading
+from typing import (Any, Callable, Optional)
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.cache import CachedMemoryInterface
+from .parameters import uid_to_args
+
+class ConnectionManager:
+    """Keeps one live backdoor connection per bd-uid for the whole gdb session.
+
+    The bd-uid parameter is read each time a connection is requested, so `set bd-uid`
+    takes effect on the next command.  When bd-memory-map is set the "connection" is a
+    MemoryMap over the endpoints of that file, identified by a `map:path` uid.  A connection that fails is dropped and is only
+    re-opened when it is next needed.
+
+    Reads made with `run(func, cached=True)` go through a CachedMemoryInterface per
+    connection that only caches the ranges added with add_region().  The caches are
+    dropped whenever the target runs, gdb writes to memory or a bd command accesses the
+    connection without the cache.
+
+    Each connection has a lock that is held for the whole of a run() call, so commands
+    issued while a background job is using a connection wait for it to finish.  The
+    connection, cache and lock tables are shared by those jobs and the gdb event
+    handlers, so they are only changed or iterated with |_mutex| held.
+
+    """
+    def __init__(self):
+        self._connections = {}
+        self._caches = {}
+        self._locks = {}
+        self._mutex = threading.Lock()
+        self.regions = []
+
+    @property
+    def uid(self) -> str:
+        memory_map = gdb.parameter('bd-memory-map')
+        if memory_map:
+            return f"map:{memory_map}"
+        return gdb.parameter('bd-uid')
+
+    def get(self, uid: Optional[str] = None) -> BackdoorMemoryInterface:
+        """Returns the connection for |uid|, or the current bd-uid, opening it if necessary. """
+        uid = uid or self.uid
+        with self._mutex:
+            bd = self._connections.get(uid)
+        if bd is None:
+            if uid.startswith('map:'):
+                from verilator_mem_if.memory_map import MemoryMap
+                bd = MemoryMap.load(uid[len('map:'):])
+            else:
+                args = uid_to_args(uid)
+                bd = BackdoorMemoryInterface(args['hostname'] or "localhost", args['port'] or 0, path=args['socket'])
+            bd.connect()
+            with self._mutex:
+                self._connections[uid] = bd
+        return bd
+
+    def drop(self, uid: Optional[str] = None) -> None:
+        """Closes the connection for |uid|, or the current bd-uid, if it is open. """
+        uid = uid or self.uid
+        with self._mutex:
+            self._caches.pop(uid, None)
+            bd = self._connections.pop(uid, None)
+        if bd is not None:
+            bd.close()
+
+    def close(self) -> None:
+        with self._mutex:
+            uids = list(self._connections)
+        for uid in uids:
+            self.drop(uid)
+
+    def add_region(self, start: int, size: int) -> None:
+        """Allows reads of |size| bytes from |start| to be cached until the target next runs. """
+        with self._mutex:
+            self.regions.append((start, size))
+            for cache in self._caches.values():
+                cache.add_region(start, size, True)
+
+    def clear_regions(self) -> None:
+        with self._mutex:
+            self.regions = []
+            self._caches.clear()
+
+    def invalidate(self, addr: Optional[int] = None, size: Optional[int] = None) -> None:
+        """Drops the cached copies of |size| bytes from |addr|, or of all memory. """
+        with self._mutex:
+            if addr is None:
+                self._caches.clear()
+                return
+            for cache in self._caches.values():
+                cache.invalidate(addr, size, writeback=False)
+
+    def cache(self, uid: Optional[str] = None) -> CachedMemoryInterface:
+        """Returns the read cache of the connection for |uid|, opening it if necessary. """
+        uid = uid or self.uid
+        bd = self.get(uid)
+        with self._mutex:
+            cache = self._caches.get(uid)
+            if cache is None:
+                cache = CachedMemoryInterface(bd, cacheable=False)
+                for start, size in self.regions:
+                    cache.add_region(start, size, True)
+                if uid.startswith('map:'):
+                    for region in bd.cacheable_regions():
+                        cache.add_region(region.start, region.size, True)
+                self._caches[uid] = cache
+        return cache
+
+    def run(self, func: Callable[[BackdoorMemoryInterface], Any], cached: bool = False, uid: Optional[str] = None) -> Any:
+        """Calls func(bd) with the current connection and waits for its writes.
+
+        With |cached|, |func| is passed the read cache of the connection instead, and must
+        only read through it.  Otherwise the cache is dropped, as |func| may write.
+
+        Worker threads must pass the |uid| to use, as they cannot read gdb parameters.
+
+        If the connection turns out to be broken, for example because the simulator was
+        restarted, it is re-opened and |func| is retried once.  Any other failure also
+        drops the connection, as it may have left the stream out of step.
+        """
+        uid = uid or self.uid
+        lock = self._lock(uid)
+        if not lock.acquire(blocking=False):
+            notify(f"waiting for the background job using {uid}\n")
+            lock.acquire()
+        try:
+            for retry in (False, True):
+                bd = self.get(uid)
+                try:
+                    if cached:
+                        result = func(self.cache(uid))
+                    else:
+                        with self._mutex:
+                            self._caches.pop(uid, None)
+                        result = func(bd)
+                    bd.flush()
+                    return result
+                except OSError as e:
+                    self.drop(uid)
+                    if retry:
+                        raise
+                    notify(f"backdoor connection to {bd.target} failed ({e}), reconnecting\n")
+                except BaseException:
+                    self.drop(uid)
+                    raise
+        finally:
+            lock.release()
+
+    def _lock(self, uid: str) -> threading.Lock:
+        with self._mutex:
+            return self._locks.setdefault(uid, threading.Lock())
+
+
+def notify(message: str) -> None:
+    """Writes a message to the gdb console from any thread. """
+    if threading.current_thread() is threading.main_thread():
+        gdb.write(message)
+    else:
+        gdb.post_event(lambda: gdb.write(message))
+
+
+connections = ConnectionManager()
+
+if hasattr(gdb.events, "gdb_exiting"):
+    gdb.events.gdb_exiting.connect(lambda event: connections.close())
+
+# Anything read while the target was stopped may be stale once it runs
+gdb.events.cont.connect(lambda event: connections.invalidate())
+if hasattr(gdb.events, "inferior_call"):
+    gdb.events.inferior_call.connect(lambda event: connections.invalidate())
+if hasattr(gdb.events, "memory_changed"):
+    gdb.events.memory_changed.connect(lambda event: connections.invalidate(int(event.address), event.length))
@@ -11,4 +11,7 @@ class Bd(_gdb.Command):
         pass
 
 with _gdb.register.prefix("bd"):
-    import verilator_mem_if.gdb.extensions.memory
\ No newline at end of file
+    import verilator_mem_if.gdb.extensions.memory
+    import verilator_mem_if.gdb.extensions.examine
+    import verilator_mem_if.gdb.extensions.jobs
+    import verilator_mem_if.gdb.extensions.stats
\ No newline at end of file
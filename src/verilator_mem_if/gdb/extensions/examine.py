@@ -0,0 +1,174 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import gdb
+import verilator_mem_if.gdb as _gdb
+from verilator_mem_if.gdb.connection import connections
+from verilator_mem_if.backdoor import int_from_dec_or_hex_string
+
+def lvalue_location(expression: str, count=None):
+    """Returns the (address, type) of the memory an expression refers to.
+
+    Arrays and other lvalues refer to their own storage, while pointers refer to |count|
+    elements (default 1) of the type they point to.  The value itself is left unread,
+    apart from the pointer, so that its contents can be fetched through the backdoor.
+    """
+    value = gdb.parse_and_eval(expression)
+    code = value.type.strip_typedefs().code
+    if code == gdb.TYPE_CODE_PTR:
+        address, element = int(value), value.type.strip_typedefs().target()
+        return address, element.array((count or 1) - 1)
+    if value.address is None:
+        raise gdb.GdbError(f"'{expression}' is not in memory")
+    address, value_type = int(value.address), value.type
+    if count is not None:
+        if code == gdb.TYPE_CODE_ARRAY:
+            value_type = value_type.strip_typedefs().target()
+        value_type = value_type.array(count - 1)
+    return address, value_type
+
+
+@_gdb.register("region")
+class BackdoorRegion(_gdb.UserCommand):
+    """Allow reads of an address range made by `bd x` and `bd print-array` to be cached.
+
+    Reads from these ranges are fetched in pages and cached until the target next runs
+    or gdb writes to the memory.  Only add memories that nothing but the simulated core
+    changes while it is stopped; reads elsewhere still go through the backdoor but are
+    not cached.  Without arguments the ranges are listed.
+
+    """
+    def setup(self, parser):
+        parser.add_argument(
+            "address",
+            type=int_from_dec_or_hex_string,
+            nargs="?",
+            help="start address of the range"
+        )
+        parser.add_argument(
+            "size",
+            type=int_from_dec_or_hex_string,
+            nargs="?",
+            help="size of the range in bytes"
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="remove all ranges and drop the cached data"
+        )
+
+    def run(self, args):
+        if args.clear:
+            connections.clear_regions()
+        if args.address is not None:
+            if args.size is None:
+                raise gdb.GdbError("a size is required with the address")
+            connections.add_region(args.address, args.size)
+        elif not args.clear:
+            for start, size in connections.regions:
+                gdb.write(f"{start:#010x}-{start + size:#010x} ({size} bytes)\n")
+
+
+@_gdb.register("x")
+class BackdoorExamine(_gdb.UserCommand):
+    """Examine memory through the backdoor, like gdb's x command.
+
+    The whole range is fetched in one block read, or from the cache for ranges added
+    with `bd region`, instead of a debugger access per unit.
+
+    """
+    formats = {
+        'x': lambda value, size: f"0x{value:0{size * 2}x}",
+        'd': lambda value, size: f"{value - (1 << size * 8) if value >> (size * 8 - 1) else value}",
+        'u': lambda value, size: f"{value}",
+        'o': lambda value, size: f"0{value:o}",
+        't': lambda value, size: f"{value:0{size * 8}b}",
+    }
+    per_line = {1: 8, 2: 8, 4: 4, 8: 2}
+
+    def setup(self, parser):
+        parser.add_argument(
+            "expression",
+            nargs="+",
+            help="address to examine, an array or an expression giving a pointer or address"
+        )
+        parser.add_argument(
+            "-c",
+            "--count",
+            type=int_from_dec_or_hex_string,
+            default=1,
+            help="number of units to display (default: %(default)s)"
+        )
+        parser.add_argument(
+            "-s",
+            "--size",
+            type=int,
+            choices=[1, 2, 4, 8],
+            default=4,
+            help="unit size in bytes (default: %(default)s)"
+        )
+        parser.add_argument(
+            "-f",
+            "--format",
+            choices=list(self.formats),
+            default="x",
+            help="display format, as for x (default: %(default)s)"
+        )
+
+    def run(self, args):
+        value = gdb.parse_and_eval(" ".join(args.expression))
+        if value.type.strip_typedefs().code == gdb.TYPE_CODE_ARRAY and value.address is not None:
+            value = value.address
+        address = int(value)
+        data = connections.run(lambda cache: cache.read_memory_bytes(address, args.count * args.size), cached=True)
+        fmt = self.formats[args.format]
+        columns = self.per_line[args.size]
+        for line in range(0, args.count, columns):
+            offset = line * args.size
+            units = [
+                fmt(int.from_bytes(data[i:i + args.size], 'little'), args.size)
+                for i in range(offset, min(args.count, line + columns) * args.size, args.size)
+            ]
+            gdb.write(f"{address + offset:#x}:\t" + "\t".join(units) + "\n")
+
+
+@_gdb.register("print-array")
+class BackdoorPrintArray(_gdb.UserCommand):
+    """Print an array, structure or pointed-to buffer read through the backdoor.
+
+    The contents are read in one block, or from the cache for ranges added with
+    `bd region`, and turned into a gdb value of the expression's type, which is added
+    to the value history and stored in $bd for use in further expressions.
+
+    """
+    def setup(self, parser):
+        parser.add_argument(
+            "expression",
+            nargs="+",
+            help="an array or other lvalue, or a pointer to the first element"
+        )
+        parser.add_argument(
+            "-c",
+            "--count",
+            type=int_from_dec_or_hex_string,
+            default=None,
+            help="number of elements to read, required for pointers to more than one element"
+        )
+        parser.add_argument(
+            "--elements",
+            type=int,
+            default=None,
+            help="limit on the elements printed, 0 for no limit (default: print elements)"
+        )
+
+    def run(self, args):
+        address, value_type = lvalue_location(" ".join(args.expression), args.count)
+        data = connections.run(lambda cache: cache.read_memory_bytes(address, value_type.sizeof), cached=True)
+        value = gdb.Value(bytes(data), value_type)
+        gdb.set_convenience_variable("bd", value)
+        options = {} if args.elements is None else {"max_elements": args.elements}
+        if hasattr(gdb, "add_history"):
+            gdb.write(f"${gdb.add_history(value)} = {value.format_string(**options)}\n")
+        else:
+            gdb.write(f"{value.format_string(**options)}\n")
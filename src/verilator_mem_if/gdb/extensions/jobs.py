@@ -0,0 +1,51 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import gdb
+import verilator_mem_if.gdb as _gdb
+from verilator_mem_if.gdb.jobs import jobs
+
+@_gdb.register("jobs")
+class BackdoorJobs(_gdb.UserCommand):
+    """List the transfers started with --background.
+
+    Finished jobs are listed once more with their outcome and then forgotten.
+
+    """
+    def run(self, args):
+        for job in jobs:
+            gdb.write(job.status() + "\n")
+            jobs.forget(job)
+
+
+@_gdb.register("wait")
+class BackdoorWait(_gdb.UserCommand):
+    """Wait for background transfers to finish.
+
+    Fails if any of the jobs waited for failed, so that scripts can stop there.
+
+    """
+    def setup(self, parser):
+        parser.add_argument(
+            "job",
+            type=int,
+            nargs="*",
+            help="the numbers of the jobs to wait for (default: all jobs)"
+        )
+
+    def run(self, args):
+        try:
+            selected = [jobs.get(number) for number in args.job] if args.job else list(jobs)
+        except KeyError as e:
+            raise gdb.GdbError(e.args[0])
+        failed = 0
+        for job in selected:
+            # Wait in short steps so that Ctrl-C can interrupt the wait
+            while not job.wait(0.1):
+                pass
+            gdb.write(job.status() + "\n")
+            jobs.forget(job)
+            failed += job.error is not None
+        if failed:
+            raise gdb.GdbError(f"{failed} job(s) failed")
@@ -4,10 +4,14 @@
 
 import gdb
 from contextlib import contextmanager
+from time import perf_counter
 import verilator_mem_if.gdb as _gdb
+from verilator_mem_if.gdb.connection import connections
+from verilator_mem_if.gdb.jobs import jobs
 from verilator_mem_if.backdoor import (
-    int_from_dec_or_hex_string, init, load, dump, IllegalFormatError
+    int_from_dec_or_hex_string, load_file, dump_file, file_or_stdout, IllegalFormatError
 )
+from verilator_mem_if.elf import (ElfFile, ElfFormatError, load_elf, verify_elf)
 
 @_gdb.register("dump")
 class BackdoorDump(_gdb.UserCommand):
@@ -35,7 +39,7 @@ class BackdoorDump(_gdb.UserCommand):
         parser.add_argument(
             "-f",
             "--format",
-            choices=["intel", "verilog", "hex"],
+            choices=["intel", "verilog", "hex", "binary"],
             default="hex",
             help="the dump format to use (default: %(default)s)"
         )
@@ -53,12 +57,29 @@ class BackdoorDump(_gdb.UserCommand):
             default=None,
             help="dump to file instead of STDOUT"
         )
-        hostname,port = gdb.parameter('bd-uid').split(':')
-        parser.set_defaults(hostname=hostname, port=port)
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="run the transfer on a worker thread, see `bd jobs` and `bd wait`"
+        )
 
     def run(self, args):
+        if args.format == "binary" and args.output is None:
+            raise gdb.GdbError("binary dumps need an output file, use -o")
+        if args.background and args.output is None:
+            raise gdb.GdbError("background dumps need an output file, use -o")
+        mode = 'wb' if args.format == "binary" else 'w'
+
+        def dump(bd):
+            with file_or_stdout(args.output, mode) as f:
+                dump_file(bd, f, args.address, args.size, args.format)
+
+        if args.background:
+            job = jobs.start(f"dump {args.size:#x} bytes from {args.address:#x} to {args.output}", dump, args.size)
+            gdb.write(f"[{job.number}] {job.description}\n")
+            return
         try:
-            dump(args)
+            connections.run(dump)
         except Exception as e:
             raise gdb.GdbError(e)
 
@@ -67,26 +88,56 @@ class BackdoorDump(_gdb.UserCommand):
 class BackdoorLoad(_gdb.UserCommand):
     """Write contents of a hex file to memory.
 
-    Currently supportd the Verilog and Intel hex file formats.
+    Currently supportd the Verilog hex, Intel hex, ELF and raw binary file formats.
 
     """
     def setup(self, parser):
         parser.add_argument(
             "filename",
-            help="the Verilog or Intel hex file to parse"
+            help="the Verilog hex, Intel hex, ELF or binary file to parse"
         )
         parser.add_argument(
             "-f",
             "--format",
-            choices=["intel", "verilog"],
+            choices=["intel", "verilog", "elf", "binary"],
             help="override the file type detection"
         )
-        hostname,port = gdb.parameter('bd-uid').split(':')
-        parser.set_defaults(hostname=hostname, port=port)
+        parser.add_argument(
+            "--address",
+            type=int_from_dec_or_hex_string,
+            default=0x800000,
+            help="load address for binary files (default: %(default)s)"
+        )
+        parser.add_argument(
+            "--diff",
+            action="store_true",
+            help="only write the pages that changed since the last differential load"
+        )
+        parser.add_argument(
+            "--manifest",
+            default=None,
+            help="manifest file recording the last load, implies --diff"
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="run the transfer on a worker thread, see `bd jobs` and `bd wait`"
+        )
 
     def run(self, args):
+        def load(bd):
+            manifest = args.manifest
+            if args.diff and manifest is None:
+                from verilator_mem_if.manifest import LoadManifest
+                manifest = LoadManifest.default_path(bd.target)
+            load_file(bd, args.filename, args.format, manifest, args.address)
+
+        if args.background:
+            job = jobs.start(f"load {args.filename}", load)
+            gdb.write(f"[{job.number}] {job.description}\n")
+            return
         try:
-            load(args)
+            connections.run(load)
         except IllegalFormatError as e:
             raise gdb.GdbError(e)
         except Exception as e:
@@ -125,8 +176,57 @@ class BackdoorInitMemory(_gdb.UserCommand):
             type=int_from_dec_or_hex_string,
             help="specify the size of the flash in bytes (default: %(default)s)"
         )
-        hostname,port = gdb.parameter('bd-uid').split(':')
-        parser.set_defaults(hostname=hostname, port=port)
 
     def run(self, args):
-        init(args)
+        connections.run(lambda bd: bd.fill_memory(args.address, args.size, args.init_value))
+
+
+@_gdb.register("load-objfile")
+class BackdoorLoadObjfile(_gdb.UserCommand):
+    """Write the loadable segments of the program being debugged to memory.
+
+    This is a replacement for gdb's `load` that writes the image through the backdoor
+    rather than the remote serial protocol.  As with `load`, segments are placed at
+    their load (physical) address and the memory beyond the file contents of each
+    segment is zeroed.
+
+    """
+    def setup(self, parser):
+        parser.add_argument(
+            "filename",
+            nargs="?",
+            default=None,
+            help="the ELF file to load (default: the executable of the current program space)"
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="read back the loaded segments and compare them with the file"
+        )
+        parser.add_argument(
+            "--set-pc",
+            action="store_true",
+            help="set $pc to the entry point afterwards, as `load` does"
+        )
+
+    def run(self, args):
+        filename = args.filename or gdb.current_progspace().filename
+        if filename is None:
+            raise gdb.GdbError("no executable file specified, use `file` or pass a file name")
+        try:
+            start = perf_counter()
+            size = connections.run(lambda bd: load_elf(bd, filename))
+            elapsed = perf_counter() - start
+            gdb.write(f"Loaded {size} bytes from {filename} in {elapsed:.3f}s ({size / max(elapsed, 1e-9) / 1e6:.1f} MB/s)\n")
+            if args.verify:
+                mismatches = connections.run(lambda bd: verify_elf(bd, filename))
+                if mismatches:
+                    for address, length in mismatches:
+                        gdb.write(f"mismatch in {length} bytes from {address:#x}\n")
+                    raise gdb.GdbError(f"verification failed in {len(mismatches)} chunk(s)")
+                gdb.write("Verified\n")
+            if args.set_pc:
+                with ElfFile(filename) as elf:
+                    gdb.execute(f"set $pc = {elf.entry:#x}")
+        except (ElfFormatError, OSError) as e:
+            raise gdb.GdbError(e)
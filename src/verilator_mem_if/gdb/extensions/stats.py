@@ -0,0 +1,56 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import gdb
+import json
+from pathlib import Path
+import verilator_mem_if.gdb as _gdb
+from verilator_mem_if import metrics
+
+# Collect the metrics of every interface the bd commands open in this session
+metrics.enable_aggregate().target = "gdb"
+
+@_gdb.register("stats")
+class BackdoorStats(_gdb.UserCommand):
+    """Report backdoor transaction counts, bytes transferred and latencies.
+
+    The metrics cover every backdoor connection made by bd commands since gdb started,
+    or since the last `bd stats --reset`.
+
+    """
+    def setup(self, parser):
+        parser.add_argument(
+            "-f",
+            "--format",
+            choices=["text", "json", "prometheus"],
+            default="text",
+            help="the report format (default: %(default)s)"
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            type=str,
+            default=None,
+            help="write the report to a file instead of the console"
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="clear the metrics after reporting them"
+        )
+
+    def run(self, args):
+        stats = metrics.aggregate()
+        if args.format == "json":
+            report = json.dumps(stats.summary(), indent=2) + "\n"
+        elif args.format == "prometheus":
+            report = stats.prometheus()
+        else:
+            report = stats.report()
+        if args.output:
+            Path(args.output).write_text(report)
+        else:
+            gdb.write(report)
+        if args.reset:
+            stats.reset()
@@ -0,0 +1,153 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import threading
+from time import perf_counter
+from typing import (Any, Callable, Optional)
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from .connection import (connections, notify)
+
+class Job:
+    """A bd command running on a worker thread.
+
+    The job holds the lock of its connection while it runs, so other commands using the
+    same bd-uid wait for it.  The bytes transferred are counted by wrapping the payload
+    methods of the interface, and progress is reported on the gdb console at most once
+    every PROGRESS_INTERVAL seconds.  gdb's API is only used through notify(), which
+    posts the messages to gdb's event loop.
+
+    """
+    PROGRESS_INTERVAL = 2.0
+
+    def __init__(self, number: int, description: str, uid: str,
+                 func: Callable[[BackdoorMemoryInterface], Any], total: Optional[int] = None) -> None:
+        self.number = number
+        self.description = description
+        self.uid = uid
+        self.total = total
+        self.transferred = 0
+        self.result = None
+        self.error = None
+        self.started = perf_counter()
+        self.finished = None
+        self._func = func
+        self._reported = self.started
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"bd job {number}", daemon=True)
+
+    @property
+    def done(self) -> bool:
+        return self.finished is not None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or perf_counter()) - self.started
+
+    def status(self) -> str:
+        """Returns a one line summary of the job. """
+        state = "running" if not self.done else ("failed" if self.error else "done")
+        progress = f"{self.transferred / 2**20:.1f} MiB"
+        if self.total:
+            progress += f" of {self.total / 2**20:.1f} MiB ({100 * self.transferred / self.total:.0f}%)"
+        line = f"[{self.number}] {state:<8} {self.description}: {progress} in {self.elapsed:.1f}s"
+        if self.error is not None:
+            line += f": {self.error}"
+        return line
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        self._thread.join(timeout)
+        return self.done
+
+    def _run(self) -> None:
+        try:
+            self.result = connections.run(self._counted, uid=self.uid)
+        except BaseException as e:
+            self.error = e
+        self.finished = perf_counter()
+        notify(self.status() + "\n")
+
+    def _counted(self, bd: BackdoorMemoryInterface) -> Any:
+        """Calls the job function with the payload methods of |bd| counting bytes.
+
+        For a memory map the methods of every endpoint are wrapped.
+        """
+        interfaces = bd.interfaces if self.uid.startswith('map:') else [bd]
+        saved = [
+            {name: interface.__dict__[name] for name in ("_send_payload", "_recv_payload") if name in interface.__dict__}
+            for interface in interfaces
+        ]
+        for interface in interfaces:
+            self._wrap(interface)
+        try:
+            return self._func(bd)
+        finally:
+            for interface, methods in zip(interfaces, saved):
+                for name in ("_send_payload", "_recv_payload"):
+                    if name in methods:
+                        setattr(interface, name, methods[name])
+                    else:
+                        delattr(interface, name)
+
+    def _wrap(self, bd: BackdoorMemoryInterface) -> None:
+        send_payload, recv_payload = bd._send_payload, bd._recv_payload
+
+        def _send_payload(data):
+            send_payload(data)
+            self._count(len(data))
+
+        def _recv_payload(view):
+            recv_payload(view)
+            self._count(len(view))
+
+        bd._send_payload, bd._recv_payload = _send_payload, _recv_payload
+
+    def _count(self, size: int) -> None:
+        with self._lock:
+            self.transferred += size
+            now = perf_counter()
+            if now - self._reported < self.PROGRESS_INTERVAL:
+                return
+            self._reported = now
+        notify(self.status() + "\n")
+
+
+class JobList:
+    """The background jobs started in this gdb session.
+
+    Jobs are listed until their completion has been reported by `bd jobs` or `bd wait`,
+    in the way a shell lists its jobs.
+
+    """
+    def __init__(self) -> None:
+        self._jobs = {}
+        self._next = 1
+
+    def __iter__(self):
+        return iter(list(self._jobs.values()))
+
+    def get(self, number: int) -> Job:
+        try:
+            return self._jobs[number]
+        except KeyError:
+            raise KeyError(f"no job {number}")
+
+    def start(self, description: str, func: Callable[[BackdoorMemoryInterface], Any],
+              total: Optional[int] = None) -> Job:
+        """Runs func(bd) on the current connection on a worker thread. """
+        job = Job(self._next, description, connections.uid, func, total)
+        self._jobs[job.number] = job
+        self._next += 1
+        job.start()
+        return job
+
+    def forget(self, job: Job) -> None:
+        """Removes a finished job from the list. """
+        if job.done:
+            self._jobs.pop(job.number, None)
+
+
+jobs = JobList()
@@ -20,8 +20,18 @@ def valid_port(port):
         return True
     return False
 
+def uid_to_args(uid):
+    """Converts a UID into the hostname, port and socket arguments used by the CLI helpers. """
+    if uid.startswith('unix:'):
+        return dict(hostname=None, port=None, socket=uid[len('unix:'):])
+    hostname,port = uid.split(':')
+    return dict(hostname=hostname, port=port, socket=None)
+
 class BackdoorUid(gdb.Parameter):
     """This parameter stores the pyOCD UID that identifies the DebugProbe.
+
+    The UID is either hostname:port for a direct connection to the simulator, or
+    unix:path to connect through a `bd daemon` broker.
     
     """
     def __init__(self):
@@ -32,7 +42,9 @@ class BackdoorUid(gdb.Parameter):
         self.saved_value = self.value
 
     def validate(self):
-        """The UID must be of the type localhost:port or ip_addr:port. """
+        """The UID must be of the type localhost:port, ip_addr:port or unix:path. """
+        if self.value.startswith('unix:'):
+            return len(self.value) > len('unix:')
         try:
             ip,port = self.value.split(':')
             if not valid_ip_address(ip) or not valid_port(port):
@@ -49,3 +61,29 @@ class BackdoorUid(gdb.Parameter):
         return f"set UID to {self.value}"
 
 BackdoorUid()
+
+class BackdoorMemoryMap(gdb.Parameter):
+    """This parameter names a memory map file that routes bd commands to several endpoints.
+
+    While it is set the endpoints of the memory map are used in place of bd-uid.  Set it
+    to an empty value to go back to bd-uid.
+
+    """
+    def __init__(self):
+        super().__init__("bd-memory-map", gdb.COMMAND_DATA, gdb.PARAM_OPTIONAL_FILENAME)
+        self.show_doc = "Memory map: "
+        self.value = ""
+        self.saved_value = self.value
+
+    def get_set_string(self):
+        if self.value:
+            from verilator_mem_if.memory_map import (MemoryMap, MemoryMapError)
+            try:
+                MemoryMap.load(self.value).close()
+            except (MemoryMapError, OSError) as e:
+                self.value = self.saved_value
+                raise gdb.GdbError(f"failed to read the memory map: {e}")
+        self.saved_value = self.value
+        return f"set memory map to {self.value}" if self.value else "using bd-uid"
+
+BackdoorMemoryMap()
@@ -0,0 +1,146 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import (Iterator, List, Optional, Sequence, Tuple)
+from .access import split_pages
+
+LOG = logging.getLogger(__name__)
+
+class LoadManifest:
+    """@brief Content hashes of the pages last loaded into a simulator.
+
+    A differential load splits every image segment into page aligned pieces and only
+    writes the pieces whose hash differs from the one recorded by the previous load of
+    the same target.  Contiguous changed pieces are merged so that they are still sent
+    as large blocks.
+
+    The manifest can only describe what this tool wrote, so before trusting it the
+    recorded hashes of a sample of pages are compared against data read back from the
+    target.  If the simulator was restarted or the memory was overwritten by something
+    else, the check fails and the whole image is loaded.  Pages the target program has
+    modified itself, such as its .data and .bss, are only noticed if they are sampled.
+
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Path, page_size: int = 0x1000) -> None:
+        self.path = Path(path)
+        self.page_size = int(page_size)
+        self._previous = {}
+        self._current = {}
+
+    @staticmethod
+    def default_path(target: str) -> Path:
+        """@brief Returns the manifest path used for |target| when none is given. """
+        cache = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+        return cache / "verilator_mem_if" / "manifests" / (re.sub(r"[^\w.-]", "_", target) + ".json")
+
+    def read(self) -> "LoadManifest":
+        try:
+            content = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return self
+        if content.get("version") == self.VERSION and content.get("page_size") == self.page_size:
+            self._previous = {int(addr, 16): digest for addr, digest in content["pieces"].items()}
+        return self
+
+    def write(self) -> None:
+        """@brief Record the pieces passed to diff() as loaded. """
+        self._save(self._current)
+
+    def checkpoint(self) -> None:
+        """@brief Record only the pieces that diff() found unchanged.
+
+        This must be done before the changed pieces are written, so that a load that is
+        interrupted leaves a manifest that is still true of the target.
+        """
+        self._save({addr: digest for addr, digest in self._current.items() if self._previous.get(addr) == digest})
+
+    def _save(self, pieces) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        content = {
+            "version"  : self.VERSION,
+            "page_size": self.page_size,
+            "pieces"   : {f"{addr:#x}": digest for addr, digest in sorted(pieces.items())},
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(content, indent=1))
+        tmp.replace(self.path)
+
+    def verify(self, bd, samples: Optional[int] = 64) -> bool:
+        """@brief Check that the target still holds the recorded data for a sample of pieces.
+
+        The first and last pieces of every contiguous run of recorded pieces, usually one
+        run per loaded segment, are read back along with pieces spread evenly between
+        them, up to |samples| pieces in all or every piece if |samples| is None.  The
+        reads are issued as a single batch when the interface supports it.  On failure
+        the recorded hashes are forgotten so that the next diff() writes everything.
+        """
+        if not self._previous:
+            return False
+        addresses = self._sample(samples)
+        lengths = [int(self._previous[addr].split(':')[0]) for addr in addresses]
+        if hasattr(bd, "batch"):
+            with bd.batch() as batch:
+                reads = [batch.read(addr, length) for addr, length in zip(addresses, lengths)]
+            contents = [read.data for read in reads]
+        else:
+            contents = [bd.read_memory_bytes(addr, length) for addr, length in zip(addresses, lengths)]
+        for addr, data in zip(addresses, contents):
+            if self._digest(data) != self._previous[addr]:
+                LOG.info(f"target no longer matches the load manifest at {addr:#x}, loading everything")
+                self._previous = {}
+                return False
+        return True
+
+    def diff(self, address: int, data) -> Iterator[Tuple[int, memoryview]]:
+        """@brief Yields (address, data) for the runs of |data| that differ from the last load. """
+        data = memoryview(data).cast('B')
+        run = None
+        for offset, _, _, size in split_pages(address, len(data), self.page_size):
+            piece = data[offset:offset + size]
+            digest = self._digest(piece)
+            self._current[address + offset] = digest
+            if self._previous.get(address + offset) == digest:
+                if run is not None:
+                    yield address + run, data[run:offset]
+                    run = None
+            elif run is None:
+                run = offset
+        if run is not None:
+            yield address + run, data[run:]
+
+    def _sample(self, samples: Optional[int]) -> List[int]:
+        """Returns the addresses of the recorded pieces that verify() reads back. """
+        addresses = sorted(self._previous)
+        if samples is None or samples >= len(addresses):
+            return addresses
+        ends = set()
+        for previous, addr in zip(addresses, addresses[1:]):
+            if previous + int(self._previous[previous].split(':')[0]) != addr:
+                ends.update((previous, addr))
+        chosen = set(self._spread(sorted(ends | {addresses[0], addresses[-1]}), samples))
+        chosen.update(self._spread([addr for addr in addresses if addr not in chosen], samples - len(chosen)))
+        return sorted(chosen)
+
+    @staticmethod
+    def _spread(items: Sequence[int], count: int) -> List[int]:
+        """Returns |count| items spread evenly over |items|, including both ends. """
+        if count <= 0:
+            return []
+        if count >= len(items):
+            return list(items)
+        step = (len(items) - 1) / max(count - 1, 1)
+        return [items[round(i * step)] for i in range(count)]
+
+    @staticmethod
+    def _digest(data) -> str:
+        return f"{len(data)}:{hashlib.blake2b(data, digest_size=16).hexdigest()}"
@@ -0,0 +1,312 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Memory maps routing accesses to several backdoor endpoints.
+
+A memory map file names the backdoor endpoints of a model and the address regions
+each of them serves, for example for a SoC whose ROM and flash are reached through
+one simulator port and whose DRAM is behind another:
+
+    default = "soc"                 # optional, for addresses outside every region
+
+    [endpoints.soc]
+    port = 5557
+
+    [endpoints.dram]
+    hostname = "localhost"
+    port = 5558
+    chunk_size = 0xffff
+    write_window = 16
+
+    [[regions]]
+    name = "flash"
+    start = 0x800000
+    size = 0x80000
+    endpoint = "soc"
+
+    [[regions]]
+    name = "dram"
+    start = 0x80000000
+    size = 0x10000000
+    endpoint = "dram"
+    address = 0x0                   # the region's start address on the endpoint
+    cacheable = true
+
+Endpoints take the hostname, port, socket, chunk_size and write_window arguments of
+BackdoorMemoryInterface.  Cacheable regions are those whose reads the gdb commands may
+cache while the target is stopped.  Files ending in .yaml or .yml are read as YAML,
+which needs PyYAML, and all others as TOML, which needs tomli before Python 3.11.
+"""
+
+import bisect
+import logging
+from concurrent.futures import (ThreadPoolExecutor, wait)
+from pathlib import Path
+from typing import (Callable, List, NamedTuple, Optional, Sequence, Union)
+from .access import MemoryAccessMixin
+from .backdoor_memory_interface import BackdoorMemoryInterface
+from . import metrics
+from . import record
+from . import trace
+
+LOG = logging.getLogger(__name__)
+
+class MemoryMapError(Exception):
+    pass
+
+
+class Endpoint(NamedTuple):
+    name: str
+    hostname: str = "localhost"
+    port: int = 5557
+    socket: Optional[str] = None
+    chunk_size: int = BackdoorMemoryInterface.DEFAULT_CHUNK_SIZE
+    write_window: int = 0
+
+
+class Region(NamedTuple):
+    name: str
+    start: int
+    size: int
+    endpoint: str
+    address: int
+    cacheable: bool = False
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size
+
+
+def _int(value, what: str) -> int:
+    try:
+        return value if isinstance(value, int) else int(value, 0)
+    except (TypeError, ValueError):
+        raise MemoryMapError(f"{what} must be an integer, got {value!r}")
+
+
+class MemoryMap(MemoryAccessMixin):
+    """@brief Routes accesses to the backdoor endpoints of the regions they fall in.
+
+    The map has the block access methods of BackdoorMemoryInterface, so it can be used
+    wherever an interface is.  An access spanning several regions is split at the region
+    boundaries and, when the pieces belong to different endpoints, the pieces of each
+    endpoint are issued on a thread of their own.  Addresses outside every region go to
+    the |default| endpoint, or raise MemoryMapError if there is none.
+
+    """
+
+    def __init__(self, endpoints: Sequence[Endpoint], regions: Sequence[Region],
+                 default: Optional[str] = None, name: str = "memory map") -> None:
+        self.name = name
+        self.endpoints = {endpoint.name: endpoint for endpoint in endpoints}
+        self.regions = sorted(regions, key=lambda region: region.start)
+        self.default = default
+        for region in self.regions:
+            if region.endpoint not in self.endpoints:
+                raise MemoryMapError(f"region '{region.name}' uses the unknown endpoint '{region.endpoint}'")
+        for previous, region in zip(self.regions, self.regions[1:]):
+            if region.start < previous.end:
+                raise MemoryMapError(f"regions '{previous.name}' and '{region.name}' overlap")
+        if default is not None and default not in self.endpoints:
+            raise MemoryMapError(f"the default endpoint '{default}' is not defined")
+        self._starts = [region.start for region in self.regions]
+        self._interfaces = {}
+        for endpoint in self.endpoints.values():
+            bd = BackdoorMemoryInterface(
+                endpoint.hostname,
+                endpoint.port,
+                write_window=endpoint.write_window,
+                chunk_size=endpoint.chunk_size,
+                path=endpoint.socket
+            )
+            trace.attach(bd)
+            record.attach(bd)
+            self._interfaces[endpoint.name] = bd
+        self._pool = None
+
+    @classmethod
+    def from_dict(cls, config: dict, name: str = "memory map") -> "MemoryMap":
+        """@brief Builds a map from the parsed contents of a memory map file. """
+        try:
+            endpoints = [
+                Endpoint(
+                    endpoint,
+                    settings.get("hostname", "localhost"),
+                    _int(settings.get("port", 5557), f"endpoint '{endpoint}' port"),
+                    settings.get("socket"),
+                    _int(settings.get("chunk_size", BackdoorMemoryInterface.DEFAULT_CHUNK_SIZE), f"endpoint '{endpoint}' chunk_size"),
+                    _int(settings.get("write_window", 0), f"endpoint '{endpoint}' write_window"),
+                )
+                for endpoint, settings in config.get("endpoints", {}).items()
+            ]
+            regions = []
+            for region in config.get("regions", []):
+                start = _int(region["start"], f"region '{region['name']}' start")
+                regions.append(Region(
+                    region["name"],
+                    start,
+                    _int(region["size"], f"region '{region['name']}' size"),
+                    region["endpoint"],
+                    _int(region.get("address", start), f"region '{region['name']}' address"),
+                    bool(region.get("cacheable", False)),
+                ))
+        except KeyError as e:
+            raise MemoryMapError(f"{name}: missing key {e}")
+        except (AttributeError, TypeError):
+            raise MemoryMapError(f"{name}: expecting a table of endpoints and a list of regions")
+        return cls(endpoints, regions, config.get("default"), name)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "MemoryMap":
+        """@brief Reads a memory map from a TOML or YAML file. """
+        path = Path(path)
+        if path.suffix in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise MemoryMapError("reading YAML memory maps needs PyYAML, install it with `pip install pyyaml`")
+            config = yaml.safe_load(path.read_text())
+        else:
+            try:
+                import tomllib
+            except ImportError:
+                try:
+                    import tomli as tomllib
+                except ImportError:
+                    raise MemoryMapError("reading TOML memory maps needs tomli before Python 3.11, install it with `pip install tomli`")
+            try:
+                config = tomllib.loads(path.read_text())
+            except tomllib.TOMLDecodeError as e:
+                raise MemoryMapError(f"{path}: {e}")
+        return cls.from_dict(config or {}, str(path))
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
+
+    def connect(self) -> None:
+        for bd in self._interfaces.values():
+            bd.connect()
+
+    def close(self) -> None:
+        for bd in self._interfaces.values():
+            bd.close()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    @property
+    def target(self) -> str:
+        return f"map:{self.name}"
+
+    @property
+    def interfaces(self) -> List[BackdoorMemoryInterface]:
+        """@brief The interfaces of the endpoints. """
+        return list(self._interfaces.values())
+
+    def interface(self, endpoint: str) -> BackdoorMemoryInterface:
+        return self._interfaces[endpoint]
+
+    def region(self, name: str) -> Region:
+        for region in self.regions:
+            if region.name == name:
+                return region
+        raise MemoryMapError(f"no region named '{name}' in {self.name}")
+
+    def cacheable_regions(self) -> List[Region]:
+        return [region for region in self.regions if region.cacheable]
+
+    def stats(self) -> metrics.Metrics:
+        """@brief Returns the metrics of all endpoints combined. """
+        combined = metrics.Metrics(self.target)
+        for bd in self._interfaces.values():
+            combined.merge(bd.stats())
+        return combined
+
+    def fill_memory(self, addr: int, size: int, pattern: Union[bytes, int] = b'\xff') -> None:
+        """@brief Fill |size| bytes from |addr| by repeating |pattern| across the regions. """
+        if isinstance(pattern, int):
+            pattern = bytes([pattern])
+        pattern = bytes(pattern)
+
+        def fill(bd, address, offset, n):
+            # Rotate the pattern so that its phase continues across region boundaries
+            phase = offset % len(pattern)
+            bd.fill_memory(address, n, pattern[phase:] + pattern[:phase])
+        self._dispatch(self._route(addr, size), fill)
+
+    def flush(self) -> None:
+        """@brief Wait for the outstanding writes of every endpoint. """
+        for bd in self._interfaces.values():
+            bd.flush()
+
+    # Private methods
+
+    def _write_mem8(self, addr: int, data: Sequence[int]) -> None:
+        # Route on the byte length, |data| may be an array of wider items
+        payload = BackdoorMemoryInterface._as_payload(data)
+        try:
+            pieces = self._route(addr, payload.nbytes)
+            self._dispatch(pieces, lambda bd, address, offset, n:
+                           bd.write_memory_block8(address, payload[offset:offset + n]))
+        finally:
+            payload.release()
+
+    def _read_mem8_into(self, addr: int, view: memoryview) -> None:
+        self._dispatch(self._route(addr, len(view)), lambda bd, address, offset, n:
+                       bd.read_memory_block8_into(address, view[offset:offset + n]))
+
+    def _route(self, addr: int, size: int) -> List[tuple]:
+        """Splits an access into (endpoint, endpoint_address, offset, size) pieces. """
+        pieces = []
+        offset = 0
+        while offset < size:
+            address = addr + offset
+            i = bisect.bisect_right(self._starts, address) - 1
+            if i >= 0 and address < self.regions[i].end:
+                region = self.regions[i]
+                n = min(size - offset, region.end - address)
+                endpoint, address = region.endpoint, address - region.start + region.address
+            else:
+                if self.default is None:
+                    raise MemoryMapError(f"no region of {self.name} contains the address {address:#x}")
+                following = self._starts[i + 1] if i + 1 < len(self._starts) else addr + size
+                n = min(size - offset, following - address)
+                endpoint = self.default
+            previous = pieces[-1] if pieces else None
+            if previous and previous[0] == endpoint and previous[1] + previous[3] == address:
+                pieces[-1] = (endpoint, previous[1], previous[2], previous[3] + n)
+            else:
+                pieces.append((endpoint, address, offset, n))
+            offset += n
+        return pieces
+
+    def _dispatch(self, pieces: List[tuple], func: Callable[[BackdoorMemoryInterface, int, int, int], None]) -> None:
+        """Calls func(bd, address, offset, size) for each piece, one thread per endpoint. """
+        by_endpoint = {}
+        for endpoint, address, offset, n in pieces:
+            by_endpoint.setdefault(endpoint, []).append((address, offset, n))
+
+        def run(endpoint):
+            bd = self._interfaces[endpoint]
+            for address, offset, n in by_endpoint[endpoint]:
+                func(bd, address, offset, n)
+
+        if len(by_endpoint) <= 1:
+            for endpoint in by_endpoint:
+                run(endpoint)
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=len(self._interfaces))
+        futures = [self._pool.submit(run, endpoint) for endpoint in by_endpoint]
+        wait(futures)
+        for future in futures:
+            future.result()
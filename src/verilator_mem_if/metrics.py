@@ -0,0 +1,186 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Counters and latency histograms for backdoor interfaces.
+
+Every BackdoorMemoryInterface keeps a Metrics instance, returned by its stats()
+method.  The histograms use fixed power of two buckets so that recording an
+operation is a bisect and a few additions, and so that histograms from many runs
+can be summed.
+
+When an aggregate is enabled with enable_aggregate(), interfaces created afterwards
+also add their measurements to it, which lets a CLI command or a gdb session report
+on all of the connections it made.
+"""
+
+import bisect
+import threading
+from typing import (Dict, Optional)
+
+_aggregate = None
+
+class Histogram:
+    """@brief A latency histogram with power of two bucket bounds from 1us to ~8s. """
+
+    BOUNDS = tuple(2 ** i * 1e-6 for i in range(24))
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """@brief Returns the upper bound of the bucket holding the |q| quantile. """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count"  : self.count,
+            "mean_us": self.sum / self.count * 1e6 if self.count else 0.0,
+            "p50_us" : self.quantile(0.5) * 1e6,
+            "p99_us" : self.quantile(0.99) * 1e6,
+            "max_us" : self.max * 1e6,
+        }
+
+
+class Metrics:
+    """@brief Transaction and byte counters with a latency histogram per operation.
+
+    Operations are the public level accesses, for example a whole write_memory_block8()
+    call, each of which may comprise several transactions.
+    """
+
+    def __init__(self, target: str = "", parent: Optional["Metrics"] = None) -> None:
+        self.target = target
+        self._parent = parent
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.transactions = {}
+            self.bytes_read = 0
+            self.bytes_written = 0
+            self.latency = {}
+
+    def observe(self, op: str, seconds: float, transactions: int = 1, read: int = 0, written: int = 0) -> None:
+        """@brief Record one operation of |transactions| transactions taking |seconds|. """
+        with self._lock:
+            self.transactions[op] = self.transactions.get(op, 0) + transactions
+            self.bytes_read += read
+            self.bytes_written += written
+            try:
+                histogram = self.latency[op]
+            except KeyError:
+                histogram = self.latency[op] = Histogram()
+            histogram.observe(seconds)
+        if self._parent is not None:
+            self._parent.observe(op, seconds, transactions, read, written)
+
+    def merge(self, other: "Metrics") -> None:
+        with self._lock:
+            for op, count in other.transactions.items():
+                self.transactions[op] = self.transactions.get(op, 0) + count
+            self.bytes_read += other.bytes_read
+            self.bytes_written += other.bytes_written
+            for op, histogram in other.latency.items():
+                self.latency.setdefault(op, Histogram()).merge(histogram)
+
+    def summary(self) -> dict:
+        """@brief Returns the counters and latency summaries as a JSON serializable dict. """
+        return {
+            "target"       : self.target,
+            "transactions" : dict(self.transactions),
+            "bytes_read"   : self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "latency"      : {op: histogram.summary() for op, histogram in sorted(self.latency.items())},
+        }
+
+    def report(self) -> str:
+        """@brief Returns a human readable report. """
+        lines = [
+            f"target        : {self.target}",
+            f"transactions  : {sum(self.transactions.values())}",
+            f"bytes read    : {self.bytes_read}",
+            f"bytes written : {self.bytes_written}",
+            f"{'operation':<10} {'count':>8} {'txns':>8} {'mean us':>10} {'p50 us':>10} {'p99 us':>10} {'max us':>10}",
+        ]
+        for op, histogram in sorted(self.latency.items()):
+            s = histogram.summary()
+            lines.append(
+                f"{op:<10} {s['count']:>8} {self.transactions.get(op, 0):>8} "
+                f"{s['mean_us']:>10.1f} {s['p50_us']:>10.1f} {s['p99_us']:>10.1f} {s['max_us']:>10.1f}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def prometheus(self, prefix: str = "backdoor", labels: Optional[Dict[str, str]] = None) -> str:
+        """@brief Returns the metrics in the Prometheus text exposition format. """
+        labels = dict(labels or {})
+        if self.target:
+            labels.setdefault("target", self.target)
+
+        def fmt(extra: Optional[Dict[str, str]] = None) -> str:
+            items = {**labels, **(extra or {})}
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+        lines = [
+            f"# HELP {prefix}_transactions_total Backdoor transactions sent, by operation.",
+            f"# TYPE {prefix}_transactions_total counter",
+        ]
+        for op, count in sorted(self.transactions.items()):
+            lines.append(f"{prefix}_transactions_total{fmt({'op': op})} {count}")
+        lines += [
+            f"# HELP {prefix}_read_bytes_total Bytes read from memory.",
+            f"# TYPE {prefix}_read_bytes_total counter",
+            f"{prefix}_read_bytes_total{fmt()} {self.bytes_read}",
+            f"# HELP {prefix}_written_bytes_total Bytes written to memory.",
+            f"# TYPE {prefix}_written_bytes_total counter",
+            f"{prefix}_written_bytes_total{fmt()} {self.bytes_written}",
+            f"# HELP {prefix}_operation_seconds Latency of backdoor operations.",
+            f"# TYPE {prefix}_operation_seconds histogram",
+        ]
+        for op, histogram in sorted(self.latency.items()):
+            cumulative = 0
+            for bound, count in zip(Histogram.BOUNDS, histogram.counts):
+                cumulative += count
+                lines.append(f"{prefix}_operation_seconds_bucket{fmt({'op': op, 'le': repr(bound)})} {cumulative}")
+            lines.append(f"{prefix}_operation_seconds_bucket{fmt({'op': op, 'le': '+Inf'})} {histogram.count}")
+            lines.append(f"{prefix}_operation_seconds_sum{fmt({'op': op})} {histogram.sum!r}")
+            lines.append(f"{prefix}_operation_seconds_count{fmt({'op': op})} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def enable_aggregate() -> Metrics:
+    """@brief Start aggregating the metrics of interfaces created from now on. """
+    global _aggregate
+    if _aggregate is None:
+        _aggregate = Metrics()
+    return _aggregate
+
+
+def aggregate() -> Optional[Metrics]:
+    """@brief Returns the aggregate metrics, or None if aggregation is not enabled. """
+    return _aggregate
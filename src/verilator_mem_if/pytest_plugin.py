@@ -0,0 +1,25 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""pytest fixtures for testing against the reference backdoor server.
+
+The plugin is registered through the `pytest11` entry point, so the fixtures are
+available to any test suite once the package is installed.
+"""
+
+import pytest
+from .backdoor_memory_interface import BackdoorMemoryInterface
+from .server import BackdoorServer
+
+@pytest.fixture
+def backdoor_server():
+    """A BackdoorServer bound to an ephemeral port on localhost. """
+    with BackdoorServer("localhost", 0) as server:
+        yield server
+
+@pytest.fixture
+def backdoor(backdoor_server):
+    """A BackdoorMemoryInterface connected to |backdoor_server|. """
+    with BackdoorMemoryInterface(*backdoor_server.address) as bd:
+        yield bd
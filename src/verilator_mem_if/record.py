@@ -0,0 +1,235 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Record and replay of backdoor sessions.
+
+A Recorder attached to an interface logs every write, read, fill and flush to a
+compact binary file, with the data written or read and the time taken.  Logs whose
+name ends in .gz are compressed.  A log can then be replayed against a simulator
+with replay(), as fast as possible or with the original timing, or served by
+`BackdoorServer(memory=ReplayMemory(log))` as a stand-in that returns the recorded
+read data.
+
+Accesses are recorded as issued through the public API, before they are split into
+transactions, so replaying a log exercises the current chunking and pipelining
+settings.  The accesses of a batch are recorded individually.
+
+The file starts with MAGIC, followed by a RECORD header per access holding the start
+time and duration in seconds, the opcode, address, size and payload length.  The
+payload is the data written or read, or the pattern of a fill.
+"""
+
+import gzip
+import logging
+import struct
+import threading
+from collections import deque
+from pathlib import Path
+from time import (perf_counter, sleep)
+from typing import (Iterator, NamedTuple, Union)
+from .backdoor_memory_interface import BackdoorMemoryInterface
+from .server import SparseMemory
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b"BDREC\x00\x01\x00"
+RECORD = struct.Struct('<ddBIII')
+
+WRITE = BackdoorMemoryInterface.WRITE
+READ  = BackdoorMemoryInterface.READ
+FILL  = BackdoorMemoryInterface.FILL
+FLUSH = 0x10
+
+_recorder = None
+
+class Record(NamedTuple):
+    time: float
+    duration: float
+    op: int
+    address: int
+    size: int
+    payload: bytes
+
+
+def _open(path: Union[str, Path], mode: str):
+    path = Path(path)
+    return gzip.open(path, mode) if path.suffix == ".gz" else path.open(mode)
+
+
+def read_log(path: Union[str, Path]) -> Iterator[Record]:
+    """@brief Yields the records of a session log. """
+    with _open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not a backdoor session log")
+        while True:
+            header = f.read(RECORD.size)
+            if not header:
+                return
+            if len(header) < RECORD.size:
+                raise ValueError(f"'{path}' is truncated")
+            *fields, length = RECORD.unpack(header)
+            yield Record(*fields, f.read(length))
+
+
+class Recorder:
+    """@brief Logs the accesses made through one or more interfaces to a file. """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._file = _open(self.path, 'wb')
+        self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._origin = perf_counter()
+        self.records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def record(self, start: float, end: float, op: int, addr: int, size: int, payload=b'') -> None:
+        with self._lock:
+            self._file.write(RECORD.pack(start - self._origin, end - start, op, addr, size, len(payload)))
+            self._file.write(payload)
+            self.records += 1
+
+    def attach(self, bd: BackdoorMemoryInterface) -> None:
+        """@brief Record the accesses made through |bd|, by wrapping its methods. """
+        record = self.record
+        write_mem8, read_mem8_into, fill_mem8 = bd._write_mem8, bd._read_mem8_into, bd._fill_mem8
+        flush, transact = bd._flush, bd._transact
+
+        def _write_mem8(addr, data):
+            payload = bd._as_payload(data)
+            try:
+                start = perf_counter()
+                write_mem8(addr, payload)
+                record(start, perf_counter(), WRITE, addr, len(payload), payload)
+            finally:
+                payload.release()
+
+        def _read_mem8_into(addr, view):
+            start = perf_counter()
+            read_mem8_into(addr, view)
+            record(start, perf_counter(), READ, addr, len(view), view)
+
+        def _fill_mem8(addr, size, pattern):
+            start = perf_counter()
+            fill_mem8(addr, size, pattern)
+            record(start, perf_counter(), FILL, addr, size, pattern)
+
+        def _flush():
+            start = perf_counter()
+            flush()
+            record(start, perf_counter(), FLUSH, 0, 0)
+
+        def _transact(transactions):
+            start = perf_counter()
+            transact(transactions)
+            end = perf_counter()
+            for addr, rnw, view in transactions:
+                record(start, end, rnw, addr, len(view), view)
+
+        bd._write_mem8, bd._read_mem8_into, bd._fill_mem8 = _write_mem8, _read_mem8_into, _fill_mem8
+        bd._flush, bd._transact = _flush, _transact
+
+
+def replay(path: Union[str, Path], bd: BackdoorMemoryInterface, realtime: bool = False, verify: bool = False) -> dict:
+    """@brief Re-issue a recorded session through |bd|.
+
+    Accesses are issued back to back unless |realtime|, in which case each starts at its
+    recorded offset from the start of the session.  With |verify| the data read is
+    compared with the recording and the mismatches are counted.
+    """
+    summary = {"accesses": 0, "bytes_written": 0, "bytes_read": 0, "mismatches": 0, "recorded_s": 0.0}
+    start = perf_counter()
+    for record in read_log(path):
+        if realtime:
+            delay = record.time - (perf_counter() - start)
+            if delay > 0:
+                sleep(delay)
+        if record.op == WRITE:
+            bd.write_memory_block8(record.address, record.payload)
+            summary["bytes_written"] += record.size
+        elif record.op == READ:
+            data = bd.read_memory_bytes(record.address, record.size)
+            summary["bytes_read"] += record.size
+            if verify and data != record.payload:
+                summary["mismatches"] += 1
+                LOG.warning(f"read of {record.size} bytes at {record.address:#x} differs from the recording")
+        elif record.op == FILL:
+            bd.fill_memory(record.address, record.size, record.payload)
+            summary["bytes_written"] += record.size
+        elif record.op == FLUSH:
+            bd.flush()
+        summary["accesses"] += 1
+        summary["recorded_s"] = record.time + record.duration
+    bd.flush()
+    summary["elapsed_s"] = perf_counter() - start
+    return summary
+
+
+class ReplayMemory:
+    """@brief A memory for BackdoorServer that answers reads with recorded data.
+
+    Each read is answered from the oldest recorded read that covers it and has not been
+    used up, so a client repeating a recorded session sees the data the simulator
+    returned, even where that depended on the simulation running in between.  Reads
+    the recording does not cover are answered from the data written so far.
+
+    """
+    def __init__(self, path: Union[str, Path], page_size: int = 4096, default: int = 0x00) -> None:
+        self._memory = SparseMemory(page_size, default)
+        self._reads = deque(
+            [record.address, record.size, record.payload]
+            for record in read_log(path) if record.op == READ
+        )
+
+    @property
+    def remaining(self) -> int:
+        """Returns the number of recorded reads not yet used up. """
+        return len(self._reads)
+
+    def read(self, addr: int, size: int) -> bytearray:
+        for i, entry in enumerate(self._reads):
+            start, length, payload = entry
+            if start <= addr and addr + size <= start + length:
+                data = bytearray(payload[addr - start:addr - start + size])
+                if addr + size == start + length:
+                    del self._reads[i]
+                return data
+        return self._memory.read(addr, size)
+
+    def write(self, addr: int, data) -> None:
+        self._memory.write(addr, data)
+
+    def fill(self, addr: int, size: int, pattern: bytes) -> None:
+        self._memory.fill(addr, size, pattern)
+
+
+def start(path: Union[str, Path]) -> Recorder:
+    """@brief Start recording every interface passed to attach() to |path|. """
+    global _recorder
+    _recorder = Recorder(path)
+    return _recorder
+
+
+def stop() -> None:
+    """@brief Stop and close the global recording. """
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def attach(bd: BackdoorMemoryInterface) -> None:
+    """@brief Record |bd| to the global recording, if one was started. """
+    if _recorder is not None:
+        _recorder.attach(bd)
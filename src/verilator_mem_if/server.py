@@ -0,0 +1,247 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import logging
+import os
+import socket
+import socketserver
+import threading
+from time import sleep
+from typing import (Optional, Union)
+from .access import split_pages
+from .backdoor_memory_interface import BackdoorMemoryInterface
+
+LOG = logging.getLogger(__name__)
+
+class SparseMemory:
+    """@brief A sparse, page granular byte store.
+
+    Pages are only allocated when written so that multi-GiB address spaces can be
+    modelled cheaply.  Memory that has never been written reads back as |default|.
+
+    """
+    def __init__(self, page_size: int = 4096, default: int = 0x00) -> None:
+        self._page_size = int(page_size)
+        self._default = default
+        self._pages = {}
+
+    @property
+    def page_size(self) -> int:
+        return self._page_size
+
+    @property
+    def pages(self) -> int:
+        """Returns the number of allocated pages. """
+        return len(self._pages)
+
+    def read(self, addr: int, size: int) -> bytearray:
+        data = bytearray([self._default]) * size
+        for offset, page, page_offset, n in split_pages(addr, size, self._page_size):
+            page = self._pages.get(page)
+            if page is not None:
+                data[offset:offset + n] = page[page_offset:page_offset + n]
+        return data
+
+    def write(self, addr: int, data: Union[bytes, bytearray, memoryview]) -> None:
+        data = memoryview(data).cast('B')
+        for offset, page, page_offset, n in split_pages(addr, len(data), self._page_size):
+            self._page(page)[page_offset:page_offset + n] = data[offset:offset + n]
+
+    def fill(self, addr: int, size: int, pattern: bytes) -> None:
+        # A run of the pattern long enough to fill any page from any phase
+        run = pattern * (self._page_size // len(pattern) + 2)
+        for offset, page, page_offset, n in split_pages(addr, size, self._page_size):
+            phase = offset % len(pattern)
+            self._page(page)[page_offset:page_offset + n] = run[phase:phase + n]
+
+    def clear(self) -> None:
+        self._pages.clear()
+
+    def _page(self, page: int) -> bytearray:
+        try:
+            return self._pages[page]
+        except KeyError:
+            self._pages[page] = bytearray([self._default]) * self._page_size
+            return self._pages[page]
+
+
+class _BackdoorRequestHandler(socketserver.StreamRequestHandler):
+    """Services the backdoor protocol for a single client connection. """
+
+    def handle(self):
+        backdoor = self.server.backdoor
+        if self.request.family != getattr(socket, "AF_UNIX", None):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        LOG.debug(f"client connected from {self.client_address}")
+        while True:
+            header = self.rfile.read(BackdoorMemoryInterface.HEADER.size)
+            if len(header) < BackdoorMemoryInterface.HEADER.size:
+                break
+            addr, size, rnw = BackdoorMemoryInterface.HEADER.unpack(header)
+            try:
+                response = backdoor.transact(addr, size, rnw, self.rfile)
+            except Exception as e:
+                # There is no error reply in the protocol, closing the connection is
+                # the only way to tell the client the request failed
+                LOG.error(f"request from {self.client_address} failed: {e!r}")
+                break
+            if response:
+                self.wfile.write(response)
+        backdoor.disconnected()
+        LOG.debug(f"client disconnected from {self.client_address}")
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _ThreadingUnixStreamServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class BackdoorServer:
+    """@brief A pure Python reference implementation of the backdoor protocol.
+
+    The server speaks the protocol documented by BackdoorMemoryInterface, including
+    the FILL and PROBE extensions, on top of a SparseMemory, or any object providing
+    the same read()/write()/fill() methods.  Every transaction can be slowed down by
+    a fixed |latency| in seconds plus the time taken to move its payload at
+    |bandwidth| bytes per second, which makes it useful for benchmarking and testing
+    without a Verilator model.
+
+    Setting |capabilities| to 0 emulates a server that predates the extended opcodes.
+    Passing |path| serves on a Unix domain socket instead of |hostname|:|port|.
+
+    Use port 0 to bind an ephemeral port, the bound port is available from |port|:
+
+        with BackdoorServer(port=0) as server:
+            with BackdoorMemoryInterface(*server.address) as bd:
+                bd.write_memory(0x0, 0x12345678)
+
+    """
+
+    def __init__(self,
+                 hostname: str = "localhost",
+                 port: int = 5557,
+                 memory: Optional[SparseMemory] = None,
+                 latency: float = 0.0,
+                 bandwidth: Optional[float] = None,
+                 capabilities: int = BackdoorMemoryInterface.CAP_FILL,
+                 path: Optional[str] = None
+                 ) -> None:
+        self.memory = SparseMemory() if memory is None else memory
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.capabilities = capabilities
+        self.transactions = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._serving = False
+        self._path = str(path) if path else None
+        if self._path:
+            self._server = _ThreadingUnixStreamServer(self._path, _BackdoorRequestHandler)
+        else:
+            self._server = _ThreadingTCPServer((hostname, int(port)), _BackdoorRequestHandler)
+        self._server.backdoor = self
+        LOG.debug(f"backdoor server listening on {self.target}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def target(self) -> str:
+        """Returns the endpoint as a `hostname:port` or `unix:path` string. """
+        return f"unix:{self._path}" if self._path else f"{self.hostname}:{self.port}"
+
+    @property
+    def address(self):
+        """Returns the (hostname, port) tuple the server is bound to, or its socket path. """
+        if self._path:
+            return self._path
+        return self._server.server_address[:2]
+
+    @property
+    def hostname(self) -> Optional[str]:
+        return None if self._path else self.address[0]
+
+    @property
+    def port(self) -> Optional[int]:
+        return None if self._path else self.address[1]
+
+    def start(self) -> None:
+        """@brief Start serving on a background thread. """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def serve_forever(self) -> None:
+        """@brief Serve on the calling thread until stop() is called. """
+        self._serving = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._serving = False
+
+    def stop(self) -> None:
+        # shutdown() blocks until serve_forever() returns so only call it if serving
+        if self._serving or self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def transact(self, addr: int, size: int, rnw: int, rfile) -> Optional[bytes]:
+        """Executes one request, reading any payload from |rfile|, and returns the response. """
+        bd = BackdoorMemoryInterface
+        extended = self.capabilities != 0
+        if rnw == bd.READ:
+            self._delay(size)
+            with self._lock:
+                self.transactions += 1
+                return self.memory.read(addr, size)
+        if rnw == bd.PROBE and extended:
+            self._delay(0)
+            return bytes([bd.PROBE_REPLY, self.capabilities])
+        if rnw == bd.FILL and self.capabilities & bd.CAP_FILL:
+            payload = rfile.read(bd.FILL_LENGTH.size + size)
+            length, = bd.FILL_LENGTH.unpack_from(payload)
+            self._delay(len(payload))
+            with self._lock:
+                self.transactions += 1
+                self.memory.fill(addr, length, payload[bd.FILL_LENGTH.size:])
+            return bytes([bd.ACK])
+        if rnw != bd.WRITE and extended:
+            LOG.warning(f"unsupported opcode {rnw:#x}, treating as a write")
+        # Like the original C model, anything that isn't a read is a write
+        payload = rfile.read(size)
+        self._delay(len(payload))
+        with self._lock:
+            self.transactions += 1
+            self.memory.write(addr, payload)
+        return bytes([bd.ACK])
+
+    def disconnected(self) -> None:
+        """Called when a client disconnects, flushing the memory if it is buffered. """
+        flush = getattr(self.memory, "flush", None)
+        if flush is not None:
+            with self._lock:
+                try:
+                    flush()
+                except Exception as e:
+                    LOG.error(f"failed to flush memory after client disconnect: {e}")
+
+    def _delay(self, size: int) -> None:
+        delay = self.latency
+        if self.bandwidth:
+            delay += size / self.bandwidth
+        if delay > 0:
+            sleep(delay)
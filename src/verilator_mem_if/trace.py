@@ -0,0 +1,150 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Opt-in tracing of backdoor transactions in the Chrome trace event format.
+
+Tracing is disabled by default and then costs nothing but a global lookup per
+phase: interfaces are only instrumented when a tracer is attached to them, by
+replacing the transport methods on that instance.
+
+    tracer = trace.enable()
+    with BackdoorMemoryInterface() as bd:
+        tracer.attach(bd)
+        with trace.span("load"):
+            ...
+    tracer.export("load.json")
+
+The exported file can be opened in https://ui.perfetto.dev or chrome://tracing.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import (IO, Optional, Union)
+
+_tracer = None
+
+class Tracer:
+    """@brief Records timed events and exports them as Chrome trace JSON. """
+
+    # Transport methods instrumented by attach(), mapped to the arguments recorded
+    PROBES = {
+        "connect"      : lambda: {},
+        "_send_header" : lambda addr, size, rnw: {"addr": f"{addr:#x}", "size": size, "rnw": rnw},
+        "_send_payload": lambda data: {"size": len(data)},
+        "_send_buffers": lambda buffers: {"buffers": len(buffers), "size": sum(len(b) for b in buffers)},
+        "_recv_acks"   : lambda count: {"count": count},
+        "_recv_payload": lambda view: {"size": len(view)},
+        "_recv_bytes"  : lambda size: {"size": size},
+    }
+
+    def __init__(self) -> None:
+        self._events = []
+        self._origin = perf_counter()
+        self._pid = os.getpid()
+
+    @property
+    def events(self) -> list:
+        return self._events
+
+    def record(self, name: str, category: str, start: float, end: float, **args) -> None:
+        """@brief Record a complete event between two perf_counter() timestamps. """
+        self._events.append({
+            "name": name,
+            "cat" : category,
+            "ph"  : "X",
+            "ts"  : (start - self._origin) * 1e6,
+            "dur" : (end - start) * 1e6,
+            "pid" : self._pid,
+            "tid" : threading.get_ident(),
+            "args": args,
+        })
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase", **args):
+        """@brief Record the time spent in a with block. """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, category, start, perf_counter(), **args)
+
+    def attach(self, bd) -> None:
+        """@brief Instrument the transport methods of the interface |bd|. """
+        for name, describe in self.PROBES.items():
+            method = getattr(bd, name, None)
+            if method is not None and not hasattr(method, "__traced__"):
+                setattr(bd, name, self._wrap(name.lstrip('_'), method, describe, bd.target))
+
+    @staticmethod
+    def detach(bd) -> None:
+        """@brief Remove the instrumentation added by attach(). """
+        for name in Tracer.PROBES:
+            if hasattr(getattr(bd, name, None), "__traced__"):
+                delattr(bd, name)
+
+    def export(self, file: Union[str, Path, IO]) -> None:
+        """@brief Write the recorded events to a file name or text file object. """
+        content = {"traceEvents": self._events, "displayTimeUnit": "ms"}
+        if isinstance(file, (str, Path)):
+            with Path(file).open('w') as f:
+                json.dump(content, f)
+        else:
+            json.dump(content, file)
+
+    def _wrap(self, name: str, method, describe, target: str):
+        record = self.record
+
+        def traced(*args):
+            start = perf_counter()
+            try:
+                return method(*args)
+            finally:
+                record(name, "transport", start, perf_counter(), target=target, **describe(*args))
+        traced.__traced__ = True
+        return traced
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+def enable() -> Tracer:
+    """@brief Make a new Tracer the global tracer used by span() and attach(). """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """@brief Stop global tracing, returning the tracer that was active. """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, category: str = "phase", **args):
+    """@brief A context manager timing a phase with the global tracer, if enabled. """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, category, **args)
+
+
+def attach(bd) -> None:
+    """@brief Instrument |bd| with the global tracer, if enabled. """
+    if _tracer is not None:
+        _tracer.attach(bd)
@@ -0,0 +1,123 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""pytest-benchmark versions of the `bd bench` measurements.
+
+Run with `pytest tests/bench`, adding --benchmark-autosave and --benchmark-compare
+to track the results between commits.  The tests are skipped if pytest-benchmark is
+not installed.
+"""
+
+import io
+import os
+import pytest
+from verilator_mem_if import conversion
+from verilator_mem_if.backdoor import load_file
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.bench import DEFAULT_CHUNK_SIZES
+from verilator_mem_if.formatters import FORMATTERS
+from verilator_mem_if.server import BackdoorServer
+
+pytest.importorskip("pytest_benchmark")
+
+SIZE = 0x100000
+DATA = os.urandom(SIZE)
+
+@pytest.fixture
+def legacy_backdoor():
+    """A BackdoorMemoryInterface connected to a server without the extended opcodes. """
+    with BackdoorServer("localhost", 0, capabilities=0) as server:
+        with BackdoorMemoryInterface(*server.address) as bd:
+            yield bd
+
+@pytest.mark.benchmark(group="latency")
+def test_write_memory(benchmark, backdoor):
+    benchmark(backdoor.write_memory, 0x0, 0xa5a5a5a5)
+
+@pytest.mark.benchmark(group="latency")
+def test_read_memory(benchmark, backdoor):
+    benchmark(backdoor.read_memory, 0x0)
+
+@pytest.mark.benchmark(group="write")
+@pytest.mark.parametrize("chunk_size", DEFAULT_CHUNK_SIZES, ids=hex)
+def test_block_write(benchmark, backdoor, chunk_size):
+    backdoor.chunk_size = chunk_size
+    benchmark(backdoor.write_memory_block8, 0x0, DATA)
+
+@pytest.mark.benchmark(group="read")
+@pytest.mark.parametrize("chunk_size", DEFAULT_CHUNK_SIZES, ids=hex)
+def test_block_read(benchmark, backdoor, chunk_size):
+    backdoor.chunk_size = chunk_size
+    backdoor.write_memory_block8(0x0, DATA)
+    buf = bytearray(SIZE)
+    benchmark(backdoor.read_memory_block8_into, 0x0, buf)
+    assert buf == DATA
+
+@pytest.mark.benchmark(group="small writes")
+@pytest.mark.parametrize("write_window", [0, 16, 64])
+def test_write_window(benchmark, backdoor_server, write_window):
+    with BackdoorMemoryInterface(*backdoor_server.address, write_window=write_window) as bd:
+        def write():
+            for addr in range(0, 0x400, 4):
+                bd.write_memory(addr, addr)
+            bd.flush()
+        benchmark(write)
+
+@pytest.mark.benchmark(group="small reads")
+def test_batch_reads(benchmark, backdoor):
+    def read():
+        with backdoor.batch() as batch:
+            for addr in range(0, 0x400, 4):
+                batch.read_memory(addr)
+    benchmark(read)
+
+@pytest.mark.benchmark(group="fill")
+def test_fill(benchmark, backdoor):
+    benchmark(backdoor.fill_memory, 0x0, SIZE, 0)
+
+@pytest.mark.benchmark(group="fill")
+def test_fill_legacy(benchmark, legacy_backdoor):
+    benchmark(legacy_backdoor.fill_memory, 0x0, SIZE, 0)
+
+@pytest.fixture
+def image(tmp_path, request):
+    """The random data written to a file in the format given by the test parameter. """
+    if request.param == "intel":
+        intelhex = pytest.importorskip("intelhex")
+        ihex = intelhex.IntelHex()
+        ihex.frombytes(DATA, offset=0x0)
+        path = tmp_path / "image.hex"
+        ihex.tofile(str(path), "hex")
+    else:
+        veriloghex = pytest.importorskip("veriloghex")
+        path = tmp_path / "image.vmem"
+        path.write_text(veriloghex.VerilogHex(list(DATA), offset=0x0).tovmem() + "\n")
+    return path
+
+@pytest.mark.benchmark(group="load")
+@pytest.mark.parametrize("image", ["intel", "verilog"], indirect=True)
+def test_load(benchmark, backdoor, image):
+    def load():
+        load_file(backdoor, image)
+        backdoor.flush()
+    # Parsing dominates, so a few rounds are enough, as for `bd bench`
+    benchmark.pedantic(load, rounds=3)
+    assert backdoor.read_memory_bytes(0x0, SIZE) == DATA
+
+@pytest.mark.benchmark(group="dump")
+@pytest.mark.parametrize("format", ["hex", "intel", "verilog"])
+def test_formatter(benchmark, format):
+    def dump():
+        with FORMATTERS[format](io.StringIO(), 0x0, SIZE) as formatter:
+            for offset in range(0, SIZE, 0x10000):
+                formatter.write(DATA[offset:offset + 0x10000])
+    benchmark(dump)
+
+@pytest.mark.benchmark(group="conversion")
+def test_bytes_to_u32le(benchmark):
+    benchmark(conversion.bytes_to_u32le, DATA)
+
+@pytest.mark.benchmark(group="conversion")
+def test_u32le_to_bytes(benchmark):
+    benchmark(conversion.u32le_to_bytes, conversion.bytes_to_u32le(DATA))
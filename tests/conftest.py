@@ -0,0 +1,60 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import socket
+import threading
+import pytest
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+# The fixtures are also registered through the pytest11 entry point, import them here
+# so that the suite runs from a source checkout too.
+from verilator_mem_if.pytest_plugin import (backdoor_server, backdoor)  # noqa: F401
+
+@pytest.fixture
+def closing_peer():
+    """The address of a server that closes every connection once it has read a request. """
+    listener = socket.socket()
+    listener.bind(("localhost", 0))
+    listener.listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            conn.recv(7)
+            conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield listener.getsockname()
+    listener.close()
+
+@pytest.fixture
+def bad_ack_peer():
+    """The address of a server that replies to every write with an invalid ACK. """
+    listener = socket.socket()
+    listener.bind(("localhost", 0))
+    listener.listen()
+
+    def serve(conn):
+        with conn:
+            while True:
+                header = conn.recv(BackdoorMemoryInterface.HEADER.size, socket.MSG_WAITALL)
+                if len(header) < BackdoorMemoryInterface.HEADER.size:
+                    return
+                _, size, _ = BackdoorMemoryInterface.HEADER.unpack(header)
+                conn.recv(size, socket.MSG_WAITALL)
+                conn.sendall(b'\x00')
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield listener.getsockname()
+    listener.close()
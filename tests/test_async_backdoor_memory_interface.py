@@ -0,0 +1,21 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import asyncio
+from verilator_mem_if.async_backdoor_memory_interface import AsyncBackdoorMemoryInterface
+
+def test_access(backdoor_server):
+    data = bytes(i * 3 & 0xff for i in range(0x10005))
+
+    async def run():
+        async with AsyncBackdoorMemoryInterface(*backdoor_server.address, chunk_size=0x1000) as bd:
+            await bd.write_memory(0x0, 0x12345678)
+            await bd.write_memory(0x4, 0xabcd, transfer_size=16)
+            await bd.write_memory_block32(0x8, [1, 2])
+            await asyncio.gather(bd.write_memory_block8(0x100, data[:0x8000]),
+                                 bd.write_memory_block8(0x8100, data[0x8000:]))
+            return (await bd.read_memory(0x0), await bd.read_memory(0x4, transfer_size=16),
+                    await bd.read_memory_block32(0x8, 2), await bd.read_memory_bytes(0x100, len(data)))
+
+    assert asyncio.run(run()) == (0x12345678, 0xabcd, [1, 2], data)
@@ -0,0 +1,68 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import pytest
+from verilator_mem_if.backdoor import load_file
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+
+def image(size: int) -> bytes:
+    return bytes(i * 13 & 0xff for i in range(size))
+
+@pytest.fixture
+def binary(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(image(0x12345))
+    return path
+
+def test_load_binary(backdoor, binary):
+    assert load_file(backdoor, binary, address=0x100) == 0x12345
+    assert backdoor.read_memory_bytes(0x100, 0x12345) == image(0x12345)
+
+def test_load_binary_differential(backdoor_server, backdoor, binary, tmp_path):
+    manifest = tmp_path / "manifest.json"
+    assert load_file(backdoor, binary, manifest=manifest) == 0x12345
+    assert load_file(backdoor, binary, manifest=manifest) == 0
+    backdoor.write_memory(0x0, 0)
+    assert load_file(backdoor, binary, manifest=manifest) == 0x12345
+    assert backdoor.read_memory_bytes(0x0, 0x12345) == image(0x12345)
+
+def test_load_empty_binary(backdoor, tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b'')
+    assert load_file(backdoor, path) == 0
+
+@pytest.mark.parametrize("write_window", [0, 16])
+def test_load_binary_connection_error(closing_peer, binary, write_window):
+    bd = BackdoorMemoryInterface(*closing_peer, write_window=write_window, chunk_size=0x1000)
+    bd.connect()
+    try:
+        # Not masked by a BufferError from unmapping the file with views in the traceback
+        with pytest.raises(OSError):
+            load_file(bd, binary)
+            bd.flush()
+    finally:
+        bd.close()
+
+def test_load_differential_interrupted(backdoor, binary, tmp_path, monkeypatch):
+    manifest = tmp_path / "manifest.json"
+    other = tmp_path / "other.bin"
+    data = bytearray(image(0x12345))
+    data[0x10] ^= 0xff
+    data[0x5010] ^= 0xff
+    other.write_bytes(data)
+    assert load_file(backdoor, binary, manifest=manifest) == 0x12345
+
+    # Stop loading the other image after its first changed page has been written
+    write = backdoor.write_memory_block8
+    def write_one(addr, data):
+        write(addr, data)
+        raise ConnectionError("interrupted")
+    monkeypatch.setattr(backdoor, "write_memory_block8", write_one)
+    with pytest.raises(ConnectionError):
+        load_file(backdoor, other, manifest=manifest)
+    monkeypatch.undo()
+
+    # The manifest no longer vouches for either changed page
+    assert load_file(backdoor, binary, manifest=manifest) == 0x2000
+    assert backdoor.read_memory_bytes(0x0, 0x12345) == image(0x12345)
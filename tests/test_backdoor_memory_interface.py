@@ -0,0 +1,205 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import pytest
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.server import BackdoorServer
+
+MAX = BackdoorMemoryInterface.MAX_TRANSFER_SIZE
+
+def pattern(size: int) -> bytes:
+    return bytes(i * 7 & 0xff for i in range(size))
+
+def test_write_read_word(backdoor):
+    backdoor.write_memory(0x10, 0x12345678)
+    backdoor.write_memory(0x14, 0xabcd, transfer_size=16)
+    backdoor.write_memory(0x16, 0xef, transfer_size=8)
+    assert backdoor.read_memory(0x10) == 0x12345678
+    assert backdoor.read_memory(0x14) == 0x00efabcd
+    assert backdoor.read_memory(0x16, transfer_size=8) == 0xef
+
+def test_block32(backdoor):
+    backdoor.write_memory_block32(0x100, [1, 0xffffffff, 0x80000000])
+    assert backdoor.read_memory_block32(0x100, 3) == [1, 0xffffffff, 0x80000000]
+
+@pytest.mark.parametrize("size, transactions", [
+    (MAX - 1, 1),
+    (MAX, 1),
+    (MAX + 1, 2),
+    (2 * MAX, 2),
+    (2 * MAX + 1, 3),
+])
+def test_chunking_at_max_transfer_size(backdoor_server, size, transactions):
+    data = pattern(size)
+    with BackdoorMemoryInterface(*backdoor_server.address, chunk_size=MAX) as bd:
+        bd.write_memory_block8(0x1000, data)
+        assert backdoor_server.transactions == transactions
+        assert bd.read_memory_bytes(0x1000, size) == data
+        assert backdoor_server.transactions == 2 * transactions
+
+def test_chunking_default_chunk_size(backdoor_server, backdoor):
+    size = 3 * backdoor.DEFAULT_CHUNK_SIZE + 5
+    data = pattern(size)
+    backdoor.write_memory_block8(0x3, data)
+    assert backdoor_server.transactions == 4
+    assert backdoor.read_memory_bytes(0x3, size) == data
+
+@pytest.mark.parametrize("size", [0, MAX + 1])
+def test_chunk_size_out_of_range(size):
+    with pytest.raises(ValueError):
+        BackdoorMemoryInterface(chunk_size=size)
+
+def test_write_window(backdoor_server):
+    with BackdoorMemoryInterface(*backdoor_server.address, write_window=4) as bd:
+        for i in range(10):
+            bd.write_memory(4 * i, i)
+            assert bd.pending_writes <= 4
+        assert bd.pending_writes > 0
+        # A read collects the outstanding ACKs before its data
+        assert bd.read_memory_block32(0, 10) == list(range(10))
+        assert bd.pending_writes == 0
+        bd.write_memory_block8(0x100, pattern(MAX + 1))
+        assert bd.pending_writes == 2
+        bd.flush()
+        assert bd.pending_writes == 0
+    assert backdoor_server.memory.read(0x100, MAX + 1) == pattern(MAX + 1)
+
+def test_write_window_flushed_on_exit(backdoor_server):
+    with BackdoorMemoryInterface(*backdoor_server.address, write_window=8) as bd:
+        bd.write_memory(0x0, 0xdeadbeef)
+    with BackdoorMemoryInterface(*backdoor_server.address) as bd:
+        assert bd.read_memory(0x0) == 0xdeadbeef
+
+def test_write_window_negative():
+    with pytest.raises(ValueError):
+        BackdoorMemoryInterface(write_window=-1)
+
+def test_fill(backdoor_server, backdoor):
+    backdoor.fill_memory(0x1001, 0x30000, b'\x01\x02\x03')
+    # The whole fill is a single FILL transaction
+    assert backdoor_server.transactions == 1
+    assert backdoor.read_memory_bytes(0x1001, 0x30000) == b'\x01\x02\x03' * 0x10000
+
+def test_fill_legacy_fallback():
+    with BackdoorServer("localhost", 0, capabilities=0) as server:
+        with BackdoorMemoryInterface(*server.address, chunk_size=0x1000) as bd:
+            # The legacy server takes the probe for an empty write
+            assert bd.capabilities() == 0
+            probed = server.transactions
+            bd.fill_memory(0x1001, 0x3001, b'\x01\x02\x03')
+            # Chunked writes of whole patterns, so the phase is kept across chunks
+            assert server.transactions - probed == 4
+            assert bd.read_memory_bytes(0x1001, 0x3001) == (b'\x01\x02\x03' * 0x1001)[:0x3001]
+            assert bd.read_memory_bytes(0x1000, 1) == b'\x00'
+            assert bd.read_memory_bytes(0x4002, 1) == b'\x00'
+
+def test_fill_int_pattern(backdoor):
+    backdoor.fill_memory(0x0, 0x10, 0xa5)
+    assert backdoor.read_memory_block8(0x0, 0x10) == [0xa5] * 0x10
+
+@pytest.mark.parametrize("pattern", [b'', bytes(MAX + 1)])
+def test_fill_pattern_length(backdoor, pattern):
+    with pytest.raises(ValueError):
+        backdoor.fill_memory(0x0, 0x10, pattern)
+
+def test_unix_socket(tmp_path):
+    path = tmp_path / "bd.sock"
+    with BackdoorServer(path=path) as server:
+        with BackdoorMemoryInterface(path=server.address) as bd:
+            bd.write_memory_block8(0x0, pattern(0x100))
+            assert bd.read_memory_bytes(0x0, 0x100) == pattern(0x100)
+
+def test_error_releases_lock(bad_ack_peer):
+    bd = BackdoorMemoryInterface(*bad_ack_peer)
+    bd.connect()
+    try:
+        with pytest.raises(AssertionError):
+            bd.write_memory(0x0, 0)
+        assert not bd._lock.locked()
+    finally:
+        bd.close()
+
+def test_batch_values_in_order(backdoor):
+    backdoor.write_memory(0x20, 0x11111111)
+    with backdoor.batch() as batch:
+        before = batch.read_memory(0x20)
+        batch.write_memory(0x20, 0x22222222)
+        batch.write_memory(0x24, 0x3333, transfer_size=16)
+        after = batch.read(0x20, 6)
+        empty = batch.read(0x0, 0)
+    assert before.value == 0x11111111
+    assert after.data == b'\x22\x22\x22\x22\x33\x33'
+    assert empty.data == b''
+
+def test_batch_execute_returns_reads(backdoor):
+    batch = backdoor.batch()
+    batch.write(0x100, pattern(0x10))
+    batch.read(0x104, 4)
+    batch.read(0x100, 4)
+    assert len(batch) == 3
+    assert batch.execute() == [pattern(0x10)[4:8], pattern(0x10)[:4]]
+    # The queue is emptied
+    assert len(batch) == 0 and batch.execute() == []
+
+def test_batch_not_executed(backdoor):
+    read = backdoor.batch().read_memory(0x0)
+    with pytest.raises(RuntimeError):
+        read.data
+
+@pytest.mark.parametrize("coalesce, transactions", [(True, 2), (False, 8)])
+def test_batch_coalesce(backdoor_server, backdoor, coalesce, transactions):
+    batch = backdoor.batch()
+    for i in range(4):
+        batch.write_memory(0x200 + 4 * i, i)
+    reads = [batch.read_memory(0x200 + 4 * i) for i in range(4)]
+    batch.execute(coalesce=coalesce)
+    assert [read.value for read in reads] == [0, 1, 2, 3]
+    assert backdoor_server.transactions == transactions
+
+def test_batch_chunk_boundaries(backdoor_server):
+    data = pattern(0x250)
+    with BackdoorMemoryInterface(*backdoor_server.address, chunk_size=0x100) as bd:
+        with bd.batch() as batch:
+            batch.write(0x1000, data[:0x80])
+            batch.write(0x1080, data[0x80:])
+        assert backdoor_server.transactions == 3
+        with bd.batch() as batch:
+            # Merged into one run that is split at the chunk size, not at the reads
+            reads = [batch.read(0x1000 + offset, 0x4a) for offset in range(0, 0x250, 0x4a)]
+        assert backdoor_server.transactions == 6
+        assert b''.join(read.data for read in reads) == data[:len(reads) * 0x4a]
+
+def test_batch_reply_window(backdoor):
+    # The replies of these reads don't fit in one BATCH_REPLY_WINDOW
+    size = backdoor.BATCH_REPLY_WINDOW // 2 + 1
+    backdoor.write_memory_block8(0x0, pattern(3 * size))
+    batch = backdoor.batch()
+    reads = [batch.read(i * size, size) for i in range(3)]
+    batch.execute(coalesce=False)
+    assert b''.join(read.data for read in reads) == pattern(3 * size)
+
+class PartialSender:
+    """Wraps a socket whose sendmsg() sends at most |limit| bytes at a time. """
+
+    def __init__(self, sock, limit: int) -> None:
+        self._sock = sock
+        self._limit = limit
+        self.calls = 0
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def sendmsg(self, buffers):
+        self.calls += 1
+        return self._sock.send(b''.join(buffers)[:self._limit])
+
+@pytest.mark.parametrize("limit", [1, 5, 13, 0x1001])
+def test_batch_partial_sends(backdoor, limit):
+    sock = backdoor._sock = PartialSender(backdoor._sock, limit)
+    with backdoor.batch() as batch:
+        for i in range(16):
+            batch.write(0x400 * i, pattern(0x200 + i))
+        reads = [batch.read(0x400 * i, 0x200 + i) for i in range(16)]
+    assert sock.calls > 1
+    assert [read.data for read in reads] == [pattern(0x200 + i) for i in range(16)]
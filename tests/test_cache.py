@@ -0,0 +1,83 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import pytest
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.cache import CachedMemoryInterface
+from verilator_mem_if.server import (BackdoorServer, SparseMemory)
+
+class LoggedMemory(SparseMemory):
+    """A SparseMemory keeping the address of every write and fill in order. """
+    def __init__(self) -> None:
+        super().__init__()
+        self.log = []
+
+    def write(self, addr, data):
+        self.log.append(addr)
+        super().write(addr, data)
+
+    def fill(self, addr, size, pattern):
+        self.log.append(addr)
+        super().fill(addr, size, pattern)
+
+@pytest.fixture
+def memory():
+    return LoggedMemory()
+
+@pytest.fixture
+def cache(memory):
+    with BackdoorServer("localhost", 0, memory=memory) as server:
+        with BackdoorMemoryInterface(*server.address) as bd:
+            cache = CachedMemoryInterface(bd, page_size=0x100, cacheable=False)
+            cache.add_region(0x1000, 0x1000, True)
+            yield cache
+
+def test_hits_and_misses(cache):
+    cache.read_memory_bytes(0x1080, 0x100)
+    assert (cache.hits, cache.misses) == (0, 2)
+    cache.read_memory_bytes(0x1100, 0x200)
+    assert (cache.hits, cache.misses) == (1, 3)
+    cache.read_memory(0x1000)
+    assert (cache.hits, cache.misses) == (2, 3)
+    # Uncached pages count as neither
+    cache.read_memory_bytes(0x3000, 0x10)
+    assert (cache.hits, cache.misses) == (2, 3)
+
+def test_writes_are_coalesced(cache, memory):
+    for addr in range(0x1000, 0x1200, 4):
+        cache.write_memory(addr, addr)
+    assert memory.log == []
+    assert cache.dirty_pages == 2
+    cache.flush()
+    assert memory.log == [0x1000]
+    assert cache.read_memory_block32(0x1000, 0x80) == list(range(0x1000, 0x1200, 4))
+
+def test_direct_write_after_dirty_pages(cache, memory):
+    # A buffer in cacheable memory followed by a doorbell register outside it
+    cache.write_memory_block8(0x1000, bytes(range(16)))
+    cache.write_memory(0x4000, 1)
+    assert memory.log == [0x1000, 0x4000]
+    assert cache.dirty_pages == 0
+    assert memory.read(0x1000, 16) == bytes(range(16))
+
+def test_direct_write_within_one_access(cache, memory):
+    cache.write_memory_block8(0xff0, bytes(0x20))
+    cache.flush()
+    assert memory.log == [0xff0, 0x1000]
+
+def test_direct_read_after_dirty_pages(cache, memory):
+    cache.write_memory(0x1000, 0x12345678)
+    cache.read_memory(0x4000)
+    assert memory.log == [0x1000]
+
+def test_fill_after_dirty_pages(cache, memory):
+    cache.write_memory(0x1000, 0x12345678)
+    cache.fill_memory(0x4000, 0x10, 0)
+    assert memory.log == [0x1000, 0x4000]
+
+def test_invalidate(cache, memory):
+    cache.write_memory(0x1000, 0x12345678)
+    cache.invalidate(0x1000, 4, writeback=False)
+    assert memory.log == []
+    assert cache.read_memory(0x1000) == 0
@@ -0,0 +1,104 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import pytest
+from verilator_mem_if import conversion
+
+# The pure Python conversions the buffer based ones replaced
+
+def reference_byte_list_to_u32le_list(data, pad=0x00):
+    res = []
+    for i in range(len(data) // 4):
+        res.append(data[i * 4 + 0] |
+                   data[i * 4 + 1] << 8 |
+                   data[i * 4 + 2] << 16 |
+                   data[i * 4 + 3] << 24)
+    remainder = (len(data) % 4)
+    if remainder != 0:
+        padCount = 4 - remainder
+        res += reference_byte_list_to_u32le_list(list(data[-remainder:]) + [pad] * padCount)
+    return res
+
+def reference_u32le_list_to_byte_list(data):
+    res = []
+    for x in data:
+        res.append((x >> 0) & 0xff)
+        res.append((x >> 8) & 0xff)
+        res.append((x >> 16) & 0xff)
+        res.append((x >> 24) & 0xff)
+    return res
+
+def reference_u16le_list_to_byte_list(data):
+    byteData = []
+    for h in data:
+        byteData.extend([h & 0xff, (h >> 8) & 0xff])
+    return byteData
+
+def reference_byte_list_to_u16le_list(byteData):
+    data = []
+    for i in range(0, len(byteData), 2):
+        data.append(byteData[i] | (byteData[i + 1] << 8))
+    return data
+
+def pattern(size: int) -> list:
+    return [(i * 37 + 0x80) & 0xff for i in range(size)]
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if conversion.get_numpy() is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(conversion, "get_numpy", lambda: None)
+    return request.param
+
+SIZES = [0, 1, 2, 3, 4, 5, 7, 8, 9, 0x101]
+CONTAINERS = [list, bytes, bytearray, lambda data: memoryview(bytes(data))]
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("container", CONTAINERS)
+@pytest.mark.parametrize("pad", [0x00, 0xa5])
+def test_byte_list_to_u32le_list(backend, size, container, pad):
+    data = pattern(size)
+    assert conversion.byte_list_to_u32le_list(container(data), pad) == reference_byte_list_to_u32le_list(data, pad)
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("container", CONTAINERS)
+def test_bytes_to_u32le(backend, size, container):
+    data = pattern(size)
+    words = conversion.bytes_to_u32le(container(data))
+    assert len(words) == (size + 3) // 4
+    assert list(words) == reference_byte_list_to_u32le_list(data)
+
+@pytest.mark.parametrize("words", [[], [0], [0x12345678, 0xffffffff, 0x80000000], list(range(0, 1 << 32, 0x1234567))])
+def test_u32le_list_to_byte_list(backend, words):
+    assert conversion.u32le_list_to_byte_list(words) == reference_u32le_list_to_byte_list(words)
+    assert bytes(conversion.u32le_to_bytes(words)) == bytes(reference_u32le_list_to_byte_list(words))
+
+def test_u32le_out_of_range(backend):
+    # Values wider than a word are truncated as they were before
+    words = [1 << 32 | 5, -1]
+    assert conversion.u32le_list_to_byte_list(words) == reference_u32le_list_to_byte_list(words)
+
+@pytest.mark.parametrize("size", [0, 2, 4, 0x100])
+@pytest.mark.parametrize("container", CONTAINERS)
+def test_byte_list_to_u16le_list(backend, size, container):
+    data = pattern(size)
+    assert conversion.byte_list_to_u16le_list(container(data)) == reference_byte_list_to_u16le_list(data)
+
+def test_byte_list_to_u16le_list_odd(backend):
+    # An odd length used to raise an IndexError, it is now padded like the 32-bit case
+    assert conversion.byte_list_to_u16le_list([0x34, 0x12, 0x56]) == [0x1234, 0x0056]
+
+@pytest.mark.parametrize("halfwords", [[], [0x1234], [0xffff, 0x8000, 0x0001], [0x10000 | 7, -1]])
+def test_u16le_list_to_byte_list(backend, halfwords):
+    assert conversion.u16le_list_to_byte_list(halfwords) == reference_u16le_list_to_byte_list(halfwords)
+
+def test_numpy_array_input():
+    np = conversion.get_numpy()
+    if np is None:
+        pytest.skip("NumPy is not installed")
+    words = np.array([0x12345678, 0xdeadbeef], dtype=np.uint32)
+    assert bytes(conversion.u32le_to_bytes(words)) == bytes(reference_u32le_list_to_byte_list(words.tolist()))
+    assert bytes(conversion.u16le_to_bytes(np.array([0x1234], dtype=np.uint16))) == b'\x34\x12'
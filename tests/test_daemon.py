@@ -0,0 +1,67 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import os
+import re
+import signal
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+import verilator_mem_if
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.daemon import BackdoorDaemon
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork() and Unix sockets")
+
+def bd(*args, **kwargs):
+    env = dict(os.environ)
+    src = str(Path(verilator_mem_if.__file__).parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    return subprocess.run([sys.executable, "-m", "verilator_mem_if.backdoor", *args], env=env, **kwargs)
+
+def test_daemon_forwards(backdoor_server, tmp_path):
+    path = tmp_path / "bd.sock"
+    with BackdoorDaemon(str(path), *backdoor_server.address) as daemon:
+        with BackdoorMemoryInterface(path=daemon.address) as client:
+            client.write_memory_block8(0x100, b'\x01\x02\x03\x04')
+            assert client.read_memory(0x100) == 0x04030201
+    assert backdoor_server.memory.read(0x100, 4) == b'\x01\x02\x03\x04'
+
+def test_daemon_upstream_error(bad_ack_peer, tmp_path):
+    path = tmp_path / "bd.sock"
+    with BackdoorDaemon(str(path), *bad_ack_peer) as daemon:
+        # Every client sees its connection dropped rather than waiting on the upstream lock
+        for _ in range(3):
+            client = BackdoorMemoryInterface(path=daemon.address)
+            client.connect()
+            client._sock.settimeout(10)
+            try:
+                with pytest.raises(ConnectionError):
+                    client.write_memory(0x0, 0x12345678)
+            finally:
+                client.close()
+
+def test_detach_returns_with_captured_output(backdoor_server, tmp_path):
+    path = tmp_path / "bd.sock"
+    log = tmp_path / "daemon.log"
+    hostname, port = backdoor_server.address
+    result = bd("--hostname", hostname, "--port", str(port), "--socket", str(path),
+                "daemon", "--detach", "--log-file", str(log), capture_output=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    pid = int(re.search(r"detached as pid (\d+)", log.read_text()).group(1))
+    try:
+        # The socket is listening by the time the command returns
+        with BackdoorMemoryInterface(path=str(path)) as client:
+            client.write_memory(0x0, 0x12345678)
+            assert client.read_memory(0x0) == 0x12345678
+        assert backdoor_server.memory.read(0x0, 4) == b'\x78\x56\x34\x12'
+    finally:
+        os.kill(pid, signal.SIGTERM)
+
+def test_detach_bad_log_file(backdoor_server, tmp_path):
+    path = tmp_path / "bd.sock"
+    result = bd("--socket", str(path), "daemon", "--detach", "--log-file", str(tmp_path / "missing" / "daemon.log"),
+                capture_output=True, timeout=30)
+    assert result.returncode != 0
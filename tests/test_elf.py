@@ -0,0 +1,73 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import struct
+import pytest
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.elf import (ElfFile, ElfFormatError, load_elf, verify_elf)
+
+def elf32(segments) -> bytes:
+    """Returns a little-endian ELF32 image with a PT_LOAD per (paddr, data, memsz). """
+    phoff = 52
+    offset = phoff + 32 * len(segments)
+    header = b'\x7fELF\x01\x01\x01' + bytes(9) + struct.pack(
+        '<HHIIIIIHHHHHH', 2, 0xf3, 1, 0x80, phoff, 0, 0, 52, 32, len(segments), 40, 0, 0)
+    phdrs, contents = b'', b''
+    for paddr, data, memsz in segments:
+        phdrs += struct.pack('<IIIIIIII', 1, offset, paddr, paddr, len(data), memsz, 5, 4)
+        contents += data
+        offset += len(data)
+    return header + phdrs + contents
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "image.elf"
+    path.write_bytes(elf32([(0x1000, bytes(range(256)) * 0x100, 0x20000), (0x80000, b'\x01\x02\x03', 0x3)]))
+    return path
+
+def test_segments(image):
+    with ElfFile(image) as elf:
+        segments = [(s.address, bytes(s.data), s.memsz) for s in elf.segments()]
+    assert segments == [(0x1000, bytes(range(256)) * 0x100, 0x20000), (0x80000, b'\x01\x02\x03', 0x3)]
+
+def test_load_and_verify(backdoor_server, backdoor, image):
+    backdoor_server.memory.fill(0x1000, 0x20000, b'\xff')
+    assert load_elf(backdoor, image) == 0x20003
+    assert backdoor.read_memory_bytes(0x1000 + 0x20000 - 1, 1) == b'\x00'
+    assert verify_elf(backdoor, image) == []
+    backdoor.write_memory(0x80000, 0, transfer_size=8)
+    assert verify_elf(backdoor, image, chunk_size=0x10000) == [(0x80000, 3)]
+
+@pytest.mark.parametrize("function", [load_elf, verify_elf])
+def test_connection_error_propagates(closing_peer, image, function):
+    bd = BackdoorMemoryInterface(*closing_peer)
+    bd.connect()
+    try:
+        # Not masked by a BufferError from unmapping the file with views in the traceback
+        with pytest.raises(OSError):
+            function(bd, image)
+    finally:
+        bd.close()
+
+@pytest.mark.parametrize("contents", [b'\x7fELF\x01\x01\x01' + bytes(20), b'\x7fELF\x02\x01\x01' + bytes(50)],
+                         ids=["elf32", "elf64"])
+def test_truncated_header(tmp_path, contents):
+    path = tmp_path / "short.elf"
+    path.write_bytes(contents)
+    with pytest.raises(ElfFormatError):
+        ElfFile(path)
+
+@pytest.mark.parametrize("contents", [b'', b'\x7fELF', b'not an elf file at all'])
+def test_not_elf(tmp_path, contents):
+    path = tmp_path / "bad.elf"
+    path.write_bytes(contents)
+    with pytest.raises(ElfFormatError):
+        ElfFile(path)
+
+def test_close_with_view_in_use(image):
+    elf = ElfFile(image)
+    segment = next(elf.segments())
+    with pytest.raises(BufferError):
+        elf.close()
+    segment.data.release()
@@ -0,0 +1,65 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import sys
+import pytest
+from verilator_mem_if import backdoor
+from verilator_mem_if.fanout import (fan_out, parse_port_range, parse_target)
+from verilator_mem_if.server import BackdoorServer
+
+def image(size: int) -> bytes:
+    return bytes(i * 3 & 0xff for i in range(size))
+
+@pytest.fixture
+def servers():
+    with BackdoorServer("localhost", 0) as first, BackdoorServer("localhost", 0) as second:
+        yield [first, second]
+
+def test_fan_out(servers):
+    segments = [(0x1000, image(0x20000)), (0x80000000, image(0x100))]
+    results = fan_out([server.address for server in servers],
+                      lambda bd, hostname, port: backdoor.write_segments(bd, segments),
+                      write_window=8, chunk_size=0x4000)
+    assert [result.target for result in results] == [server.target for server in servers]
+    assert all(result.ok and result.value == 0x20100 for result in results)
+    for server in servers:
+        assert server.memory.read(0x1000, 0x20000) == image(0x20000)
+        assert server.memory.read(0x80000000, 0x100) == image(0x100)
+
+def test_fan_out_failing_target(servers, closing_peer):
+    targets = [servers[0].address, closing_peer, servers[1].address]
+    results = fan_out(targets, lambda bd, hostname, port: bd.write_memory_block8(0x0, image(0x100)))
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, OSError)
+    for server in servers:
+        assert server.memory.read(0x0, 0x100) == image(0x100)
+
+def test_fan_out_no_targets():
+    assert fan_out([], lambda bd, hostname, port: None) == []
+
+def test_load_targets(servers, closing_peer, tmp_path, monkeypatch, capsys):
+    path = tmp_path / "image.bin"
+    path.write_bytes(image(0x3000))
+    targets = [f"{hostname}:{port}" for hostname, port in [servers[0].address, closing_peer, servers[1].address]]
+    monkeypatch.setattr(sys, "argv", ["bd", *(arg for target in targets for arg in ("--target", target)),
+                                      "load", "--address", "0x100", str(path)])
+    args = backdoor.parse_args()
+    with pytest.raises(SystemExit, match="1 of 3 targets failed"):
+        args.func(args)
+    summary = capsys.readouterr().err
+    assert summary.count(" ok") == 2 and summary.count("FAILED") == 1
+    for server in servers:
+        assert server.memory.read(0x100, 0x3000) == image(0x3000)
+
+def test_parse_target():
+    assert parse_target("sim-1:5557") == ("sim-1", 5557)
+    assert parse_target("::1:5557") == ("::1", 5557)
+    with pytest.raises(ValueError):
+        parse_target("5557")
+
+def test_parse_port_range():
+    assert parse_port_range("5557-5560") == range(5557, 5561)
+    assert parse_port_range("5557") == range(5557, 5558)
+    with pytest.raises(ValueError):
+        parse_port_range("5560-5557")
@@ -0,0 +1,63 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import io
+import random
+import pytest
+from intelhex import IntelHex
+from veriloghex import VerilogHex
+from verilator_mem_if.formatters import FORMATTERS
+
+REGIONS = [
+    (0x0, 0x1),
+    (0x0, 0x10),
+    (0x3, 0x1d),
+    (0x1000, 0x100),
+    (0xfff0, 0x40),
+    (0x1fffe, 0x20005),
+    (0x80000001, 0x4d),
+]
+
+def data(size: int) -> bytes:
+    rng = random.Random(size)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+def formatted(name: str, address: int, data: bytes, step: int) -> str:
+    f = io.StringIO()
+    with FORMATTERS[name](f, address, len(data)) as formatter:
+        for offset in range(0, len(data), step):
+            formatter.write(data[offset:offset + step])
+    return f.getvalue()
+
+def intelhex(address: int, data: bytes) -> IntelHex:
+    ihex = IntelHex()
+    ihex.frombytes(data, offset=address)
+    return ihex
+
+@pytest.mark.parametrize("step", [1, 7, 0x1000])
+@pytest.mark.parametrize("address, size", REGIONS)
+def test_hexdump(address, size, step):
+    f = io.StringIO()
+    intelhex(address, data(size)).dump(f)
+    assert formatted('hex', address, data(size), step) == f.getvalue()
+
+@pytest.mark.parametrize("step", [1, 7, 0x1000])
+@pytest.mark.parametrize("address, size", REGIONS)
+def test_intel_hex(address, size, step):
+    f = io.StringIO()
+    intelhex(address, data(size)).write_hex_file(f)
+    assert formatted('intel', address, data(size), step) == f.getvalue()
+
+@pytest.mark.parametrize("step", [1, 7, 0x1000])
+@pytest.mark.parametrize("address, size", REGIONS)
+def test_vmem(address, size, step):
+    expected = VerilogHex(data(size), offset=address).tovmem()
+    assert formatted('verilog', address, data(size), step) == expected
+
+def test_binary():
+    f = io.BytesIO()
+    with FORMATTERS['binary'](f, 0x10, 0x100) as formatter:
+        formatter.write(data(0x80))
+        formatter.write(data(0x80))
+    assert f.getvalue() == data(0x80) * 2
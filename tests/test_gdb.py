@@ -0,0 +1,262 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Tests of the gdb commands against a stand-in for gdb's Python API. """
+
+import shlex
+import sys
+import threading
+import types
+import pytest
+from verilator_mem_if import metrics
+from verilator_mem_if.server import BackdoorServer
+from test_elf import elf32
+
+class EventRegistry:
+    def __init__(self) -> None:
+        self.handlers = []
+
+    def connect(self, handler) -> None:
+        self.handlers.append(handler)
+
+    def fire(self, event=None) -> None:
+        for handler in self.handlers:
+            handler(event)
+
+
+class FakeGdb(types.ModuleType):
+    """The parts of the gdb module used by the extensions. """
+
+    COMMAND_USER = 13
+    COMMAND_DATA = 2
+    PARAM_STRING = 8
+    PARAM_OPTIONAL_FILENAME = 10
+    TYPE_CODE_PTR = 1
+    TYPE_CODE_ARRAY = 2
+    TYPE_CODE_INT = 8
+
+    class GdbError(RuntimeError):
+        pass
+
+    def __init__(self) -> None:
+        super().__init__("gdb")
+        self.commands = {}
+        self.parameters = {}
+        self.output = []
+        self.posted = []
+        self.executed = []
+        self.progspace = types.SimpleNamespace(filename=None)
+        self.events = types.SimpleNamespace(
+            cont=EventRegistry(), inferior_call=EventRegistry(), memory_changed=EventRegistry(),
+            gdb_exiting=EventRegistry()
+        )
+        gdb = self
+
+        class Command:
+            def __init__(self, name, cmdtype, prefix=False):
+                gdb.commands[name] = self
+
+            def dont_repeat(self):
+                pass
+
+        class Parameter:
+            def __init__(self, name, cmdtype, paramtype):
+                gdb.parameters[name] = self
+
+        self.Command, self.Parameter = Command, Parameter
+
+    def parameter(self, name: str):
+        return self.parameters[name].value
+
+    def write(self, message: str) -> None:
+        self.output.append(message)
+
+    def post_event(self, func) -> None:
+        assert threading.current_thread() is not threading.main_thread()
+        self.posted.append(func)
+
+    def run_posted(self) -> None:
+        """Runs the posted events, as gdb's event loop would. """
+        posted, self.posted = self.posted, []
+        for func in posted:
+            func()
+
+    def string_to_argv(self, args: str) -> list:
+        return shlex.split(args)
+
+    def current_progspace(self):
+        return self.progspace
+
+    def execute(self, command: str) -> None:
+        self.executed.append(command)
+
+    def parse_and_eval(self, expression: str):
+        return IntValue(int(expression, 0))
+
+    # Helpers for the tests
+
+    def set(self, name: str, value) -> None:
+        parameter = self.parameters[name]
+        parameter.value = value
+        parameter.get_set_string()
+
+    def run(self, command: str, args: str = "") -> str:
+        """Invokes a command as a script would and returns what it wrote. """
+        del self.output[:]
+        self.commands[command].invoke(args, False)
+        return "".join(self.output)
+
+
+class IntValue(int):
+    """A gdb.Value of an integer type. """
+    address = None
+    type = types.SimpleNamespace(strip_typedefs=lambda: types.SimpleNamespace(code=FakeGdb.TYPE_CODE_INT))
+
+
+@pytest.fixture(scope="module")
+def gdb():
+    fake = FakeGdb()
+    saved = sys.modules.get("gdb"), metrics._aggregate
+    sys.modules["gdb"] = fake
+    try:
+        import verilator_mem_if.gdb.extensions  # noqa: F401
+        yield fake
+    finally:
+        from verilator_mem_if.gdb.connection import connections
+        connections.close()
+        for name in [name for name in sys.modules if name == "gdb" or name.startswith("verilator_mem_if.gdb")]:
+            del sys.modules[name]
+        if saved[0] is not None:
+            sys.modules["gdb"] = saved[0]
+        metrics._aggregate = saved[1]
+
+
+@pytest.fixture
+def server(gdb):
+    """A server that bd-uid points at. """
+    from verilator_mem_if.gdb.connection import connections
+    with BackdoorServer("localhost", 0) as server:
+        gdb.set("bd-uid", f"localhost:{server.port}")
+        yield server
+        connections.close()
+        connections.clear_regions()
+
+@pytest.fixture
+def connections(gdb):
+    from verilator_mem_if.gdb.connection import connections
+    return connections
+
+def pattern(size: int) -> bytes:
+    return bytes(i * 29 & 0xff for i in range(size))
+
+def test_connection_reused(gdb, server, connections):
+    gdb.run("bd init", "--address 0x0 --size 0x100 --init-value 0x5a")
+    bd = connections.get()
+    gdb.run("bd init", "--address 0x100 --size 0x100")
+    assert connections.get() is bd
+    assert server.memory.read(0x0, 0x200) == b'\x5a' * 0x100 + b'\xff' * 0x100
+
+def test_uid_change(gdb, server):
+    with BackdoorServer("localhost", 0) as other:
+        gdb.set("bd-uid", f"localhost:{other.port}")
+        gdb.run("bd init", "--address 0x0 --size 0x10")
+        assert other.memory.read(0x0, 0x10) == b'\xff' * 0x10
+    assert server.memory.read(0x0, 0x10) == bytes(0x10)
+    with pytest.raises(gdb.GdbError):
+        gdb.set("bd-uid", "localhost")
+    assert gdb.parameter("bd-uid") == f"localhost:{other.port}"
+
+def test_reconnect(gdb, server, connections):
+    gdb.run("bd init", "--address 0x0 --size 0x10")
+    connections.get()._sock.close()
+    output = gdb.run("bd init", "--address 0x0 --size 0x10 --init-value 0x1")
+    assert "reconnecting" in output
+    assert server.memory.read(0x0, 0x10) == b'\x01' * 0x10
+
+def test_load_objfile(gdb, server, tmp_path):
+    path = tmp_path / "image.elf"
+    path.write_bytes(elf32([(0x1000, pattern(0x1000), 0x1100)]))
+    server.memory.fill(0x1000, 0x1100, b'\xff')
+    gdb.progspace.filename = str(path)
+    output = gdb.run("bd load-objfile", "--verify --set-pc")
+    assert output.startswith(f"Loaded {0x1100} bytes from {path}") and output.endswith("Verified\n")
+    assert server.memory.read(0x1000, 0x1100) == pattern(0x1000) + bytes(0x100)
+    assert gdb.executed[-1] == "set $pc = 0x80"
+
+def test_load_objfile_without_file(gdb, server):
+    gdb.progspace.filename = None
+    with pytest.raises(gdb.GdbError):
+        gdb.run("bd load-objfile")
+
+def test_examine(gdb, server):
+    server.memory.write(0x100, bytes.fromhex("78563412ddccbbaa"))
+    assert gdb.run("bd x", "-c 2 0x100") == "0x100:\t0x12345678\t0xaabbccdd\n"
+    assert gdb.run("bd x", "-c 4 -s 1 -f d 0x104") == "0x104:\t-35\t-52\t-69\t-86\n"
+
+def test_region_cached_until_target_runs(gdb, server):
+    # Only whole pages within a region are cached
+    gdb.run("bd region", "0x1000 0x1000")
+    assert gdb.run("bd region") == "0x00001000-0x00002000 (4096 bytes)\n"
+    assert gdb.run("bd x", "0x1000") == "0x1000:\t0x00000000\n"
+    server.memory.write(0x1000, b'\x01')
+    assert gdb.run("bd x", "0x1000") == "0x1000:\t0x00000000\n"
+    gdb.events.cont.fire()
+    assert gdb.run("bd x", "0x1000") == "0x1000:\t0x00000001\n"
+    server.memory.write(0x1000, b'\x02')
+    gdb.events.memory_changed.fire(types.SimpleNamespace(address=0x1000, length=1))
+    assert gdb.run("bd x", "0x1000") == "0x1000:\t0x00000002\n"
+    gdb.run("bd region", "--clear")
+    assert gdb.run("bd region") == ""
+
+def test_background_load(gdb, server, tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(pattern(0x40000))
+    assert gdb.run("bd load", f"--background --address 0x0 {path}").endswith(f"] load {path}\n")
+    output = gdb.run("bd wait")
+    assert " done " in output and f"load {path}: " in output
+    # Completion is reported through gdb's event loop too
+    gdb.run("bd jobs")
+    gdb.run_posted()
+    assert " done " in "".join(gdb.output)
+    assert gdb.run("bd jobs") == ""
+    assert server.memory.read(0x0, 0x40000) == pattern(0x40000)
+
+def test_background_failure(gdb, closing_peer, tmp_path):
+    gdb.set("bd-uid", f"localhost:{closing_peer[1]}")
+    gdb.run("bd dump", f"--background -o {tmp_path / 'memory.dump'} 0x0 0x100")
+    with pytest.raises(gdb.GdbError, match="1 job"):
+        gdb.run("bd wait")
+    gdb.run_posted()
+
+def test_foreground_waits_for_job(gdb, connections, tmp_path):
+    from verilator_mem_if.gdb.jobs import jobs
+    path = tmp_path / "image.bin"
+    path.write_bytes(pattern(0x40000))
+    with BackdoorServer("localhost", 0, latency=0.1) as server:
+        gdb.set("bd-uid", f"localhost:{server.port}")
+        gdb.run("bd load", f"--background --address 0x0 {path}")
+        job, = [job for job in jobs if not job.done]
+        while not connections._lock(job.uid).locked():
+            pass
+        # The gdb thread keeps handling events while the job uses the connection
+        for _ in range(100):
+            gdb.events.cont.fire()
+            connections.add_region(0x0, 0x10)
+            connections.cache()
+        # and a foreground command queues behind it
+        output = gdb.run("bd init", "--address 0x40000 --size 0x10")
+        assert "waiting for the background job" in output
+        gdb.run("bd wait")
+        assert job.error is None
+        gdb.run_posted()
+        assert server.memory.read(0x0, 0x40010) == pattern(0x40000) + b'\xff' * 0x10
+    connections.close()
+    connections.clear_regions()
+
+def test_stats(gdb, server):
+    import json
+    gdb.run("bd init", "--address 0x0 --size 0x10")
+    summary = json.loads(gdb.run("bd stats", "-f json --reset"))
+    assert summary["target"] == "gdb" and summary["transactions"]["fill"] >= 1
+    assert json.loads(gdb.run("bd stats", "-f json"))["transactions"] == {}
@@ -0,0 +1,73 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+"""Checks on the cost of importing the package, which gdb pays at start-up. """
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+import verilator_mem_if
+
+# About twice what the import takes, the best of several runs absorbs most noise
+BUDGET_US = 100000
+
+# Only needed by particular commands, so they must not be imported up front
+DEFERRED = [
+    "asyncio",
+    "bincopy",
+    "intelhex",
+    "numpy",
+    "statistics",
+    "tempfile",
+    "tomllib",
+    "veriloghex",
+    "yaml",
+    "verilator_mem_if.async_backdoor_memory_interface",
+    "verilator_mem_if.bench",
+    "verilator_mem_if.daemon",
+    "verilator_mem_if.memory_map",
+    "verilator_mem_if.server",
+]
+
+def python(*args, **kwargs) -> subprocess.CompletedProcess:
+    """Runs python with |args| and this source tree on its path. """
+    env = dict(os.environ)
+    src = str(Path(verilator_mem_if.__file__).parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    return subprocess.run([sys.executable, *args], env=env, universal_newlines=True, check=True, **kwargs)
+
+def importtime(*args) -> dict:
+    """Returns the cumulative import time in us of every module imported by running python with |args|. """
+    result = python("-X", "importtime", *args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return modules
+
+@pytest.mark.parametrize("args, allowed", [
+    (("-c", "import verilator_mem_if.backdoor"), set()),
+    # The parser takes the default chunk sizes from the bench module, but not its dependencies
+    (("-m", "verilator_mem_if.backdoor", "--version"), {"verilator_mem_if.bench"}),
+], ids=["import", "cli"])
+def test_deferred_imports(args, allowed):
+    modules = importtime(*args)
+    assert "verilator_mem_if.backdoor_memory_interface" in modules
+    assert sorted(set(DEFERRED) & set(modules) - allowed) == []
+
+def test_heavy_modules_not_loaded():
+    # Also catches modules imported in a way that -X importtime doesn't show
+    heavy = ["intelhex", "bincopy", "veriloghex", "numpy"]
+    result = python("-c", f"import sys, verilator_mem_if.backdoor; print(*sorted(set({heavy!r}) & set(sys.modules)))",
+                    stdout=subprocess.PIPE)
+    assert result.stdout.split() == []
+
+def test_import_budget():
+    # The best of a few runs, as the first may pay for a cold file system cache
+    best = min(importtime("-c", "import verilator_mem_if.backdoor")["verilator_mem_if.backdoor"] for _ in range(5))
+    assert best < BUDGET_US
@@ -0,0 +1,56 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import pytest
+from verilator_mem_if.manifest import LoadManifest
+
+def image(size: int) -> bytes:
+    return bytes(i * 5 & 0xff for i in range(size))
+
+@pytest.fixture
+def loaded(backdoor, tmp_path):
+    """A manifest recording two segments written to the target. """
+    manifest = LoadManifest(tmp_path / "manifest.json")
+    for address, data in ((0x10000, image(0x40000)), (0x80000800, image(0x1800))):
+        for run_address, run in manifest.diff(address, data):
+            backdoor.write_memory_block8(run_address, run)
+    manifest.write()
+    return LoadManifest(manifest.path).read()
+
+def test_diff_unchanged(loaded):
+    assert list(loaded.diff(0x10000, image(0x40000))) == []
+
+def test_diff_changed_pages(loaded):
+    data = bytearray(image(0x40000))
+    data[0x1001] ^= 0xff
+    data[0x2000] ^= 0xff
+    data[0x30000] ^= 0xff
+    runs = [(address, len(run)) for address, run in loaded.diff(0x10000, data)]
+    assert runs == [(0x11000, 0x2000), (0x40000, 0x1000)]
+
+def test_diff_unaligned(loaded):
+    # The second segment starts mid-page, so its first piece is a partial page
+    assert list(loaded.diff(0x80000800, image(0x1800))) == []
+    runs = [(address, len(run)) for address, run in loaded.diff(0x80000800, image(0x1000))]
+    assert runs == [(0x80001000, 0x800)]
+
+def test_verify(backdoor, loaded):
+    assert loaded.verify(backdoor)
+
+def test_verify_samples_segment_ends(backdoor, loaded):
+    # The last page of the first segment and the first of the second are always read
+    backdoor.write_memory(0x4f000, 0)
+    assert not loaded.verify(backdoor, samples=4)
+
+@pytest.mark.parametrize("address", [0x10000, 0x2c000, 0x4f000, 0x80000800, 0x80001000])
+def test_verify_all(backdoor, loaded, address):
+    backdoor.write_memory(address, 0)
+    assert not loaded.verify(backdoor, samples=None)
+    # A failed check forgets the recorded pages
+    assert [len(run) for _, run in loaded.diff(0x10000, image(0x40000))] == [0x40000]
+
+def test_verify_sample_count(loaded):
+    assert len(loaded._sample(16)) == 16
+    assert len(loaded._sample(None)) == 0x40 + 2
+    assert {0x10000, 0x4f000, 0x80000800, 0x80001000} <= set(loaded._sample(4))
@@ -0,0 +1,74 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import argparse
+from array import array
+import pytest
+from verilator_mem_if.backdoor import bench
+from verilator_mem_if.memory_map import (Endpoint, MemoryMap, MemoryMapError, Region)
+from verilator_mem_if.server import BackdoorServer
+
+@pytest.fixture
+def servers():
+    with BackdoorServer("localhost", 0) as soc, BackdoorServer("localhost", 0) as dram:
+        yield soc, dram
+
+@pytest.fixture
+def memory_map(servers):
+    soc, dram = servers
+    endpoints = [Endpoint("soc", *soc.address), Endpoint("dram", *dram.address, write_window=4)]
+    regions = [
+        Region("flash", 0x800000, 0x1000, "soc", 0x800000),
+        Region("dram", 0x801000, 0x1000, "dram", 0x0),
+    ]
+    with MemoryMap(endpoints, regions) as m:
+        yield m
+
+def test_word_access(servers, memory_map):
+    soc, dram = servers
+    memory_map.write_memory(0x800ffe, 0x12345678)
+    memory_map.write_memory(0x801004, 0xab, transfer_size=8)
+    assert memory_map.read_memory(0x800ffe) == 0x12345678
+    assert memory_map.read_memory(0x801004, transfer_size=8) == 0xab
+    memory_map.flush()
+    assert soc.memory.read(0x800ffe, 2) == b'\x78\x56'
+    assert dram.memory.read(0x0, 2) == b'\x34\x12'
+
+def test_block_access_across_regions(servers, memory_map):
+    soc, dram = servers
+    data = bytes(range(256)) * 0x10
+    memory_map.write_memory_block8(0x800800, data)
+    assert memory_map.read_memory_bytes(0x800800, len(data)) == data
+    assert memory_map.read_memory_block8(0x800ffc, 8) == list(data[0x7fc:0x804])
+    memory_map.write_memory_block32(0x800ffc, [0x11111111, 0x22222222])
+    assert memory_map.read_memory_block32(0x800ffc, 2) == [0x11111111, 0x22222222]
+    memory_map.flush()
+    assert dram.memory.read(0x0, 4) == b'\x22\x22\x22\x22'
+
+def test_fill_keeps_phase(memory_map):
+    memory_map.fill_memory(0x800fff, 6, b'\x01\x02\x03')
+    assert memory_map.read_memory_bytes(0x800fff, 6) == b'\x01\x02\x03\x01\x02\x03'
+
+def test_wide_item_buffers(servers, memory_map):
+    soc, dram = servers
+    # Routed on their length in bytes rather than items
+    words = array('I', [0x11111111, 0x22222222, 0x33333333, 0x44444444])
+    memory_map.write_memory_block8(0x800ff8, words)
+    memory_map.write_memory_block8(0x801100, memoryview(words))
+    memory_map.flush()
+    assert soc.memory.read(0x800ff8, 8) == words.tobytes()[:8]
+    assert dram.memory.read(0x0, 8) == words.tobytes()[8:]
+    assert dram.memory.read(0x100, 16) == words.tobytes()
+
+def test_unmapped_address(memory_map):
+    with pytest.raises(MemoryMapError):
+        memory_map.write_memory_block8(0x802000, bytes(4))
+    with pytest.raises(MemoryMapError):
+        memory_map.write_memory_block8(0x801ffc, array('I', [0, 0]))
+    with pytest.raises(MemoryMapError):
+        memory_map.read_memory(0x0)
+
+def test_bench_rejects_memory_map(tmp_path):
+    with pytest.raises(ValueError, match="--memory-map"):
+        bench(argparse.Namespace(memory_map=str(tmp_path / "map.toml"), local=False))
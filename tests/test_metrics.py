@@ -0,0 +1,81 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import re
+import pytest
+from verilator_mem_if import metrics
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+
+@pytest.fixture
+def stats(backdoor_server):
+    """The metrics of an interface after a known sequence of accesses. """
+    with BackdoorMemoryInterface(*backdoor_server.address, chunk_size=0x1000, write_window=4) as bd:
+        bd.write_memory_block8(0x0, bytes(0x2800))
+        bd.write_memory(0x10000, 1)
+        bd.read_memory_bytes(0x0, 0x1800)
+        bd.fill_memory(0x20000, 0x400, b'\xff')
+        bd.flush()
+        with bd.batch() as batch:
+            batch.write(0x30000, bytes(8))
+            batch.read(0x30000, 8)
+        return bd.stats()
+
+def test_counters(stats):
+    assert stats.transactions == {"write": 4, "read": 2, "fill": 1, "flush": 0, "batch": 2}
+    assert stats.bytes_written == 0x2800 + 4 + 0x400 + 8
+    assert stats.bytes_read == 0x1800 + 8
+    assert {op: histogram.count for op, histogram in stats.latency.items()} == \
+        {"write": 2, "read": 1, "fill": 1, "flush": 1, "batch": 1}
+
+def test_summary(stats):
+    summary = stats.summary()
+    assert summary["target"] == stats.target
+    write = summary["latency"]["write"]
+    assert write["count"] == 2
+    assert 0 < write["p50_us"] <= write["p99_us"] <= write["max_us"]
+
+def test_report(stats):
+    report = stats.report()
+    assert "transactions  : 9" in report
+    assert re.search(r"^write\s+2\s+4\s", report, re.MULTILINE)
+
+def test_prometheus(stats):
+    text = stats.prometheus(labels={"job": "test"})
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    labels = f'job="test",target="{stats.target}"'
+    assert samples[f'backdoor_transactions_total{{{labels},op="write"}}'] == 4
+    assert samples[f'backdoor_read_bytes_total{{{labels}}}'] == 0x1800 + 8
+    assert samples[f'backdoor_written_bytes_total{{{labels}}}'] == 0x2800 + 4 + 0x400 + 8
+    # The buckets are cumulative and end with the total count
+    buckets = [value for name, value in samples.items()
+               if name.startswith("backdoor_operation_seconds_bucket") and 'op="read"' in name]
+    assert buckets == sorted(buckets) and buckets[-1] == 1
+    assert samples[f'backdoor_operation_seconds_count{{{labels},op="read"}}'] == 1
+
+def test_histogram():
+    histogram = metrics.Histogram()
+    for seconds in (1e-6, 3e-6, 3e-6, 100e-6, 2e-3):
+        histogram.observe(seconds)
+    assert histogram.counts[:3] == [1, 0, 2]
+    assert histogram.quantile(0.5) == 4e-6
+    assert histogram.quantile(1.0) == 2e-3
+    assert histogram.summary()["max_us"] == pytest.approx(2000)
+    other = metrics.Histogram()
+    other.observe(10.0)
+    histogram.merge(other)
+    assert (histogram.count, histogram.max, histogram.counts[-1]) == (6, 10.0, 1)
+
+def test_aggregate(backdoor_server, monkeypatch):
+    monkeypatch.setattr(metrics, "_aggregate", None)
+    assert metrics.aggregate() is None
+    total = metrics.enable_aggregate()
+    for _ in range(2):
+        with BackdoorMemoryInterface(*backdoor_server.address) as bd:
+            bd.write_memory_block8(0x0, bytes(0x10))
+    assert total.transactions == {"write": 2}
+    assert total.bytes_written == 0x20
@@ -0,0 +1,86 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import socket
+import threading
+import pytest
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.server import BackdoorServer
+
+@pytest.fixture
+def silent_server():
+    """A server that decodes the read-not-write bit alone, so it answers a PROBE as an
+    empty read, which is to say never. """
+    listener = socket.socket()
+    listener.bind(("localhost", 0))
+    listener.listen()
+    memory = bytearray(0x1000)
+
+    def recv(conn, size):
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    def serve(conn):
+        with conn:
+            try:
+                while True:
+                    addr, size, rnw = BackdoorMemoryInterface.HEADER.unpack(recv(conn, 7))
+                    if rnw & 1:
+                        conn.sendall(memory[addr:addr + size])
+                    else:
+                        memory[addr:addr + size] = recv(conn, size)
+                        conn.sendall(bytes([BackdoorMemoryInterface.ACK]))
+            except OSError:
+                return
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield listener.getsockname()
+    listener.close()
+
+def test_probe_reports_capabilities(backdoor):
+    assert backdoor.capabilities() == BackdoorMemoryInterface.CAP_FILL
+
+def test_probe_legacy_server():
+    with BackdoorServer("localhost", 0, capabilities=0) as server:
+        with BackdoorMemoryInterface(*server.address) as bd:
+            assert bd.capabilities() == 0
+            bd.write_memory_block8(0x100, [1, 2, 3, 4])
+            assert bd.read_memory_block8(0x100, 4) == [1, 2, 3, 4]
+
+def test_probe_slow_server_stays_in_sync():
+    with BackdoorServer("localhost", 0, latency=0.6) as server:
+        with BackdoorMemoryInterface(*server.address, probe_timeout=None) as bd:
+            assert bd.capabilities() == BackdoorMemoryInterface.CAP_FILL
+            bd.write_memory(0x0, 0x12345678)
+            assert bd.read_memory(0x0) == 0x12345678
+
+def test_probe_timeout_reconnects():
+    with BackdoorServer("localhost", 0, latency=0.6) as server:
+        with BackdoorMemoryInterface(*server.address, probe_timeout=0.1) as bd:
+            assert bd.capabilities() == 0
+            # The late reply went to the old connection, so the next ACK is for this write
+            bd.write_memory(0x0, 0x12345678)
+            assert bd.read_memory(0x0) == 0x12345678
+            bd.fill_memory(0x100, 0x40, b'\xa5')
+            assert bd.read_memory_block8(0x100, 0x40) == [0xa5] * 0x40
+
+def test_probe_silent_server(silent_server):
+    # The default timeout gives up on the probe rather than waiting forever
+    with BackdoorMemoryInterface(*silent_server) as bd:
+        assert bd.capabilities() == 0
+        bd.fill_memory(0x100, 0x40, b'\x5a')
+        assert bd.read_memory_block8(0x100, 0x40) == [0x5a] * 0x40
@@ -0,0 +1,66 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import pytest
+from verilator_mem_if import record
+from verilator_mem_if.backdoor_memory_interface import BackdoorMemoryInterface
+from verilator_mem_if.server import BackdoorServer
+
+def pattern(size: int) -> bytes:
+    return bytes(i * 11 & 0xff for i in range(size))
+
+def session(bd) -> None:
+    bd.write_memory_block8(0x1000, pattern(0x9000))
+    bd.fill_memory(0x20000, 0x100, b'\xde\xad')
+    with bd.batch() as batch:
+        batch.write_memory(0x30000, 0x12345678)
+        batch.read(0x1000, 0x10)
+    bd.flush()
+    bd.read_memory_bytes(0x20000, 0x100)
+    # Data the simulator produced itself
+    bd.read_memory(0x40000)
+
+@pytest.fixture(params=["session.bdrec", "session.bdrec.gz"])
+def log(request, tmp_path):
+    path = tmp_path / request.param
+    with BackdoorServer("localhost", 0) as server:
+        server.memory.write(0x40000, b'\x01\x02\x03\x04')
+        with record.Recorder(path) as recorder, BackdoorMemoryInterface(*server.address) as bd:
+            recorder.attach(bd)
+            session(bd)
+    return path
+
+def test_read_log(log):
+    # Closing the interface flushes it
+    ops = [r.op for r in record.read_log(log)]
+    assert ops == [record.WRITE, record.FILL, record.WRITE, record.READ, record.FLUSH, record.READ, record.READ,
+                   record.FLUSH]
+
+def test_replay_round_trip(log, backdoor_server, backdoor):
+    backdoor_server.memory.write(0x40000, b'\x01\x02\x03\x04')
+    summary = record.replay(log, backdoor, verify=True)
+    assert summary["accesses"] == 8
+    assert summary["bytes_written"] == 0x9000 + 0x100 + 4
+    assert summary["mismatches"] == 0
+    memory = backdoor_server.memory
+    assert memory.read(0x1000, 0x9000) == pattern(0x9000)
+    assert memory.read(0x20000, 0x100) == b'\xde\xad' * 0x80
+    assert memory.read(0x30000, 4) == b'\x78\x56\x34\x12'
+
+def test_replay_mismatch(log, backdoor):
+    # The target does not hold the data the recorded simulator produced
+    assert record.replay(log, backdoor, verify=True)["mismatches"] == 1
+    assert record.replay(log, backdoor)["mismatches"] == 0
+
+def test_replay_memory(log):
+    with BackdoorServer("localhost", 0, memory=record.ReplayMemory(log)) as server:
+        with BackdoorMemoryInterface(*server.address) as bd:
+            assert record.replay(log, bd, verify=True)["mismatches"] == 0
+        assert server.memory.remaining == 0
+
+def test_not_a_log(tmp_path):
+    path = tmp_path / "session.bdrec"
+    path.write_bytes(b"not a log")
+    with pytest.raises(ValueError):
+        list(record.read_log(path))
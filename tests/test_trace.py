@@ -0,0 +1,69 @@
+# Copyright IDEX Biometrics
+# Licensed under the MIT License, see LICENSE
+# SPDX-License-Identifier: MIT
+
+import io
+import json
+import pytest
+from verilator_mem_if import trace
+
+@pytest.fixture
+def tracer():
+    tracer = trace.enable()
+    yield tracer
+    trace.disable()
+
+def test_export(tracer, backdoor, tmp_path):
+    tracer.attach(backdoor)
+    with trace.span("load", file="image.bin"):
+        backdoor.write_memory_block8(0x0, bytes(0x100))
+        backdoor.read_memory_bytes(0x0, 0x100)
+    path = tmp_path / "trace.json"
+    tracer.export(path)
+
+    content = json.loads(path.read_text())
+    assert content["displayTimeUnit"] == "ms"
+    events = content["traceEvents"]
+    load, = [event for event in events if event["cat"] == "phase"]
+    assert load["name"] == "load" and load["args"] == {"file": "image.bin"}
+    transport = [event for event in events if event["cat"] == "transport"]
+    assert {"send_header", "send_payload", "recv_acks", "recv_payload"} <= {event["name"] for event in transport}
+    # Complete events, each beginning before it ends and nested within the phase
+    for event in events:
+        assert event["ph"] == "X" and event["dur"] >= 0
+        assert event["pid"] == load["pid"] and event["tid"] == load["tid"]
+    for event in transport:
+        assert load["ts"] <= event["ts"] and event["ts"] + event["dur"] <= load["ts"] + load["dur"]
+        assert event["args"]["target"] == backdoor.target
+
+def test_export_file_object(tracer):
+    with trace.span("outer"):
+        with trace.span("inner", category="test"):
+            pass
+    f = io.StringIO()
+    tracer.export(f)
+    inner, outer = json.loads(f.getvalue())["traceEvents"]
+    assert (inner["name"], inner["cat"], outer["name"]) == ("inner", "test", "outer")
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+def test_span_records_on_error(tracer):
+    with pytest.raises(RuntimeError):
+        with trace.span("failing"):
+            raise RuntimeError
+    assert [event["name"] for event in tracer.events] == ["failing"]
+
+def test_detach(tracer, backdoor):
+    tracer.attach(backdoor)
+    tracer.attach(backdoor)
+    backdoor.write_memory(0x0, 0)
+    assert sum(event["name"] == "send_header" for event in tracer.events) == 1
+    trace.Tracer.detach(backdoor)
+    backdoor.write_memory(0x0, 0)
+    assert sum(event["name"] == "send_header" for event in tracer.events) == 1
+
+def test_disabled(backdoor):
+    assert trace.active() is None
+    trace.attach(backdoor)
+    assert not hasattr(backdoor._send_header, "__traced__")
+    with trace.span("ignored") as span:
+        assert span is trace._NULL_SPAN